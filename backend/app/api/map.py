@@ -1,36 +1,51 @@
 # Map-related API endpoints
-from fastapi import APIRouter, HTTPException
-from typing import List, Dict
+from fastapi import APIRouter, HTTPException, Response
+from functools import lru_cache
+from typing import List, Dict, Literal, Tuple
 import logging
+import orjson
 
-from ..services.map_service import MapService
+from ..services.map_service import MapService, NO_FLY_ZONES
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/map", tags=["map"])
 
 # Initialize service
 map_service = MapService()
 
+# The no-fly zone list is static, so each subset of it a map view can select is
+# serialized once rather than per request
+@lru_cache(maxsize=256)
+def _nfz_payload(indices: Tuple[int, ...]) -> bytes:
+    return orjson.dumps({"no_fly_zones": [NO_FLY_ZONES[i] for i in indices]})
+
 @router.get("/risk-heatmap")
 async def get_risk_heatmap(
-    north: float, south: float, east: float, west: float, zoom: int = 10
+    north: float, south: float, east: float, west: float, zoom: int = 10,
+    layout: Literal["points", "rows"] = "points"
 ):
     """Generate risk heatmap for map area"""
     try:
-        heatmap_data = await map_service.get_risk_heatmap(north, south, east, west, zoom)
-        return {"heatmap_data": heatmap_data}
+        if layout == "rows":
+            # Compact [lat, lng, risk] float32 rows, serialized straight from the array
+            rows = await map_service.get_risk_heatmap_rows(north, south, east, west, zoom)
+            payload = orjson.dumps({"heatmap_data": rows}, option=orjson.OPT_SERIALIZE_NUMPY)
+        else:
+            # Encode the point dicts directly; the default response would first copy
+            # each of them through jsonable_encoder, which costs far more than encoding
+            heatmap_data = await map_service.get_risk_heatmap(north, south, east, west, zoom)
+            payload = orjson.dumps({"heatmap_data": heatmap_data})
+        return Response(content=payload, media_type="application/json")
     except Exception as e:
-        logging.error(f"Heatmap generation error: {str(e)}")
+        logger.exception("Heatmap generation error: %s", e)
         raise HTTPException(status_code=500, detail=f"Heatmap generation failed: {str(e)}")
 
 @router.get("/no-fly-zones")
 async def get_no_fly_zones(north: float, south: float, east: float, west: float):
     """Get no-fly zones in the specified area"""
-    try:
-        no_fly_zones = await map_service.get_no_fly_zones(north, south, east, west)
-        return {"no_fly_zones": no_fly_zones}
-    except Exception as e:
-        logging.error(f"No-fly zones error: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Failed to get no-fly zones: {str(e)}")
+    indices = map_service.no_fly_zone_indices(north, south, east, west)
+    return Response(content=_nfz_payload(indices), media_type="application/json")
 
 @router.get("/weather")
 async def get_weather_data(lat: float, lng: float):
@@ -39,5 +54,5 @@ async def get_weather_data(lat: float, lng: float):
         weather_data = await map_service.get_weather_data(lat, lng)
         return weather_data
     except Exception as e:
-        logging.error(f"Weather data error: {str(e)}")
+        logger.exception("Weather data error: %s", e)
         raise HTTPException(status_code=500, detail=f"Failed to get weather data: {str(e)}")
@@ -1,61 +1,100 @@
 # Mission planning API endpoints
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Header, Query, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List
+from functools import lru_cache
+from typing import List, Optional
 import logging
+import orjson
 from datetime import datetime
 
 from ..core.database import get_db
 from ..models.schemas import MissionPlanRequest, MissionResponse, SimulationRequest
-from ..services.mission_service import MissionService
-from ..services.simulation_service import SimulationService
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/missions", tags=["missions"])
 
-# Initialize services
-mission_service = MissionService()
-simulation_service = SimulationService()
+# Services are built on first use: MissionService loads (or trains) the risk
+# model and the simulator compiles its kernels, neither of which should slow
+# worker startup or requests that never touch them
+@lru_cache(maxsize=None)
+def get_mission_service():
+    from ..services.mission_service import MissionService
+    return MissionService()
+
+@lru_cache(maxsize=None)
+def get_simulation_service():
+    from ..services.simulation_service import SimulationService
+    return SimulationService()
 
 @router.post("/plan", response_model=MissionResponse)
 async def plan_mission(request: MissionPlanRequest, db: Session = Depends(get_db)):
     """Plan a UAV mission with risk assessment and route optimization"""
     try:
-        result = await mission_service.plan_mission(request, db)
+        result = await get_mission_service().plan_mission(request, db)
         return result
     except Exception as e:
-        logging.error(f"Mission planning error: {str(e)}")
+        logger.exception("Mission planning error: %s", e)
         raise HTTPException(status_code=500, detail=f"Mission planning failed: {str(e)}")
 
 @router.post("/simulate")
 async def simulate_mission(request: SimulationRequest, db: Session = Depends(get_db)):
     """Simulate mission execution and return timeline"""
     try:
-        result = await simulation_service.simulate_mission(request, db)
-        return result
+        result = await get_simulation_service().simulate_mission(request, db)
+        # Serialize straight to bytes; the default response would first walk every step
+        # through jsonable_encoder, which costs far more than encoding
+        payload = orjson.dumps(result, option=orjson.OPT_SERIALIZE_NUMPY)
+        return Response(content=payload, media_type="application/json")
+    except Exception as e:
+        logger.exception("Simulation error: %s", e)
+        raise HTTPException(status_code=500, detail=f"Simulation failed: {str(e)}")
+
+@router.post("/simulate/stream")
+async def stream_simulation(request: SimulationRequest, db: Session = Depends(get_db)):
+    """Simulate mission execution, streaming the timeline as NDJSON step batches"""
+    try:
+        stream = await get_simulation_service().stream_simulation(request, db)
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        logging.error(f"Simulation error: {str(e)}")
+        logger.exception("Simulation error: %s", e)
         raise HTTPException(status_code=500, detail=f"Simulation failed: {str(e)}")
+    return StreamingResponse(stream, media_type="application/x-ndjson")
 
 @router.get("/")
-async def list_missions(db: Session = Depends(get_db)):
-    """List all saved missions"""
+async def list_missions(limit: int = Query(100, ge=1, le=1000), if_none_match: Optional[str] = Header(None),
+                        db: Session = Depends(get_db)):
+    """List the most recent saved missions"""
     try:
-        missions = mission_service.get_missions(db)
-        return {"missions": missions}
+        payload, etag = get_mission_service().get_missions_payload(db, limit)
+        if if_none_match == etag:
+            return Response(status_code=304, headers={"ETag": etag})
+        return Response(content=payload, media_type="application/json", headers={"ETag": etag})
     except Exception as e:
-        logging.error(f"Failed to list missions: {str(e)}")
+        logger.exception("Failed to list missions: %s", e)
         raise HTTPException(status_code=500, detail="Failed to retrieve missions")
 
 @router.get("/{mission_id}")
-async def get_mission(mission_id: str, db: Session = Depends(get_db)):
+async def get_mission(
+    mission_id: str,
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return"),
+    db: Session = Depends(get_db)
+):
     """Get specific mission details"""
     try:
-        mission = mission_service.get_mission(mission_id, db)
+        requested = [f.strip() for f in fields.split(",") if f.strip()] if fields else None
+        mission = get_mission_service().get_mission(mission_id, db, requested)
         if not mission:
             raise HTTPException(status_code=404, detail="Mission not found")
         return mission
     except HTTPException:
         raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        logging.error(f"Failed to get mission {mission_id}: {str(e)}")
+        logger.exception("Failed to get mission %s: %s", mission_id, e)
         raise HTTPException(status_code=500, detail="Failed to retrieve mission")
@@ -1,16 +1,43 @@
 # backend/app/core/database.py
-from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, Text, Boolean, JSON
+from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, Text, Boolean, JSON, Index
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
 from datetime import datetime
+import orjson
 import os
 
 # Database URL
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./uav_missions.db")
 
 # Create engine
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+_url = make_url(DATABASE_URL)
+if _url.get_backend_name() == "sqlite":
+    # SQLite connections are shared across FastAPI's threadpool; an
+    # in-memory database must live on a single connection
+    _engine_options = {"connect_args": {"check_same_thread": False}}
+    if _url.database in (None, "", ":memory:"):
+        _engine_options["poolclass"] = StaticPool
+else:
+    _engine_options = {
+        "pool_size": 20,
+        "max_overflow": 40,
+        "pool_pre_ping": True,  # Drop stale connections before handing them out
+        "pool_recycle": 1800,
+        "pool_use_lifo": True,
+    }
+
+def _json_serializer(value) -> str:
+    """Encode JSON columns with orjson; SQLAlchemy expects str, numpy values are accepted"""
+    return orjson.dumps(value, option=orjson.OPT_SERIALIZE_NUMPY).decode()
+
+# Module-level engine: every worker thread shares its pool
+# JSON columns (waypoints, routes, breakdowns) go through orjson rather than the stdlib json module
+engine = create_engine(DATABASE_URL, json_serializer=_json_serializer, json_deserializer=orjson.loads,
+                       **_engine_options)
+# Committed objects keep their loaded state, so reading them afterwards needs no reload query
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
 
 Base = declarative_base()
 
@@ -41,6 +68,11 @@ class Mission(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     is_completed = Column(Boolean, default=False)
+    
+    __table_args__ = (
+        Index("ix_missions_created", "created_at"),
+        Index("ix_missions_completed_created", "is_completed", "created_at"),
+    )
 
 class SimulationRun(Base):
     __tablename__ = "simulation_runs"
@@ -53,7 +85,7 @@ class SimulationRun(Base):
     speed_multiplier = Column(Float, default=1.0)
     
     # Results
-    simulation_data = Column(JSON)  # Complete simulation steps
+    simulation_data = Column(JSON)  # Complete simulation steps (a column dict for layout="columns"; none for streamed runs)
     success = Column(Boolean, nullable=True)
     total_duration = Column(Float, nullable=True)
     final_battery = Column(Float, nullable=True)
@@ -0,0 +1,75 @@
+# Vectorized great-circle distance helpers shared by planning and simulation
+import math
+import numpy as np
+from typing import Sequence
+
+from . import geo_numba
+
+EARTH_RADIUS_M = geo_numba.EARTH_RADIUS_M
+EARTH_DIAM_M = geo_numba.EARTH_DIAM_M
+DEG2RAD = geo_numba.DEG2RAD
+
+def haversine_rad_m(lat_rad: np.ndarray, lng_rad: np.ndarray, cos_lat: np.ndarray) -> np.ndarray:
+    """Great-circle distances in meters between consecutive points given in radians, along the last axis"""
+    dlat = np.diff(lat_rad)
+    dlng = np.diff(lng_rad)
+    a = np.sin(dlat * 0.5) ** 2 + cos_lat[..., :-1] * cos_lat[..., 1:] * np.sin(dlng * 0.5) ** 2
+    return EARTH_DIAM_M * np.arcsin(np.sqrt(a))
+
+def haversine_m(lats: np.ndarray, lngs: np.ndarray) -> np.ndarray:
+    """Great-circle distances in meters between consecutive lat/lng points, along the last axis"""
+    lat_rad = np.asarray(lats) * DEG2RAD
+    return haversine_rad_m(lat_rad, np.asarray(lngs) * DEG2RAD, np.cos(lat_rad))
+
+def haversine_point_m(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """Great-circle distance in meters between two lat/lng points, for scalar call sites"""
+    lat1_rad = lat1 * DEG2RAD
+    lat2_rad = lat2 * DEG2RAD
+    sin_dlat = math.sin((lat2_rad - lat1_rad) * 0.5)
+    sin_dlng = math.sin((lng2 - lng1) * DEG2RAD * 0.5)
+    a = sin_dlat * sin_dlat + math.cos(lat1_rad) * math.cos(lat2_rad) * sin_dlng * sin_dlng
+    return EARTH_DIAM_M * math.asin(math.sqrt(a))
+
+def haversine_pair_m(lat1: np.ndarray, lng1: np.ndarray, lat2: np.ndarray, lng2: np.ndarray) -> np.ndarray:
+    """Elementwise great-circle distances in meters between lat/lng points; inputs broadcast"""
+    lat1_rad = np.asarray(lat1, dtype=np.float64) * DEG2RAD
+    lat2_rad = np.asarray(lat2, dtype=np.float64) * DEG2RAD
+    dlng_rad = (np.asarray(lng2, dtype=np.float64) - lng1) * DEG2RAD
+    a = np.sin((lat2_rad - lat1_rad) * 0.5) ** 2 + np.cos(lat1_rad) * np.cos(lat2_rad) * np.sin(dlng_rad * 0.5) ** 2
+    return EARTH_DIAM_M * np.arcsin(np.sqrt(a))
+
+def haversine_to_points_rad_m(lat_rad: np.ndarray, lng_rad: np.ndarray, lat_pts_rad: np.ndarray, lng_pts_rad: np.ndarray) -> np.ndarray:
+    """(N, M) great-circle distances in meters from each of N points to each of M reference points, all in radians"""
+    lat_rad = lat_rad[:, None]
+    lng_rad = lng_rad[:, None]
+    a = (np.sin((lat_pts_rad - lat_rad) * 0.5) ** 2
+         + np.cos(lat_rad) * np.cos(lat_pts_rad) * np.sin((lng_pts_rad - lng_rad) * 0.5) ** 2)
+    return EARTH_DIAM_M * np.arcsin(np.sqrt(a))
+
+def haversine_to_points_m(lats: np.ndarray, lngs: np.ndarray, lat_pts: np.ndarray, lng_pts: np.ndarray) -> np.ndarray:
+    """(N, M) great-circle distances in meters from each of N lat/lng points to each of M reference points"""
+    return haversine_to_points_rad_m(
+        np.asarray(lats, dtype=np.float64) * DEG2RAD,
+        np.asarray(lngs, dtype=np.float64) * DEG2RAD,
+        np.asarray(lat_pts, dtype=np.float64) * DEG2RAD,
+        np.asarray(lng_pts, dtype=np.float64) * DEG2RAD
+    )
+
+def haversine_path(lats: np.ndarray, lngs: np.ndarray):
+    """
+    Total great-circle length in meters of the path through lat/lng points
+    (M, N) arrays of M equal-length routes give an (M,) array of their lengths
+    """
+    lats = np.asarray(lats, dtype=np.float64)
+    if lats.ndim > 1:
+        return haversine_m(lats, np.asarray(lngs, dtype=np.float64)).sum(axis=-1)
+    if len(lats) < 2:
+        return 0.0
+    return float(haversine_m(lats, np.asarray(lngs, dtype=np.float64)).sum())
+
+def route_length_m(waypoints: Sequence) -> float:
+    """Total length in meters of a sequence of objects with .lat/.lng"""
+    n = len(waypoints)
+    lats = np.fromiter((wp.lat for wp in waypoints), dtype=np.float64, count=n)
+    lngs = np.fromiter((wp.lng for wp in waypoints), dtype=np.float64, count=n)
+    return geo_numba.haversine_path(lats, lngs)
@@ -0,0 +1,49 @@
+# Numba kernels for great-circle distances on the planning hot path
+import math
+import numpy as np
+from numba import njit
+
+EARTH_RADIUS_M = 6371000.0
+EARTH_DIAM_M = 2 * EARTH_RADIUS_M
+DEG2RAD = math.pi / 180.0
+
+@njit(cache=True, fastmath=True)
+def haversine_path(lat, lng):
+    """Total great-circle length in meters of the path through lat/lng points in degrees"""
+    total = 0.0
+    if lat.shape[0] < 2:
+        return total
+
+    lat_prev = lat[0] * DEG2RAD
+    lng_prev = lng[0] * DEG2RAD
+    cos_prev = math.cos(lat_prev)
+    for i in range(1, lat.shape[0]):
+        lat_i = lat[i] * DEG2RAD
+        lng_i = lng[i] * DEG2RAD
+        cos_i = math.cos(lat_i)
+
+        sin_dlat = math.sin((lat_i - lat_prev) * 0.5)
+        sin_dlng = math.sin((lng_i - lng_prev) * 0.5)
+        a = sin_dlat * sin_dlat + cos_prev * cos_i * sin_dlng * sin_dlng
+        total += math.asin(math.sqrt(a))
+
+        lat_prev, lng_prev, cos_prev = lat_i, lng_i, cos_i
+    return EARTH_DIAM_M * total  # Scale once instead of per segment
+
+@njit(cache=True)
+def haversine_point(lat1, lng1, lat2, lng2):
+    """Great-circle distance in meters between two lat/lng points in degrees"""
+    return haversine_point_cos(lat1, lng1, math.cos(lat1 * DEG2RAD), lat2, lng2, math.cos(lat2 * DEG2RAD))
+
+@njit(cache=True)
+def haversine_point_cos(lat1, lng1, cos_lat1, lat2, lng2, cos_lat2):
+    """haversine_point given the cosines of both latitudes, for callers that reuse them"""
+    sin_dlat = math.sin((lat2 * DEG2RAD - lat1 * DEG2RAD) * 0.5)
+    sin_dlng = math.sin((lng2 - lng1) * DEG2RAD * 0.5)
+    a = sin_dlat * sin_dlat + cos_lat1 * cos_lat2 * sin_dlng * sin_dlng
+    return EARTH_DIAM_M * math.asin(math.sqrt(a))
+
+# Compile (or load from cache) now so the first request doesn't pay the JIT cost
+haversine_path(np.zeros(2), np.zeros(2))
+haversine_point(0.0, 0.0, 0.0, 0.0)
+haversine_point_cos(0.0, 0.0, 1.0, 0.0, 0.0, 1.0)
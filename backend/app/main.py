@@ -1,26 +1,36 @@
 # backend/app/main.py
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
+from contextlib import asynccontextmanager
 import logging
+import os
 from datetime import datetime
 
 # Import API routers
-from .api.missions import router as missions_router
+from .api.missions import router as missions_router, get_mission_service
 from .api.map import router as map_router
 
 # Import database setup
 from .core.database import engine, Base
 
-# Create tables
-Base.metadata.create_all(bind=engine)
-
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Create tables once at startup rather than on import; deployments that
+    # manage the schema themselves can set AUTO_CREATE_TABLES=0
+    if os.getenv("AUTO_CREATE_TABLES", "1").lower() not in ("0", "false", "no"):
+        Base.metadata.create_all(bind=engine)
+    yield
+
 app = FastAPI(
     title="UAV Mission Planning API",
     description="AI-powered UAV mission planning with risk assessment",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse  # Simulation/heatmap payloads are large float arrays
 )
 
 # CORS middleware
@@ -46,16 +56,20 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    from .models.risk_model import RiskPredictor
+    from .models.risk_model import DEFAULT_MODEL_PATH
     
-    # Initialize risk predictor to check if model is loaded
-    risk_predictor = RiskPredictor()
+    # Don't force the lazy service and model load just to answer a probe; before
+    # the first planning request, report whether a trained model is on disk
+    if get_mission_service.cache_info().currsize:
+        risk_model_ready = get_mission_service().risk_predictor.is_loaded()
+    else:
+        risk_model_ready = os.path.exists(DEFAULT_MODEL_PATH)
     
     return {
         "status": "healthy",
         "timestamp": datetime.now().isoformat(),
         "services": {
-            "risk_model": risk_predictor.is_loaded(),
+            "risk_model": risk_model_ready,
             "route_optimizer": True,
             "weather_service": True
         }
@@ -63,4 +77,13 @@ async def health_check():
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    # uvloop and httptools come with uvicorn[standard]; multiple workers need the import string.
+    # One worker unless WEB_CONCURRENCY asks for more: each loads its own model and caches
+    uvicorn.run(
+        "app.main:app",
+        host="0.0.0.0",
+        port=8000,
+        loop="uvloop",
+        http="httptools",
+        workers=int(os.getenv("WEB_CONCURRENCY", 1))
+    )
\ No newline at end of file
@@ -0,0 +1,113 @@
+# Numba kernel for the risk model's route feature extraction
+import math
+import numpy as np
+from numba import njit
+
+from ..core.geo_numba import DEG2RAD, EARTH_DIAM_M
+
+# Feature vector layout, in RiskPredictor.feature_names order
+FEAT_ROUTE_LENGTH = 0
+FEAT_AVG_ALTITUDE = 1
+FEAT_MAX_ALTITUDE = 2
+FEAT_MIN_DISTANCE_TO_NO_FLY = 3
+FEAT_WIND_SPEED_AVG = 4
+FEAT_GUST_MAX = 5
+FEAT_BATTERY_MARGIN = 6
+FEAT_WAYPOINTS_OVER_BUILDINGS = 7
+FEAT_LINE_OF_SIGHT = 8
+FEAT_TERRAIN_ROUGHNESS = 9
+FEAT_WEATHER_SEVERITY = 10
+FEAT_ROUTE_COMPLEXITY = 11
+
+MAX_LOS_SEGMENT_KM = 5.0
+BASE_CONSUMPTION = 2.0  # %/km
+
+@njit(cache=True)
+def _in_bbox(lat, lng, bbox):
+    return bbox[0] < lat < bbox[1] and bbox[2] < lng < bbox[3]
+
+@njit(cache=True, fastmath=True)
+def route_features(lat, lng, alt, zone_lat_rad, zone_lng_rad, urban_bbox, hills_bbox,
+                   battery_capacity, wind_speed, out):
+    """
+    Fill the route-derived entries of a feature vector in one pass over a
+    non-empty route, given in degrees; the weather entries are left to the caller
+    Bounding boxes are (lat_min, lat_max, lng_min, lng_max)
+    """
+    n = lat.shape[0]
+    route_length = 0.0
+    line_of_sight = True
+    alt_sum = 0.0
+    alt_max = alt[0]
+    min_zone_distance = np.inf
+    buildings = 0
+    roughness = 0.0
+    total_turn = 0.0
+
+    lat_prev = 0.0
+    lng_prev = 0.0
+    cos_prev = 0.0
+    for i in range(n):
+        lat_i = lat[i] * DEG2RAD
+        lng_i = lng[i] * DEG2RAD
+        cos_i = math.cos(lat_i)
+
+        if i > 0:
+            sin_dlat = math.sin((lat_i - lat_prev) * 0.5)
+            sin_dlng = math.sin((lng_i - lng_prev) * 0.5)
+            a = sin_dlat * sin_dlat + cos_prev * cos_i * sin_dlng * sin_dlng
+            segment_km = EARTH_DIAM_M * math.asin(math.sqrt(a)) / 1000.0
+            route_length += segment_km
+            if segment_km > MAX_LOS_SEGMENT_KM:
+                line_of_sight = False
+
+        # Change in direction at the previous waypoint
+        if i > 1:
+            total_turn += (abs((lat[i - 1] - lat[i - 2]) - (lat[i] - lat[i - 1]))
+                           + abs((lng[i - 1] - lng[i - 2]) - (lng[i] - lng[i - 1])))
+
+        alt_sum += alt[i]
+        alt_max = max(alt_max, alt[i])
+
+        for z in range(zone_lat_rad.shape[0]):
+            sin_dlat = math.sin((zone_lat_rad[z] - lat_i) * 0.5)
+            sin_dlng = math.sin((zone_lng_rad[z] - lng_i) * 0.5)
+            a = sin_dlat * sin_dlat + cos_i * math.cos(zone_lat_rad[z]) * sin_dlng * sin_dlng
+            min_zone_distance = min(min_zone_distance, EARTH_DIAM_M * math.asin(math.sqrt(a)))
+
+        if _in_bbox(lat[i], lng[i], urban_bbox):
+            buildings += 1
+        roughness += 0.8 if _in_bbox(lat[i], lng[i], hills_bbox) else 0.2
+
+        lat_prev, lng_prev, cos_prev = lat_i, lng_i, cos_i
+
+    wind_factor = 1.0 + (wind_speed / 10.0) * 0.3
+    consumption = route_length * BASE_CONSUMPTION * (alt_max / 100.0) * wind_factor
+
+    out[FEAT_ROUTE_LENGTH] = route_length
+    out[FEAT_AVG_ALTITUDE] = alt_sum / n
+    out[FEAT_MAX_ALTITUDE] = alt_max
+    out[FEAT_MIN_DISTANCE_TO_NO_FLY] = min_zone_distance
+    out[FEAT_BATTERY_MARGIN] = max(0.0, battery_capacity - consumption)
+    out[FEAT_WAYPOINTS_OVER_BUILDINGS] = buildings
+    out[FEAT_LINE_OF_SIGHT] = 1.0 if line_of_sight else 0.0
+    out[FEAT_TERRAIN_ROUGHNESS] = roughness / n
+    if n < 3:
+        out[FEAT_ROUTE_COMPLEXITY] = 0.1
+    else:
+        out[FEAT_ROUTE_COMPLEXITY] = min(1.0, (total_turn * 100 + n) / max(1.0, route_length))
+
+@njit(cache=True)
+def segment_features(segments, zone_lat_rad, zone_lng_rad, urban_bbox, hills_bbox,
+                     battery_capacity, wind_speed, out):
+    """route_features for each (2, 3) [lat, lng, altitude] segment of an (N, 2, 3) array, into the rows of out"""
+    for i in range(segments.shape[0]):
+        route_features(segments[i, :, 0], segments[i, :, 1], segments[i, :, 2],
+                       zone_lat_rad, zone_lng_rad, urban_bbox, hills_bbox,
+                       battery_capacity, wind_speed, out[i])
+
+# Compile (or load from cache) now so the first prediction doesn't pay the JIT cost
+route_features(np.zeros(2), np.zeros(2), np.zeros(2), np.zeros(1), np.zeros(1),
+               (0.0, 0.0, 0.0, 0.0), (0.0, 0.0, 0.0, 0.0), 100.0, 0.0, np.empty(FEAT_ROUTE_COMPLEXITY + 1, dtype=np.float32))
+segment_features(np.zeros((1, 2, 3)), np.zeros(1), np.zeros(1), (0.0, 0.0, 0.0, 0.0), (0.0, 0.0, 0.0, 0.0),
+                 100.0, 0.0, np.empty((1, FEAT_ROUTE_COMPLEXITY + 1), dtype=np.float32))
@@ -0,0 +1,328 @@
+# Numba kernels for the route optimizer's A* search loop
+import math
+import numpy as np
+from numba import njit, types
+from numba.typed import Dict
+
+from ..core.geo_numba import DEG2RAD, haversine_point_cos
+
+# Integer position key: microdegrees of lat/lng and decimeters of altitude
+KEY_TYPE = types.UniTuple(types.int64, 3)
+
+# Layout of a search's counters array
+COUNT_NODES = 0
+COUNT_HEAP = 1
+
+@njit(cache=True)
+def new_index():
+    """Empty position key -> node index dict"""
+    return Dict.empty(key_type=KEY_TYPE, value_type=types.int64)
+
+@njit(cache=True)
+def insert(index, coords, g, parent_idx, closed, penalty, counts, lat, lng, alt,
+           urban_bbox, hills_bbox, projection, zones_x, zones_y, radii):
+    """
+    Index of the node at (lat, lng, alt), appending a new unreached node if the position
+    is unseen; a node's terrain and no-fly penalty is computed once, when it is appended
+    """
+    key = (np.int64(np.rint(lat * 1e6)), np.int64(np.rint(lng * 1e6)), np.int64(np.rint(alt * 10.0)))
+    if key in index:
+        return index[key]
+
+    i = counts[COUNT_NODES]
+    counts[COUNT_NODES] += 1
+    index[key] = i
+    coords[i, 0] = lat
+    coords[i, 1] = lng
+    coords[i, 2] = alt
+    g[i] = np.inf
+    parent_idx[i] = -1
+    closed[i] = False
+    penalty[i] = _position_penalty(lat, lng, urban_bbox, hills_bbox, projection, zones_x, zones_y, radii)
+    return i
+
+@njit(cache=True)
+def _heap_less(f1, i1, f2, i2):
+    # Same order as (f_cost, index) tuples in heapq
+    return f1 < f2 or (f1 == f2 and i1 < i2)
+
+@njit(cache=True)
+def heap_push(heap_f, heap_i, counts, f, i):
+    pos = counts[COUNT_HEAP]
+    counts[COUNT_HEAP] += 1
+    while pos > 0:
+        parent = (pos - 1) >> 1
+        if not _heap_less(f, i, heap_f[parent], heap_i[parent]):
+            break
+        heap_f[pos] = heap_f[parent]
+        heap_i[pos] = heap_i[parent]
+        pos = parent
+    heap_f[pos] = f
+    heap_i[pos] = i
+
+@njit(cache=True)
+def pop_open(heap_f, heap_i, counts, closed):
+    """Pop the lowest-f entry off a non-empty heap; its node index, or -1 if that node was already settled"""
+    i = heap_i[0]
+    n = counts[COUNT_HEAP] - 1
+    counts[COUNT_HEAP] = n
+    last_f = heap_f[n]
+    last_i = heap_i[n]
+    pos = 0
+    while True:
+        child = 2 * pos + 1
+        if child >= n:
+            break
+        if child + 1 < n and _heap_less(heap_f[child + 1], heap_i[child + 1], heap_f[child], heap_i[child]):
+            child += 1
+        if not _heap_less(heap_f[child], heap_i[child], last_f, last_i):
+            break
+        heap_f[pos] = heap_f[child]
+        heap_i[pos] = heap_i[child]
+        pos = child
+    if n > 0:
+        heap_f[pos] = last_f
+        heap_i[pos] = last_i
+    return -1 if closed[i] else i
+
+@njit(cache=True)
+def _position_penalty(lat, lng, urban_bbox, hills_bbox, projection, zones_x, zones_y, radii):
+    return (terrain_penalty(lat, lng, urban_bbox, hills_bbox)
+            + no_fly_penalty(lat, lng, projection, zones_x, zones_y, radii))
+
+@njit(cache=True)
+def jump_cells(lat, lng, dlat, dlng, penalty, distance_to_goal, goal_lat, goal_lng, cos_goal, grid_step, max_jump,
+               urban_bbox, hills_bbox, projection, zones_x, zones_y, radii):
+    """
+    Grid steps of (dlat, dlng) * grid_step that can be taken from (lat, lng), distance_to_goal
+    away from the goal, in a straight run, up to max_jump; the run stops before a position whose
+    terrain and no-fly penalty differs from penalty (a forced neighbor) or that gets no closer to the goal
+    """
+    cells = 0
+    while cells < max_jump:
+        next_lat = lat + dlat * grid_step * (cells + 1)
+        next_lng = lng + dlng * grid_step * (cells + 1)
+        next_distance = haversine_point_cos(next_lat, next_lng, math.cos(next_lat * DEG2RAD),
+                                            goal_lat, goal_lng, cos_goal)
+        if next_distance >= distance_to_goal:
+            break
+        if _position_penalty(next_lat, next_lng, urban_bbox, hills_bbox,
+                             projection, zones_x, zones_y, radii) != penalty:
+            break
+        distance_to_goal = next_distance
+        cells += 1
+    return cells
+
+@njit(cache=True)
+def neighbors(lat, lng, alt, parent_lat, parent_lng, penalty, goal_lat, goal_lng, goal_alt,
+              directions, grid_resolution, altitude_resolution, min_altitude, max_altitude, max_jump,
+              out, distances, h_costs, cells, urban_bbox, hills_bbox, projection, zones_x, zones_y, radii):
+    """
+    Fill out with the [lat, lng, altitude] rows of the candidate successors of a position,
+    distances/h_costs with the edge length in meters to each and its heuristic cost to the
+    goal, and cells with the grid steps each edge stands for; altitudes stay within
+    [min_altitude, max_altitude]
+    Rows are the jump point, if the parent's direction continues in a straight run (see
+    jump_cells), then the goal, if close enough, then the grid neighbors
+    Returns the row count and how many leading rows make up the pruned jump point search
+    successors (0 without a jump point)
+    """
+    cos_lat = math.cos(lat * DEG2RAD)
+    cos_goal = math.cos(goal_lat * DEG2RAD)
+
+    # Adaptive step size based on distance to goal
+    distance_to_goal = haversine_point_cos(lat, lng, cos_lat, goal_lat, goal_lng, cos_goal)
+    if distance_to_goal > 5000:  # > 5km, use larger steps
+        step_multiplier = 5.0
+    elif distance_to_goal > 1000:  # > 1km, use medium steps
+        step_multiplier = 2.0
+    else:  # < 1km, use fine steps
+        step_multiplier = 1.0
+
+    grid_step = grid_resolution * step_multiplier
+    altitude_step = altitude_resolution * step_multiplier
+    k = 0
+
+    # Keep going the way the parent came, through positions where nothing changes
+    dlat = np.sign(lat - parent_lat)
+    dlng = np.sign(lng - parent_lng)
+    if dlat != 0 or dlng != 0:
+        jump = jump_cells(lat, lng, dlat, dlng, penalty, distance_to_goal, goal_lat, goal_lng, cos_goal,
+                          grid_step, max_jump, urban_bbox, hills_bbox, projection, zones_x, zones_y, radii)
+        if jump > 0:
+            out[0, 0] = lat + dlat * grid_step * jump
+            out[0, 1] = lng + dlng * grid_step * jump
+            out[0, 2] = alt
+            cells[0] = jump
+            k = 1
+    n_pruned = k
+
+    # Also add direct path to goal if close enough
+    if distance_to_goal < 2000:  # Within 2km
+        out[k, 0] = goal_lat
+        out[k, 1] = goal_lng
+        out[k, 2] = goal_alt
+        cells[k] = 1.0
+        k += 1
+        if n_pruned:
+            n_pruned = k
+
+    for r in range(directions.shape[0]):
+        out[k, 0] = lat + directions[r, 0] * grid_step
+        out[k, 1] = lng + directions[r, 1] * grid_step
+        new_alt = alt
+        if directions[r, 2] != 0:
+            # Climbs and descents land on multiples of the step, so the searched altitudes stay few
+            new_alt = np.rint(alt / altitude_step + directions[r, 2]) * altitude_step
+        out[k, 2] = min(max_altitude, max(min_altitude, new_alt))
+        cells[k] = 1.0
+        k += 1
+
+    # Grid rows share a few latitudes, so each row's cosine is reused while its latitude repeats
+    row_lat = np.nan
+    cos_row = 0.0
+    for r in range(k):
+        if out[r, 0] != row_lat:
+            row_lat = out[r, 0]
+            cos_row = math.cos(row_lat * DEG2RAD)
+        distances[r] = haversine_point_cos(lat, lng, cos_lat, row_lat, out[r, 1], cos_row)
+        h_costs[r] = (haversine_point_cos(row_lat, out[r, 1], cos_row, goal_lat, goal_lng, cos_goal)
+                      + abs(goal_alt - out[r, 2]) * 0.5)
+    return k, n_pruned
+
+@njit(cache=True)
+def terrain_penalty(lat, lng, urban_bbox, hills_bbox):
+    """Penalty for difficult terrain; bounding boxes are (lat_min, lat_max, lng_min, lng_max)"""
+    if urban_bbox[0] < lat < urban_bbox[1] and urban_bbox[2] < lng < urban_bbox[3]:
+        return 100.0
+    if hills_bbox[0] < lat < hills_bbox[1] and hills_bbox[2] < lng < hills_bbox[3]:
+        return 50.0
+    return 0.0
+
+@njit(cache=True)
+def no_fly_penalty(lat, lng, projection, zones_x, zones_y, radii):
+    """
+    Penalty for proximity to no-fly zones, given their centers on the local flat-earth
+    plane described by projection = (lat0, lng0, lng_scale, lat_scale)
+    """
+    x = (lng - projection[1]) * projection[2]
+    y = (lat - projection[0]) * projection[3]
+    penalty = np.inf
+    for z in range(radii.shape[0]):
+        distance = math.hypot(x - zones_x[z], y - zones_y[z])
+        if distance < radii[z]:
+            return 10000.0  # Inside no-fly zone - very high penalty
+        if distance < radii[z] * 2:
+            penalty = min(penalty, 500.0 * (1 - (distance - radii[z]) / radii[z]))
+    return 0.0 if penalty == np.inf else penalty
+
+@njit(cache=True)
+def relax(parent, reverse, neighbor_coords, distances, h_costs, risks, cells, k, risk_weight,
+          index, coords, g, parent_idx, closed, penalty, counts, heap_f, heap_i,
+          urban_bbox, hills_bbox, projection, zones_x, zones_y, radii):
+    """
+    Cost the edges from node parent to its k neighbors (from them to it if reverse) and
+    record every path that reaches an open neighbor more cheaply than before
+    Each edge is penalized for the terrain and no-fly zones where it ends, once per grid
+    step it stands for, so a jump costs what the run of single steps would
+    """
+    parent_alt = coords[parent, 2]
+    g_parent = g[parent]
+
+    for r in range(k):
+        alt = neighbor_coords[r, 2]
+        i = insert(index, coords, g, parent_idx, closed, penalty, counts,
+                   neighbor_coords[r, 0], neighbor_coords[r, 1], alt,
+                   urban_bbox, hills_bbox, projection, zones_x, zones_y, radii)
+        if closed[i]:
+            continue
+
+        altitude_cost = abs(alt - parent_alt) * 0.1  # Penalty for altitude changes
+        risk_cost = risks[r] * distances[r] * risk_weight
+        end_penalty = (penalty[parent] if reverse else penalty[i]) * cells[r]
+        tentative_g = g_parent + (distances[r] + altitude_cost + risk_cost + end_penalty)
+
+        if tentative_g < g[i]:
+            g[i] = tentative_g
+            parent_idx[i] = parent
+            heap_push(heap_f, heap_i, counts, tentative_g + h_costs[r], i)
+
+@njit(cache=True)
+def _grid_axis_position(x, x0, dx, n):
+    # Cell index and fraction of x along one axis of an n-point grid, clamped to the grid
+    t = min(max((x - x0) / dx, 0.0), n - 1.0)
+    i = min(int(t), n - 2)
+    return i, t - i
+
+@njit(cache=True)
+def grid_risk(grid, origin, cell, lat, lng, alt):
+    """
+    Trilinear interpolation at a position of an (n_lat, n_lng, n_alt) grid of risk scores,
+    at least 2 points along each axis, whose first point is origin = (lat, lng, altitude) and
+    whose spacing is cell; positions off the grid take the value at its edge
+    """
+    i, fi = _grid_axis_position(lat, origin[0], cell[0], grid.shape[0])
+    j, fj = _grid_axis_position(lng, origin[1], cell[1], grid.shape[1])
+    l, fl = _grid_axis_position(alt, origin[2], cell[2], grid.shape[2])
+    c00 = grid[i, j, l] * (1.0 - fl) + grid[i, j, l + 1] * fl
+    c01 = grid[i, j + 1, l] * (1.0 - fl) + grid[i, j + 1, l + 1] * fl
+    c10 = grid[i + 1, j, l] * (1.0 - fl) + grid[i + 1, j, l + 1] * fl
+    c11 = grid[i + 1, j + 1, l] * (1.0 - fl) + grid[i + 1, j + 1, l + 1] * fl
+    c0 = c00 * (1.0 - fj) + c01 * fj
+    c1 = c10 * (1.0 - fj) + c11 * fj
+    return c0 * (1.0 - fi) + c1 * fi
+
+@njit(cache=True)
+def edge_risks(grid, origin, cell, lat, lng, alt, coords, k, out):
+    """Fill out with the risk of the edge between a position and each of the first k coords rows: the riskier of its ends on the grid"""
+    here = grid_risk(grid, origin, cell, lat, lng, alt)
+    for r in range(k):
+        out[r] = max(here, grid_risk(grid, origin, cell, coords[r, 0], coords[r, 1], coords[r, 2]))
+
+@njit(cache=True)
+def path_indices(parent_idx, i):
+    """Node indices on the path from the search root to node i, found by following parent_idx"""
+    n = 0
+    j = i
+    while j != -1:
+        n += 1
+        j = parent_idx[j]
+
+    path = np.empty(n, dtype=np.int64)
+    j = i
+    for r in range(n - 1, -1, -1):
+        path[r] = j
+        j = parent_idx[j]
+    return path
+
+# Compile (or load from cache) now so the first optimization doesn't pay the JIT cost
+def _warm_up():
+    coords = np.empty((12, 3))
+    g = np.empty(12)
+    parent_idx = np.empty(12, dtype=np.int32)
+    closed = np.empty(12, dtype=bool)
+    penalty = np.empty(12)
+    heap_f = np.empty(12)
+    heap_i = np.empty(12, dtype=np.int64)
+    counts = np.zeros(2, dtype=np.int64)
+    index = new_index()
+    bbox = (0.0, 0.0, 0.0, 0.0)
+    penalty_args = (bbox, bbox, (0.0, 0.0, 1.0, 1.0), np.zeros(1), np.zeros(1), np.ones(1))
+    root = insert(index, coords, g, parent_idx, closed, penalty, counts, 0.0, 0.0, 100.0, *penalty_args)
+    g[root] = 0.0
+    heap_push(heap_f, heap_i, counts, 0.0, root)
+    root = pop_open(heap_f, heap_i, counts, closed)
+    out = np.empty((12, 3))
+    distances = np.empty(12)
+    h_costs = np.empty(12)
+    cells = np.empty(12)
+    directions = np.zeros((10, 3))
+    k, _ = neighbors(0.0, 0.0, 100.0, 0.0, -0.001, 0.0, 0.0, 0.001, 100.0, directions, 0.001, 20.0, 50.0, 600.0, 8,
+                     out, distances, h_costs, cells, *penalty_args)
+    risks = np.empty(12)
+    edge_risks(np.zeros((2, 2, 2)), (0.0, 0.0, 50.0), (0.002, 0.002, 50.0), 0.0, 0.0, 100.0, out, k, risks)
+    relax(root, False, out[:k], distances[:k], h_costs[:k], risks[:k], cells[:k], k, 2.0,
+          index, coords, g, parent_idx, closed, penalty, counts, heap_f, heap_i, *penalty_args)
+    path_indices(parent_idx, root)
+
+_warm_up()
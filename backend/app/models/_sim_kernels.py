@@ -0,0 +1,171 @@
+# Numba kernels for the mission simulator hot loop
+import math
+import numpy as np
+from numba import njit
+
+from ..core.geo_numba import DEG2RAD, EARTH_DIAM_M
+
+METERS_PER_DEGREE = 111000.0  # Flat-earth scale, matches the velocity approximation
+
+# Row layout of the (N_COLS, n_steps) state buffer filled by run_segment
+COL_TIMESTAMP = 0
+COL_LAT = 1
+COL_LNG = 2
+COL_ALT = 3
+COL_VX = 4
+COL_VY = 5
+COL_VZ = 6
+COL_BATTERY = 7
+COL_RISK = 8
+COL_SPEED = 9
+N_COLS = 10
+
+# Storage type of the state buffer; steps are computed in float64 and stored at
+# float32's ~1 m lat/lng resolution to halve its memory traffic
+STATE_DTYPE = np.float32
+
+# No-fly zone distances in meters at which current_risk steps up
+NFZ_HIGH_RISK_DISTANCE = 500.0
+NFZ_RISK_DISTANCE = 1000.0
+NFZ_REUSE_SLACK = 1e-3  # Meters kept off the reuse margin to absorb interpolation rounding
+
+@njit(cache=True, fastmath=True)
+def velocity(lat0, lng0, alt0, lat1, lng1, alt1, cos_lat0, speed):
+    """Velocity vector (vx, vy, vz) in m/s between two points, cos_lat0 = cos(radians(lat0))"""
+    dlat = (lat1 - lat0) * METERS_PER_DEGREE
+    dlng = (lng1 - lng0) * METERS_PER_DEGREE * cos_lat0
+
+    if dlat == 0.0 and dlng == 0.0:
+        return 0.0, 0.0, 0.0
+
+    dalt = alt1 - alt0
+    scale = speed / math.sqrt(dlat * dlat + dlng * dlng + dalt * dalt)  # Normalize and scale in one factor
+
+    return dlat * scale, dlng * scale, dalt * scale
+
+@njit(cache=True, fastmath=True)
+def current_risk(alt, wind_speed, nfz_distance):
+    """Risk 0-1 at a single position, given its distance in meters to the nearest no-fly zone"""
+    risk_factors = 0.0
+
+    # Altitude risk
+    if alt > 200:
+        risk_factors += 0.1
+    if alt < 80:
+        risk_factors += 0.2
+
+    # Weather risk
+    if wind_speed > 12:
+        risk_factors += 0.3
+    elif wind_speed > 8:
+        risk_factors += 0.1
+
+    # No-fly zone proximity risk
+    if nfz_distance < NFZ_HIGH_RISK_DISTANCE:
+        risk_factors += 0.5
+    elif nfz_distance < NFZ_RISK_DISTANCE:
+        risk_factors += 0.2
+
+    return min(1.0, risk_factors)
+
+@njit(cache=True, fastmath=True)
+def nearest_zone_distance(lat, lng, projection, zones_x, zones_y):
+    """
+    Distance in meters to the nearest no-fly zone center, on the local flat-earth plane
+    described by projection = (lat0, lng0, lng_scale) that zones_x/zones_y are in
+    """
+    x = (lng - projection[1]) * projection[2]
+    y = (lat - projection[0]) * METERS_PER_DEGREE
+    nearest = np.inf
+    for z in range(zones_x.shape[0]):
+        nearest = min(nearest, math.hypot(x - zones_x[z], y - zones_y[z]))
+    return nearest
+
+@njit(cache=True)
+def nfz_reuse_margin(nfz_distance):
+    """How far in meters the UAV can move from where nfz_distance was measured without current_risk changing"""
+    margin = min(abs(nfz_distance - NFZ_HIGH_RISK_DISTANCE), abs(nfz_distance - NFZ_RISK_DISTANCE))
+    return margin - NFZ_REUSE_SLACK
+
+@njit(cache=True, fastmath=True)
+def run_segment(out, offset, lat0, lng0, alt0, lat1, lng1, alt1, cos_lat0, battery0, t0, segment_distance,
+                target_speed, wind_speed, wind_effect, batt_rate, time_step, total_steps,
+                nfz_projection, nfz_x, nfz_y):
+    """
+    Step the UAV from (lat0, lng0, alt0) to (lat1, lng1, alt1), writing each step,
+    with its risk from the nearest no-fly zone (see nearest_zone_distance), into out[:, offset + step]
+    The nearest-zone distance changes by at most the distance moved, so it is only
+    recomputed once the UAV could have crossed one of current_risk's thresholds
+    Returns the number of steps written, less than total_steps if the battery runs out,
+    the great-circle distance in meters flown through them from (lat0, lng0), and the
+    battery and timestamp after the last one, in float64 rather than out's rounded copies
+    """
+    timestamp = t0
+    battery = battery0
+    altitude_change = alt1 - alt0
+
+    # Segment invariants, hoisted out of the per-step loop
+    effective_speed = max(0.0, target_speed - wind_speed * wind_effect)
+    vx, vy, vz = velocity(lat0, lng0, alt0, lat1, lng1, alt1, cos_lat0, effective_speed)
+
+    distance_step = segment_distance / total_steps
+    altitude_factor = 1.0 + abs(altitude_change) / 1000.0  # Penalty for altitude changes
+    wind_factor = 1.0 + wind_speed / 10.0  # Wind resistance
+    battery_per_step = (distance_step / 1000.0) * batt_rate * altitude_factor * wind_factor
+
+    # Distance flown, accumulated as haversine central angles and scaled once at the end
+    angle = 0.0
+    lat_prev = lat0 * DEG2RAD
+    lng_prev = lng0 * DEG2RAD
+    cos_prev = math.cos(lat_prev)
+
+    # Steps are evenly spaced on the no-fly zone plane, so each moves the same distance there
+    step_length = math.hypot((lng1 - lng0) * nfz_projection[2], (lat1 - lat0) * METERS_PER_DEGREE)
+    step_length /= max(1, total_steps - 1)
+    nfz_distance = np.inf
+    reuse_left = -1.0  # Distance left before nfz_distance must be recomputed
+
+    for step in range(total_steps):
+        progress = step / (total_steps - 1) if total_steps > 1 else 1.0
+
+        # Interpolate position
+        lat = lat0 + (lat1 - lat0) * progress
+        lng = lng0 + (lng1 - lng0) * progress
+        alt = alt0 + altitude_change * progress
+
+        battery = max(0.0, battery - battery_per_step)
+        timestamp += time_step
+
+        i = offset + step
+        out[COL_TIMESTAMP, i] = timestamp
+        out[COL_LAT, i] = lat
+        out[COL_LNG, i] = lng
+        out[COL_ALT, i] = alt
+        out[COL_VX, i] = vx
+        out[COL_VY, i] = vy
+        out[COL_VZ, i] = vz
+        out[COL_BATTERY, i] = battery
+        if reuse_left <= 0.0:
+            nfz_distance = nearest_zone_distance(lat, lng, nfz_projection, nfz_x, nfz_y)
+            reuse_left = nfz_reuse_margin(nfz_distance)
+        reuse_left -= step_length
+        out[COL_RISK, i] = current_risk(alt, wind_speed, nfz_distance)
+        out[COL_SPEED, i] = effective_speed
+
+        lat_rad = lat * DEG2RAD
+        lng_rad = lng * DEG2RAD
+        cos_lat = math.cos(lat_rad)
+        sin_dlat = math.sin((lat_rad - lat_prev) * 0.5)
+        sin_dlng = math.sin((lng_rad - lng_prev) * 0.5)
+        angle += math.asin(math.sqrt(sin_dlat * sin_dlat + cos_prev * cos_lat * sin_dlng * sin_dlng))
+        lat_prev, lng_prev, cos_prev = lat_rad, lng_rad, cos_lat
+
+        if battery <= 0:
+            return step + 1, EARTH_DIAM_M * angle, battery, timestamp
+
+    return total_steps, EARTH_DIAM_M * angle, battery, timestamp
+
+# Compile (or load from cache) now so the first simulation doesn't pay the JIT cost
+_warmup_nfz = np.zeros((2, 2))  # Two zones, so the column views are strided like the simulator's
+run_segment(np.zeros((N_COLS, 2), dtype=STATE_DTYPE), 0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 1.0, 100.0, 0.0, 0.0,
+            1.0, 0.0, 0.0, 1.0, 0.5, 2, (0.0, 0.0, 1.0), _warmup_nfz[:, 0], _warmup_nfz[:, 1])
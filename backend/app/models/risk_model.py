@@ -1,35 +1,138 @@
 # backend/app/models/risk_model.py
 import numpy as np
-import pandas as pd
-import xgboost as xgb
-import joblib
-import shap
 import os
+import sys
+import threading
 from typing import List, Dict, Optional, Tuple
 from dataclasses import dataclass
-from geopy.distance import geodesic
+from functools import lru_cache
 import logging
+from cachetools import LRUCache
 
-@dataclass
+from ..core.geo import DEG2RAD, haversine_to_points_rad_m, route_length_m
+from ._risk_kernels import (
+    FEAT_AVG_ALTITUDE, FEAT_BATTERY_MARGIN, FEAT_GUST_MAX, FEAT_MAX_ALTITUDE, FEAT_MIN_DISTANCE_TO_NO_FLY,
+    FEAT_ROUTE_COMPLEXITY, FEAT_ROUTE_LENGTH, FEAT_TERRAIN_ROUGHNESS, FEAT_WAYPOINTS_OVER_BUILDINGS,
+    FEAT_WEATHER_SEVERITY, FEAT_WIND_SPEED_AVG, route_features, segment_features
+)
+
+# xgboost is imported where it is used: it is only needed once a model is
+# loaded or trained, not by the dataclasses below.
+# treelite/tl2cgen and onnxruntime/onnxmltools are optional: without them
+# scoring stays on xgboost
+
+# Binary UBJSON loads several times faster than the JSON format; a JSON model
+# saved next to it by older versions is converted on first load
+DEFAULT_MODEL_PATH = "ml/models/risk_xgb.ubj"
+
+# Feature histogram bins for training; the features are few and smooth, so
+# the default bin count loses nothing against exact split search
+TRAIN_MAX_BIN = 256
+
+# Entries in each per-predictor memo of features and risk scores. The route
+# optimizer scores thousands of short edges per segment, and re-planning an
+# edited route re-scores the unchanged segments' edges under the same weather
+RISK_CACHE_SIZE = 8192
+
+# Length of the feature vector, in RiskPredictor.feature_names order
+N_FEATURES = 12
+
+# Mock restricted areas (airports, military zones) as [lat, lng] rows
+RESTRICTED_ZONES = np.array([
+    (37.621311, -122.378968),  # SFO Airport
+    (37.759859, -122.447151),  # Mock military base
+])
+RESTRICTED_ZONE_LATS_RAD = RESTRICTED_ZONES[:, 0] * DEG2RAD
+RESTRICTED_ZONE_LNGS_RAD = RESTRICTED_ZONES[:, 1] * DEG2RAD
+
+# Mock (lat_min, lat_max, lng_min, lng_max) boxes: SF downtown buildings and SF hills
+URBAN_BBOX = (37.77, 37.79, -122.42, -122.40)
+HILLS_BBOX = (37.75, 37.78, -122.45, -122.42)
+
+# Translation units the compiled model's trees are split into, compiled in parallel by gcc
+COMPILE_PARALLEL_UNITS = 4
+
+# The compiled model quantizes split thresholds; it is only used if its scores
+# on this many synthetic samples stay within the tolerance of xgboost's
+COMPILED_CHECK_SAMPLES = 2000
+COMPILED_CHECK_TOLERANCE = 1e-6
+
+# explain_risk categories as (name, feature indices, signed). Signed categories
+# average their SHAP contributions clipped at 0; the others take the magnitude
+RISK_CATEGORIES = (
+    ("weather_risk", (FEAT_WIND_SPEED_AVG, FEAT_GUST_MAX, FEAT_WEATHER_SEVERITY), True),
+    ("battery_risk", (FEAT_BATTERY_MARGIN,), False),
+    ("no_fly_risk", (FEAT_MIN_DISTANCE_TO_NO_FLY,), False),
+    ("terrain_risk", (FEAT_TERRAIN_ROUGHNESS, FEAT_WAYPOINTS_OVER_BUILDINGS), True),
+    ("route_risk", (FEAT_ROUTE_LENGTH, FEAT_ROUTE_COMPLEXITY), True),
+    ("altitude_risk", (FEAT_AVG_ALTITUDE, FEAT_MAX_ALTITUDE), True),
+)
+
+# Scoring backends for RiskPredictor(backend=...), each falling back to the ones after it:
+# the treelite-compiled model, an ONNX Runtime session, then xgboost itself
+INFERENCE_BACKENDS = ("treelite", "onnx", "xgboost")
+
+# slots=True needs Python 3.10; older interpreters fall back to a regular dataclass
+_SLOTS = {"slots": True} if sys.version_info >= (3, 10) else {}
+
+@dataclass(**_SLOTS)
 class Waypoint:
     lat: float
     lng: float
     altitude: float = 100.0
 
+def waypoints_to_array(waypoints: List[Waypoint]) -> np.ndarray:
+    """(N, 3) float64 array of [lat, lng, altitude] rows, stored column-major so each field is contiguous"""
+    coords = np.array([(wp.lat, wp.lng, wp.altitude) for wp in waypoints], dtype=np.float64)
+    return np.asfortranarray(coords.reshape(-1, 3))
+
 @dataclass 
 class Mission:
     waypoints: List[Waypoint]
     battery_capacity: float = 100.0
     max_speed: float = 15.0
     weather_conditions: Optional[Dict] = None
+    
+    def route_array(self) -> np.ndarray:
+        """
+        Waypoints as an (N, 3) [lat, lng, altitude] array for vector math
+        Rebuilt on every call: waypoints are mutable, and a stale array would feed the risk cache keys
+        """
+        return waypoints_to_array(self.waypoints)
+
+def _rule_based_risk(route_length, battery_margin, wind_speed, min_distance):
+    """
+    Rule-based risk 0-1 from scalars or equal-length arrays of the fallback factors
+    Thresholds are summed as mask arithmetic, so arrays are scored without per-row branches
+    """
+    risk = (
+        # Route length risk
+        (route_length > 10) * 0.3 + ((route_length > 5) & (route_length <= 10)) * 0.1
+        # Battery risk
+        + (battery_margin < 10) * 0.4 + ((battery_margin >= 10) & (battery_margin < 20)) * 0.2
+        # Weather risk
+        + (wind_speed > 15) * 0.3 + ((wind_speed > 10) & (wind_speed <= 15)) * 0.1
+        # Restricted area risk
+        + (min_distance < 500) * 0.4 + ((min_distance >= 500) & (min_distance < 1000)) * 0.2
+    )
+    return np.minimum(1.0, risk)
 
 class RiskPredictor:
     """ML-based risk prediction for UAV missions"""
     
-    def __init__(self, model_path: str = "ml/models/risk_xgb.json"):
+    def __init__(self, model_path: str = DEFAULT_MODEL_PATH, backend: str = "treelite"):
+        if backend not in INFERENCE_BACKENDS:
+            raise ValueError(f"Unknown inference backend {backend!r}, expected one of {INFERENCE_BACKENDS}")
+        
         self.model_path = model_path
-        self.model = None
-        self.explainer = None
+        self.legacy_model_path = os.path.splitext(model_path)[0] + ".json"  # Before models were stored as UBJSON
+        self.backend = backend
+        self.model = None  # xgb.Booster, single-threaded for one-row scoring
+        self.loaded_model_path = None  # File self.model was loaded from or saved to
+        self.compiled_predictor = None  # tl2cgen.Predictor over the compiled model, if available
+        self.compiled_model_path = os.path.splitext(model_path)[0] + ".so"
+        self.onnx_session = None  # onnxruntime.InferenceSession over the exported model, if available
+        self.onnx_model_path = os.path.splitext(model_path)[0] + ".onnx"
         self.feature_names = [
             'route_length_km',
             'avg_altitude',
@@ -45,16 +148,32 @@ class RiskPredictor:
             'route_complexity'
         ]
         
+        # Memoized features and scores, keyed by _mission_key; the predictor is
+        # shared across worker threads, so cache access is locked
+        self._feature_cache = LRUCache(maxsize=RISK_CACHE_SIZE)
+        self._risk_cache = LRUCache(maxsize=RISK_CACHE_SIZE)
+        self._cache_lock = threading.Lock()
+        
         # Load or create model
         self._load_or_create_model()
     
     def _load_or_create_model(self):
-        """Load existing model or create and train a new one"""
+        """
+        Load existing model or create and train a new one
+        An existing model is only read, along with whatever artifacts build_artifacts wrote
+        for it, so serving works from a read-only image and workers never race to write files
+        """
+        import xgboost as xgb
+        
         try:
-            if os.path.exists(self.model_path):
-                self.model = xgb.XGBClassifier()
-                self.model.load_model(self.model_path)
-                logging.info(f"Loaded existing model from {self.model_path}")
+            path = self._newest_model_file()
+            if path is not None:
+                self.model = xgb.Booster()
+                self.model.load_model(path)
+                self.loaded_model_path = path
+                logging.info(f"Loaded existing model from {path}")
+                self._set_scoring_threads()
+                self._load_inference_backend()
             else:
                 logging.info("No existing model found. Creating and training new model...")
                 self._create_and_train_model()
@@ -62,30 +181,59 @@ class RiskPredictor:
             logging.error(f"Model loading failed: {e}")
             self._create_and_train_model()
     
+    def _newest_model_file(self) -> Optional[str]:
+        """
+        The more recently written of the UBJSON model and a legacy JSON one, or None if neither exists
+        A JSON model retrained after build_artifacts converted an earlier one must win over the stale .ubj
+        """
+        paths = [path for path in (self.model_path, self.legacy_model_path) if os.path.exists(path)]
+        if not paths:
+            return None
+        return max(paths, key=os.path.getmtime)
+    
     def _create_and_train_model(self):
         """Create synthetic dataset and train XGBoost model"""
+        import xgboost as xgb
+        
         try:
-            # Generate synthetic training data
-            X_train, y_train = self._generate_synthetic_dataset(n_samples=10000)
-            
-            # Train XGBoost model
-            self.model = xgb.XGBClassifier(
-                n_estimators=200,
-                max_depth=6,
-                learning_rate=0.1,
-                subsample=0.8,
-                colsample_bytree=0.8,
-                random_state=42
+            from sklearn.model_selection import train_test_split
+            
+            # Generate synthetic training data, holding out a validation split for early stopping
+            X, y = self._generate_synthetic_dataset(n_samples=10000)
+            X_train, X_val, y_train, y_val = train_test_split(X, y, test_size=0.2, random_state=42, stratify=y)
+            # Histogram training reads pre-binned quantile matrices; the validation
+            # split reuses the training bin edges
+            dtrain = xgb.QuantileDMatrix(X_train, label=y_train, feature_names=self.feature_names,
+                                         max_bin=TRAIN_MAX_BIN)
+            dval = xgb.QuantileDMatrix(X_val, label=y_val, feature_names=self.feature_names, ref=dtrain)
+            
+            # Train XGBoost model; shallow trees keep per-prediction node visits low,
+            # and early stopping drops trees that no longer improve validation loss
+            params = {
+                'objective': 'binary:logistic',
+                'tree_method': 'hist',  # Pinned, older xgboost releases default to exact/approx
+                'max_bin': TRAIN_MAX_BIN,
+                'max_depth': 4,
+                'eta': 0.1,
+                'subsample': 0.8,
+                'colsample_bytree': 0.8,
+                'nthread': os.cpu_count(),  # Serving sets OMP_NUM_THREADS=1; training still uses every core
+                'seed': 42
+            }
+            booster = xgb.train(
+                params, dtrain, num_boost_round=100,
+                evals=[(dval, 'validation')], early_stopping_rounds=10, verbose_eval=False
             )
+            n_trees = booster.best_iteration + 1
             
-            self.model.fit(X_train, y_train)
-            
-            # Save model
+            # Save only the trees up to the best iteration
+            self.model = booster[:n_trees]
             os.makedirs(os.path.dirname(self.model_path), exist_ok=True)
             self.model.save_model(self.model_path)
-            
-            # Initialize SHAP explainer
-            self.explainer = shap.TreeExplainer(self.model)
+            self.loaded_model_path = self.model_path
+            logging.info(f"Trained model with {n_trees} trees")
+            self._set_scoring_threads()
+            self._build_inference_backend()
             
             logging.info("Model training completed successfully")
             
@@ -94,116 +242,215 @@ class RiskPredictor:
             # Fallback to simple rule-based model
             self.model = None
     
-    def _generate_synthetic_dataset(self, n_samples: int = 10000) -> Tuple[pd.DataFrame, np.ndarray]:
-        """Generate synthetic training dataset with realistic UAV mission scenarios"""
+    def _set_scoring_threads(self):
+        """Score on one thread: threading overhead dominates a single row"""
+        self.model.set_param({'nthread': 1})
+    
+    def build_artifacts(self):
+        """
+        Write everything serving loads for the current model: the model as UBJSON, converted
+        from a legacy JSON model if need be, and the accelerated backend's compiled library
+        or ONNX export. Run at training/build time (ml/train_model.py), never while serving
+        """
+        if self.model is None:
+            return
+        if self.loaded_model_path != self.model_path:
+            self.model.save_model(self.model_path)
+            logging.info(f"Converted model {self.loaded_model_path} to {self.model_path}")
+            self.loaded_model_path = self.model_path
+        elif self.compiled_predictor is not None or self.onnx_session is not None:
+            return  # Built with the model, or loaded current from an earlier build
+        self._build_inference_backend()
+    
+    def _build_inference_backend(self):
+        """Build and set up the fastest available backend allowed by self.backend"""
+        if self.backend == "treelite":
+            self._compile_model()
         
-        np.random.seed(42)
-        data = []
+        if self.compiled_predictor is None and self.backend in ("treelite", "onnx"):
+            self._export_onnx_model()
+            self._load_onnx_model()
+    
+    def _load_inference_backend(self):
+        """Set up the fastest backend allowed by self.backend whose artifacts were already built"""
+        if self.backend == "treelite":
+            self._load_compiled_model()
         
-        for i in range(n_samples):
-            # Generate random mission parameters
-            route_length = np.random.exponential(5.0)  # km
-            avg_altitude = np.random.normal(120, 30)   # meters
-            max_altitude = avg_altitude + np.random.exponential(50)
-            
-            # Environmental factors
-            wind_speed = np.random.exponential(8)      # m/s
-            gust_max = wind_speed + np.random.exponential(5)
-            weather_severity = min(1.0, wind_speed / 15 + np.random.uniform(0, 0.3))
-            
-            # Safety factors
-            min_distance_to_no_fly = np.random.exponential(1000)  # meters
-            battery_margin = np.random.normal(20, 10)   # percentage
-            waypoints_over_buildings = np.random.poisson(2)
-            line_of_sight = np.random.random() > 0.3
-            terrain_roughness = np.random.exponential(0.5)
-            route_complexity = min(1.0, route_length / 10 + waypoints_over_buildings / 10)
-            
-            # Create feature vector
-            features = [
-                route_length,
-                avg_altitude, 
-                max_altitude,
-                min_distance_to_no_fly,
-                wind_speed,
-                gust_max,
-                battery_margin,
-                waypoints_over_buildings,
-                int(line_of_sight),
-                terrain_roughness,
-                weather_severity,
-                route_complexity
-            ]
-            
-            # Calculate risk label based on realistic failure conditions
-            risk_factors = []
-            
-            # Weather risk
-            if wind_speed > 12:
-                risk_factors.append(0.4)
-            if gust_max > 18:
-                risk_factors.append(0.3)
-            
-            # Battery risk  
-            if battery_margin < 10:
-                risk_factors.append(0.5)
-            if route_length > 8 and battery_margin < 20:
-                risk_factors.append(0.3)
-            
-            # Airspace risk
-            if min_distance_to_no_fly < 200:
-                risk_factors.append(0.6)
-            if min_distance_to_no_fly < 500:
-                risk_factors.append(0.2)
-            
-            # Altitude risk
-            if max_altitude > 200:
-                risk_factors.append(0.3)
+        if self.compiled_predictor is None and self.backend in ("treelite", "onnx"):
+            self._load_onnx_model()
+    
+    def _artifact_is_current(self, path: str) -> bool:
+        """Whether an artifact built from the model exists and is no older than the model file"""
+        return os.path.exists(path) and os.path.getmtime(path) >= os.path.getmtime(self.loaded_model_path)
+    
+    def _compile_model(self):
+        """Compile the saved model to a native shared library with treelite/tl2cgen"""
+        try:
+            import tl2cgen
+            import treelite
+        except ImportError:
+            logging.info("treelite/tl2cgen not installed, using xgboost for inference")
+            return
+        
+        try:
+            tl_model = treelite.frontend.load_xgboost_model(self.model_path)
+            tl2cgen.export_lib(
+                tl_model,
+                toolchain="gcc",
+                libpath=self.compiled_model_path,
+                params={"parallel_comp": COMPILE_PARALLEL_UNITS, "quantize": 1}
+            )
+            self.compiled_predictor = tl2cgen.Predictor(self.compiled_model_path)
+            logging.info(f"Compiled model to {self.compiled_model_path}")
+            self._check_compiled_model()
+        except Exception as e:
+            logging.warning(f"Model compilation failed, using xgboost for inference: {e}")
+            self.compiled_predictor = None
+    
+    def _load_compiled_model(self):
+        """Load the compiled model library, unless it is missing or older than the model"""
+        if not self._artifact_is_current(self.compiled_model_path):
+            logging.info(f"No current compiled model at {self.compiled_model_path}; run ml/train_model.py to build it")
+            return
+        
+        try:
+            import tl2cgen
+            self.compiled_predictor = tl2cgen.Predictor(self.compiled_model_path)
+            logging.info(f"Loaded compiled model from {self.compiled_model_path}")
+            self._check_compiled_model()
+        except Exception as e:
+            logging.warning(f"Compiled model unavailable, using xgboost for inference: {e}")
+            self.compiled_predictor = None
+    
+    def _export_onnx_model(self):
+        """Convert the model to ONNX with onnxmltools"""
+        try:
+            import onnxmltools
+            from onnxmltools.convert.common.data_types import FloatTensorType
+        except ImportError:
+            logging.info("onnxmltools not installed, not exporting the model to ONNX")
+            return
+        
+        try:
+            # The converter only understands the default f0..fN feature names
+            booster = self.model.copy()
+            booster.feature_names = None
             
-            # Terrain and complexity
-            if terrain_roughness > 1.0:
-                risk_factors.append(0.2)
-            if not line_of_sight:
-                risk_factors.append(0.3)
-                
-            # Calculate final risk probability
-            total_risk = min(1.0, sum(risk_factors) + np.random.normal(0, 0.1))
-            is_high_risk = total_risk > 0.5
+            onnx_model = onnxmltools.convert_xgboost(booster, initial_types=[("input", FloatTensorType([None, N_FEATURES]))])
+            onnxmltools.utils.save_model(onnx_model, self.onnx_model_path)
+            logging.info(f"Exported model to {self.onnx_model_path}")
+        except Exception as e:
+            logging.warning(f"ONNX export failed: {e}")
+    
+    def _load_onnx_model(self):
+        """Start an ONNX Runtime session on the exported model, unless it is missing or older than the model"""
+        if not self._artifact_is_current(self.onnx_model_path):
+            logging.info(f"No current ONNX model at {self.onnx_model_path}; run ml/train_model.py to build it")
+            return
+        
+        try:
+            import onnxruntime as ort
             
-            data.append(features)
+            options = ort.SessionOptions()
+            options.intra_op_num_threads = 1
+            options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+            self.onnx_session = ort.InferenceSession(
+                self.onnx_model_path, sess_options=options, providers=["CPUExecutionProvider"]
+            )
+            logging.info(f"Loaded ONNX model from {self.onnx_model_path}")
+            self._check_compiled_model()
+        except ImportError:
+            logging.info("onnxruntime not installed, using xgboost for inference")
+        except Exception as e:
+            logging.warning(f"ONNX model unavailable, using xgboost for inference: {e}")
+            self.onnx_session = None
+    
+    def _check_compiled_model(self):
+        """Drop the compiled or ONNX model if its scores drift from xgboost's on synthetic missions"""
+        X, _ = self._generate_synthetic_dataset(n_samples=COMPILED_CHECK_SAMPLES)
+        
+        max_error = float(np.abs(self._predict_proba_batch(X) - self.model.inplace_predict(X)).max())
+        if max_error > COMPILED_CHECK_TOLERANCE:
+            logging.warning(f"Accelerated model differs from xgboost by {max_error:.2e}, using xgboost for inference")
+            self.compiled_predictor = None
+            self.onnx_session = None
+    
+    def _predict_proba(self, features: np.ndarray) -> float:
+        """Probability of high risk for one (1, N_FEATURES) float32 feature row"""
+        if self.compiled_predictor is not None:
+            import tl2cgen
+            return float(self.compiled_predictor.predict(tl2cgen.DMatrix(features)).ravel()[0])
+        if self.onnx_session is not None:
+            return float(self.onnx_session.run(["probabilities"], {"input": features})[0][0, 1])
+        # inplace_predict skips building a DMatrix per call
+        return float(self.model.inplace_predict(features)[0])
+    
+    def _predict_proba_batch(self, X: np.ndarray) -> np.ndarray:
+        """Probabilities of high risk for an (N, N_FEATURES) float32 feature matrix"""
+        if self.compiled_predictor is not None:
+            import tl2cgen
+            return self.compiled_predictor.predict(tl2cgen.DMatrix(X)).reshape(len(X))
+        if self.onnx_session is not None:
+            return self.onnx_session.run(["probabilities"], {"input": X})[0][:, 1]
+        return self.model.inplace_predict(X)
+    
+    def _generate_synthetic_dataset(self, n_samples: int = 10000) -> Tuple[np.ndarray, np.ndarray]:
+        """Generate synthetic training dataset with realistic UAV mission scenarios, as (float32 features, labels)"""
+        rng = np.random.default_rng(42)
+        n = n_samples
+        
+        # Random mission parameters
+        route_length = rng.exponential(5.0, n)  # km
+        avg_altitude = rng.normal(120, 30, n)   # meters
+        max_altitude = avg_altitude + rng.exponential(50, n)
         
-        X = pd.DataFrame(data, columns=self.feature_names)
+        # Environmental factors
+        wind_speed = rng.exponential(8, n)      # m/s
+        gust_max = wind_speed + rng.exponential(5, n)
+        weather_severity = np.minimum(1.0, wind_speed / 15 + rng.uniform(0, 0.3, n))
+        
+        # Safety factors
+        min_distance_to_no_fly = rng.exponential(1000, n)  # meters
+        battery_margin = rng.normal(20, 10, n)   # percentage
+        waypoints_over_buildings = rng.poisson(2, n)
+        line_of_sight = rng.random(n) > 0.3
+        terrain_roughness = rng.exponential(0.5, n)
+        route_complexity = np.minimum(1.0, route_length / 10 + waypoints_over_buildings / 10)
+        
+        X = np.column_stack([
+            route_length,
+            avg_altitude,
+            max_altitude,
+            min_distance_to_no_fly,
+            wind_speed,
+            gust_max,
+            battery_margin,
+            waypoints_over_buildings,
+            line_of_sight.astype(np.int64),
+            terrain_roughness,
+            weather_severity,
+            route_complexity
+        ]).astype(np.float32)
         
         # Generate labels based on combined risk factors
-        y = []
-        for idx, row in X.iterrows():
-            risk_score = 0.0
-            
+        risk_score = (
             # Weather contribution
-            risk_score += min(0.3, row['wind_speed_avg'] / 20)
-            risk_score += min(0.2, row['gust_max'] / 25) 
-            
+            np.minimum(0.3, wind_speed / 20)
+            + np.minimum(0.2, gust_max / 25)
             # Distance to no-fly zones
-            if row['min_distance_to_no_fly'] < 500:
-                risk_score += 0.4
-            elif row['min_distance_to_no_fly'] < 1000:
-                risk_score += 0.2
-                
+            + np.where(min_distance_to_no_fly < 500, 0.4, np.where(min_distance_to_no_fly < 1000, 0.2, 0.0))
             # Battery margin
-            if row['battery_margin'] < 15:
-                risk_score += 0.3
-            
+            + np.where(battery_margin < 15, 0.3, 0.0)
             # Route length vs battery
-            if row['route_length_km'] > 6 and row['battery_margin'] < 25:
-                risk_score += 0.2
-                
-            # Add random noise
-            risk_score += np.random.normal(0, 0.1)
-            
-            # Convert to binary classification
-            y.append(1 if risk_score > 0.5 else 0)
+            + np.where((route_length > 6) & (battery_margin < 25), 0.2, 0.0)
+            # Random noise
+            + rng.normal(0, 0.1, n)
+        )
+        
+        # Convert to binary classification
+        y = (risk_score > 0.5).astype(np.int64)
         
-        return X, np.array(y)
+        return X, y
     
     def predict_mission_risk(self, mission: Mission) -> float:
         """Predict risk score for a mission (0=safe, 1=high risk)"""
@@ -211,52 +458,116 @@ class RiskPredictor:
             if self.model is None:
                 return self._fallback_risk_calculation(mission)
             
-            features = self._extract_features(mission)
-            risk_prob = self.model.predict_proba([features])[0][1]  # Probability of high risk
-            return float(risk_prob)
+            key = self._mission_key(mission)
+            with self._cache_lock:
+                cached = self._risk_cache.get(key)
+            if cached is not None:
+                return cached
+            
+            features = self._cached_features(mission, key)
+            risk_prob = self._predict_proba(features)
+            with self._cache_lock:
+                self._risk_cache[key] = risk_prob
+            return risk_prob
         
         except Exception as e:
             logging.error(f"Risk prediction error: {e}")
             return self._fallback_risk_calculation(mission)
     
+    def predict_missions_risk(self, missions: List[Mission]) -> List[float]:
+        """Predict risk scores for many missions, scoring the uncached ones in one model call"""
+        if self.model is None:
+            return self._fallback_risk_batch(missions)
+        
+        try:
+            keys = [self._mission_key(mission) for mission in missions]
+            with self._cache_lock:
+                risks = [self._risk_cache.get(key) for key in keys]
+            
+            misses = [i for i, risk in enumerate(risks) if risk is None]
+            if misses:
+                X = np.vstack([self._cached_features(missions[i], keys[i]) for i in misses])
+                probs = self._predict_proba_batch(X).tolist()
+                with self._cache_lock:
+                    for i, prob in zip(misses, probs):
+                        self._risk_cache[keys[i]] = prob
+                        risks[i] = prob
+            return risks
+        
+        except Exception as e:
+            logging.error(f"Batch risk prediction error: {e}")
+            return self._fallback_risk_batch(missions)
+    
+    def predict_segments_batch(self, from_coords: np.ndarray, to_coords: np.ndarray, mission: Mission,
+                               cache: bool = True) -> np.ndarray:
+        """
+        Risk scores for N two-waypoint legs flown under the mission's battery and weather,
+        given (N, 3) [lat, lng, altitude] arrays of their ends; uncached legs are scored in one model call
+        Scores match predict_mission_risk on the equivalent two-waypoint missions
+        cache=False scores every leg without touching the cache, for one-off bulk batches
+        """
+        segments = np.ascontiguousarray(np.stack([from_coords, to_coords], axis=1), dtype=np.float64)
+        if self.model is None:
+            return self._fallback_segments_risk(segments, mission)
+        
+        try:
+            if not cache:
+                return self._predict_proba_batch(self._extract_segment_features(segments, mission)).astype(np.float64)
+            
+            # Same keys predict_mission_risk uses for a two-waypoint mission
+            context = self._context_key(mission)
+            keys = [(segment.tobytes(),) + context for segment in segments]
+            with self._cache_lock:
+                risks = np.array([self._risk_cache.get(key, np.nan) for key in keys], dtype=np.float64)
+            
+            misses = np.flatnonzero(np.isnan(risks))
+            if len(misses):
+                risks[misses] = self._predict_proba_batch(self._extract_segment_features(segments[misses], mission))
+                with self._cache_lock:
+                    for i, prob in zip(misses.tolist(), risks[misses].tolist()):
+                        self._risk_cache[keys[i]] = prob
+            return risks
+        
+        except Exception as e:
+            logging.error(f"Segment risk prediction error: {e}")
+            return self._fallback_segments_risk(segments, mission)
+    
+    def _fallback_segments_risk(self, segments: np.ndarray, mission: Mission) -> np.ndarray:
+        """Rule-based risk for an (N, 2, 3) array of legs, scored as arrays in one pass"""
+        features = self._extract_segment_features(segments, mission)
+        wind_speed = mission.weather_conditions.get('wind_speed', 0) if mission.weather_conditions else 0
+        return _rule_based_risk(
+            features[:, FEAT_ROUTE_LENGTH].astype(np.float64), features[:, FEAT_BATTERY_MARGIN].astype(np.float64),
+            wind_speed, features[:, FEAT_MIN_DISTANCE_TO_NO_FLY].astype(np.float64)
+        )
+    
+    def _fallback_risk_batch(self, missions: List[Mission]) -> List[float]:
+        """Rule-based risk for many missions, scored as arrays in one pass"""
+        if not missions:
+            return []
+        factors = np.array([self._fallback_risk_factors(mission) for mission in missions])
+        return _rule_based_risk(*factors.T).tolist()
+    
     def explain_risk(self, mission: Mission) -> Dict[str, float]:
         """Provide detailed risk breakdown with SHAP explanations"""
         try:
-            if self.model is None or self.explainer is None:
+            if self.model is None:
                 return self._fallback_risk_explanation(mission)
             
-            features = self._extract_features(mission)
-            shap_values = self.explainer.shap_values([features])[0]
+            import xgboost as xgb
             
-            # Create risk breakdown
-            risk_breakdown = {}
-            feature_contributions = dict(zip(self.feature_names, shap_values))
+            features = self._cached_features(mission, self._mission_key(mission))
+            # XGBoost's built-in TreeSHAP; the last column is the bias term
+            shap_values = self.model.predict(
+                xgb.DMatrix(features, feature_names=self.feature_names), pred_contribs=True
+            )[0, :-1]
             
             # Group related features into categories
-            risk_breakdown['weather_risk'] = max(0, (
-                feature_contributions.get('wind_speed_avg', 0) +
-                feature_contributions.get('gust_max', 0) +
-                feature_contributions.get('weather_severity', 0)
-            )) / 3
-            
-            risk_breakdown['battery_risk'] = abs(feature_contributions.get('battery_margin', 0))
-            
-            risk_breakdown['no_fly_risk'] = abs(feature_contributions.get('min_distance_to_no_fly', 0))
-            
-            risk_breakdown['terrain_risk'] = max(0, (
-                feature_contributions.get('terrain_roughness', 0) +
-                feature_contributions.get('waypoints_over_buildings', 0)
-            )) / 2
-            
-            risk_breakdown['route_risk'] = max(0, (
-                feature_contributions.get('route_length_km', 0) +
-                feature_contributions.get('route_complexity', 0)
-            )) / 2
-            
-            risk_breakdown['altitude_risk'] = max(0, (
-                feature_contributions.get('avg_altitude', 0) +
-                feature_contributions.get('max_altitude', 0)
-            )) / 2
+            contributions = shap_values.tolist()
+            risk_breakdown = {}
+            for category, indices, signed in RISK_CATEGORIES:
+                total = sum(contributions[i] for i in indices)
+                risk_breakdown[category] = max(0, total) / len(indices) if signed else abs(total)
             
             # Normalize to 0-1 range
             max_val = max(risk_breakdown.values()) if risk_breakdown.values() else 1
@@ -270,83 +581,100 @@ class RiskPredictor:
             logging.error(f"Risk explanation error: {e}")
             return self._fallback_risk_explanation(mission)
     
-    def _extract_features(self, mission: Mission) -> List[float]:
-        """Extract feature vector from mission for ML model"""
+    def _mission_key(self, mission: Mission) -> Tuple:
+        """Everything the features depend on: the route and the mission-wide conditions"""
+        return (mission.route_array().tobytes(),) + self._context_key(mission)
+    
+    def _context_key(self, mission: Mission) -> Tuple:
+        """The mission-wide conditions part of _mission_key"""
+        weather = mission.weather_conditions
+        return (
+            mission.battery_capacity,
+            mission.max_speed,
+            weather is None,
+            weather.get('wind_speed') if weather else None,
+            weather.get('gust_speed') if weather else None
+        )
+    
+    def _cached_features(self, mission: Mission, key: Tuple) -> np.ndarray:
+        with self._cache_lock:
+            features = self._feature_cache.get(key)
+        if features is None:
+            features = self._extract_features(mission)
+            with self._cache_lock:
+                self._feature_cache[key] = features
+        return features
+    
+    def _extract_segment_features(self, segments: np.ndarray, mission: Mission) -> np.ndarray:
+        """(N, N_FEATURES) float32 feature matrix for an (N, 2, 3) float64 array of two-waypoint legs"""
+        weather = mission.weather_conditions or {}
+        features = np.empty((len(segments), N_FEATURES), dtype=np.float32)
+        segment_features(
+            segments, RESTRICTED_ZONE_LATS_RAD, RESTRICTED_ZONE_LNGS_RAD, URBAN_BBOX, HILLS_BBOX,
+            float(mission.battery_capacity), float(weather.get('wind_speed', 0)), features
+        )
+        self._fill_weather_features(features, weather)
+        return features
+    
+    def _fill_weather_features(self, features: np.ndarray, weather: Dict):
+        """Set the weather columns of a feature matrix, which are the same for every route under one forecast"""
+        wind_speed_avg = weather.get('wind_speed', 5.0)
+        features[:, FEAT_WIND_SPEED_AVG] = wind_speed_avg
+        features[:, FEAT_GUST_MAX] = weather.get('gust_speed', wind_speed_avg * 1.5)
+        features[:, FEAT_WEATHER_SEVERITY] = min(1.0, wind_speed_avg / 15)
+    
+    def _extract_features(self, mission: Mission) -> np.ndarray:
+        """
+        Extract the (1, N_FEATURES) float32 feature row for a mission, ready for the model
+        Route features come from one compiled pass over the route (route_features)
+        """
         try:
-            # Route metrics
-            route_length = self._calculate_route_length(mission.waypoints)
-            altitudes = [wp.altitude for wp in mission.waypoints]
-            avg_altitude = np.mean(altitudes)
-            max_altitude = max(altitudes)
+            coords = mission.route_array()
+            if len(coords) == 0:
+                raise ValueError("mission has no waypoints")
             
-            # Weather features
             weather = mission.weather_conditions or {}
-            wind_speed_avg = weather.get('wind_speed', 5.0)
-            gust_max = weather.get('gust_speed', wind_speed_avg * 1.5)
-            weather_severity = min(1.0, wind_speed_avg / 15)
             
-            # Safety features
-            min_distance_to_no_fly = self._min_distance_to_restricted_areas(mission.waypoints)
-            battery_margin = self._calculate_battery_margin(mission)
-            waypoints_over_buildings = self._count_waypoints_over_buildings(mission.waypoints)
-            line_of_sight_flag = self._check_line_of_sight(mission.waypoints)
-            terrain_roughness = self._calculate_terrain_roughness(mission.waypoints)
-            route_complexity = self._calculate_route_complexity(mission)
+            features = np.empty((1, N_FEATURES), dtype=np.float32)
+            route_features(
+                coords[:, 0], coords[:, 1], coords[:, 2],
+                RESTRICTED_ZONE_LATS_RAD, RESTRICTED_ZONE_LNGS_RAD, URBAN_BBOX, HILLS_BBOX,
+                float(mission.battery_capacity), float(weather.get('wind_speed', 0)), features[0]
+            )
             
-            return [
-                route_length,
-                avg_altitude,
-                max_altitude,
-                min_distance_to_no_fly,
-                wind_speed_avg,
-                gust_max,
-                battery_margin,
-                waypoints_over_buildings,
-                int(line_of_sight_flag),
-                terrain_roughness,
-                weather_severity,
-                route_complexity
-            ]
+            self._fill_weather_features(features, weather)
+            return features
             
         except Exception as e:
             logging.error(f"Feature extraction error: {e}")
             # Return default safe values
-            return [1.0, 100.0, 100.0, 1000.0, 5.0, 7.0, 50.0, 0, 1, 0.1, 0.2, 0.1]
+            return np.array([[1.0, 100.0, 100.0, 1000.0, 5.0, 7.0, 50.0, 0, 1, 0.1, 0.2, 0.1]], dtype=np.float32)
     
     def _calculate_route_length(self, waypoints: List[Waypoint]) -> float:
         """Calculate total route length in kilometers"""
-        total_distance = 0.0
-        for i in range(len(waypoints) - 1):
-            coord1 = (waypoints[i].lat, waypoints[i].lng)
-            coord2 = (waypoints[i + 1].lat, waypoints[i + 1].lng)
-            total_distance += geodesic(coord1, coord2).kilometers
-        return total_distance
-    
-    def _min_distance_to_restricted_areas(self, waypoints: List[Waypoint]) -> float:
-        """Calculate minimum distance to known restricted areas"""
-        # Mock restricted areas (airports, military zones)
-        restricted_zones = [
-            (37.621311, -122.378968),  # SFO Airport
-            (37.759859, -122.447151),  # Mock military base
-        ]
-        
-        min_distance = float('inf')
-        for wp in waypoints:
-            for zone_lat, zone_lng in restricted_zones:
-                coord1 = (wp.lat, wp.lng)
-                coord2 = (zone_lat, zone_lng)
-                distance = geodesic(coord1, coord2).meters
-                min_distance = min(min_distance, distance)
+        return route_length_m(waypoints) / 1000.0
+    
+    def _min_distance_to_restricted_areas(self, coords: np.ndarray) -> float:
+        """Calculate minimum distance to known restricted areas from Mission.route_array() coords"""
+        if len(coords) == 0:
+            return 10000.0
         
-        return min_distance if min_distance != float('inf') else 10000.0
+        distances = haversine_to_points_rad_m(
+            coords[:, 0] * DEG2RAD, coords[:, 1] * DEG2RAD, RESTRICTED_ZONE_LATS_RAD, RESTRICTED_ZONE_LNGS_RAD
+        )
+        return float(distances.min())
     
-    def _calculate_battery_margin(self, mission: Mission) -> float:
-        """Calculate estimated battery margin for mission"""
-        route_length = self._calculate_route_length(mission.waypoints)
+    def _calculate_battery_margin(self, mission: Mission, route_length: Optional[float] = None,
+                                  max_altitude: Optional[float] = None) -> float:
+        """Calculate estimated battery margin for mission, reusing route_length (km) and max_altitude if already known"""
+        if route_length is None:
+            route_length = self._calculate_route_length(mission.waypoints)
+        if max_altitude is None:
+            max_altitude = float(mission.route_array()[:, 2].max())
         
         # Simple energy consumption model
         base_consumption = 2.0  # %/km
-        altitude_factor = max(mission.waypoints, key=lambda w: w.altitude).altitude / 100.0
+        altitude_factor = max_altitude / 100.0
         wind_factor = 1.0
         
         if mission.weather_conditions:
@@ -358,112 +686,23 @@ class RiskPredictor:
         
         return max(0.0, battery_margin)
     
-    def _count_waypoints_over_buildings(self, waypoints: List[Waypoint]) -> int:
-        """Count waypoints over urban/building areas (mock implementation)"""
-        count = 0
-        for wp in waypoints:
-            # Mock urban area detection (SF downtown area)
-            if (37.77 < wp.lat < 37.79) and (-122.42 < wp.lng < -122.40):
-                count += 1
-        return count
-    
-    def _check_line_of_sight(self, waypoints: List[Waypoint]) -> bool:
-        """Check if route maintains line of sight (simplified)"""
-        if len(waypoints) < 2:
-            return True
-        
-        # Check if any waypoint is too far from others
-        max_segment_length = 5.0  # km
-        for i in range(len(waypoints) - 1):
-            coord1 = (waypoints[i].lat, waypoints[i].lng)
-            coord2 = (waypoints[i + 1].lat, waypoints[i + 1].lng)
-            if geodesic(coord1, coord2).kilometers > max_segment_length:
-                return False
-        
-        return True
-    
-    def _calculate_terrain_roughness(self, waypoints: List[Waypoint]) -> float:
-        """Calculate terrain roughness along route (mock implementation)"""
-        # Mock terrain data based on location
-        roughness_sum = 0.0
-        for wp in waypoints:
-            # Higher roughness near mountains/hills (mock SF hills)
-            if (37.75 < wp.lat < 37.78) and (-122.45 < wp.lng < -122.42):
-                roughness_sum += 0.8
-            else:
-                roughness_sum += 0.2
-        
-        return roughness_sum / len(waypoints) if waypoints else 0.0
-    
-    def _calculate_route_complexity(self, mission: Mission) -> float:
-        """Calculate route complexity based on turns and waypoint density"""
-        waypoints = mission.waypoints
-        if len(waypoints) < 3:
-            return 0.1
-        
-        # Calculate turn angles
-        total_turn_angle = 0.0
-        for i in range(1, len(waypoints) - 1):
-            # Simplified turn angle calculation
-            prev_wp = waypoints[i - 1]
-            curr_wp = waypoints[i]
-            next_wp = waypoints[i + 1]
-            
-            # Calculate vectors
-            vec1_lat = curr_wp.lat - prev_wp.lat
-            vec1_lng = curr_wp.lng - prev_wp.lng
-            vec2_lat = next_wp.lat - curr_wp.lat
-            vec2_lng = next_wp.lng - curr_wp.lng
-            
-            # Simple turn detection (change in direction)
-            turn_factor = abs(vec1_lat - vec2_lat) + abs(vec1_lng - vec2_lng)
-            total_turn_angle += turn_factor
-        
-        route_length = self._calculate_route_length(waypoints)
-        complexity = (total_turn_angle * 100 + len(waypoints)) / max(1.0, route_length)
-        
-        return min(1.0, complexity)
-    
     def _fallback_risk_calculation(self, mission: Mission) -> float:
         """Simple rule-based risk calculation when ML model is not available"""
-        risk_score = 0.0
-        
-        # Route length risk
+        return float(_rule_based_risk(*self._fallback_risk_factors(mission)))
+    
+    def _fallback_risk_factors(self, mission: Mission) -> Tuple[float, float, float, float]:
+        """(route_length_km, battery_margin, wind_speed, min_distance_to_no_fly) for _rule_based_risk"""
         route_length = self._calculate_route_length(mission.waypoints)
-        if route_length > 10:
-            risk_score += 0.3
-        elif route_length > 5:
-            risk_score += 0.1
-        
-        # Battery risk
-        battery_margin = self._calculate_battery_margin(mission)
-        if battery_margin < 10:
-            risk_score += 0.4
-        elif battery_margin < 20:
-            risk_score += 0.2
-        
-        # Weather risk
-        if mission.weather_conditions:
-            wind_speed = mission.weather_conditions.get('wind_speed', 0)
-            if wind_speed > 15:
-                risk_score += 0.3
-            elif wind_speed > 10:
-                risk_score += 0.1
-        
-        # Restricted area risk
-        min_distance = self._min_distance_to_restricted_areas(mission.waypoints)
-        if min_distance < 500:
-            risk_score += 0.4
-        elif min_distance < 1000:
-            risk_score += 0.2
-        
-        return min(1.0, risk_score)
+        battery_margin = self._calculate_battery_margin(mission, route_length)
+        wind_speed = mission.weather_conditions.get('wind_speed', 0) if mission.weather_conditions else 0
+        min_distance = self._min_distance_to_restricted_areas(mission.route_array())
+        return route_length, battery_margin, wind_speed, min_distance
     
     def _fallback_risk_explanation(self, mission: Mission) -> Dict[str, float]:
         """Fallback risk explanation when SHAP is not available"""
         route_length = self._calculate_route_length(mission.waypoints)
-        battery_margin = self._calculate_battery_margin(mission)
-        min_distance = self._min_distance_to_restricted_areas(mission.waypoints)
+        battery_margin = self._calculate_battery_margin(mission, route_length)
+        min_distance = self._min_distance_to_restricted_areas(mission.route_array())
         
         wind_speed = 0
         if mission.weather_conditions:
@@ -480,4 +719,9 @@ class RiskPredictor:
     
     def is_loaded(self) -> bool:
         """Check if model is properly loaded"""
-        return self.model is not None
\ No newline at end of file
+        return self.model is not None
+
+@lru_cache(maxsize=None)
+def get_predictor() -> RiskPredictor:
+    """Process-wide RiskPredictor; loading or training the model is too slow to repeat per request"""
+    return RiskPredictor()
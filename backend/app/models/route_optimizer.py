@@ -1,44 +1,225 @@
 # backend/app/models/route_optimizer.py
 import numpy as np
-import heapq
-from typing import List, Dict, Tuple, Optional, Set
-from dataclasses import dataclass
+from typing import List, Dict, Tuple, Optional, Union
 import logging
-from geopy.distance import geodesic
 import math
 
-from .risk_model import Mission, Waypoint, RiskPredictor
+from .risk_model import HILLS_BBOX, URBAN_BBOX, Mission, Waypoint, RiskPredictor
+from . import _route_kernels as kernels
+from ..core.geo import DEG2RAD, EARTH_RADIUS_M, haversine_pair_m, haversine_point_m
+from ..core.geo_numba import haversine_path
 
-@dataclass
-class Node:
-    lat: float
-    lng: float
-    altitude: float
-    g_cost: float = float('inf')  # Cost from start
-    h_cost: float = 0.0           # Heuristic cost to goal
-    f_cost: float = float('inf')  # Total cost
-    parent: Optional['Node'] = None
+# Neighbor moves as (dlat, dlng, dalt) grid steps: 8-directional + altitude changes
+DIRECTIONS = np.array([
+    (-1, -1, 0), (-1, 0, 0), (-1, 1, 0),
+    (0, -1, 0),              (0, 1, 0),
+    (1, -1, 0),  (1, 0, 0),  (1, 1, 0),
+    # Altitude changes
+    (0, 0, -1), (0, 0, 1)
+], dtype=np.float64)
+
+MIN_ALTITUDE = 50  # meters
+
+# Legs longer than this are searched from both ends at once
+BIDIRECTIONAL_MIN_DISTANCE = 2000  # meters
+
+# The two searches grow their own grids, so they meet where settled nodes of each come within
+# MEETING_DISTANCE and MEETING_ALTITUDE of one another, over an extra crossing edge; the tolerance
+# spans the coarsest grid step (5 * 0.001 degrees, 5 * 20 m), so overlapping frontiers always meet
+MEETING_DISTANCE = 400  # meters
+MEETING_ALTITUDE = 100  # meters
+MEETING_CELL = 0.005  # degrees, buckets of settled nodes searched for meetings
+
+# Jump point search, opt-in with RouteOptimizer(jump_point_search=True): a straight run of at
+# most JPS_MAX_JUMP grid steps replaces the full neighbor set when the model rates the run below
+# JPS_MAX_RISK. It expands fewer nodes but can return a costlier route than full expansion
+JPS_MAX_JUMP = 8
+JPS_MAX_RISK = 0.5
+
+# Edge risks are interpolated from a grid of model risk scores built once per leg, spanning
+# the leg's bounding box plus RISK_GRID_MARGIN of its length (at least RISK_GRID_MIN_MARGIN)
+# on each side, and altitudes up to RISK_GRID_HEADROOM above its higher end, which is
+# also as high as the search climbs
+RISK_GRID_CELL = (0.002, 0.002, 50.0)  # lat/lng degrees, altitude meters
+RISK_GRID_MARGIN = 0.5
+RISK_GRID_MIN_MARGIN = 1000  # meters
+RISK_GRID_HEADROOM = 200  # meters
+
+# Larger grids get wider lat/lng cells to stay within RISK_GRID_MAX_POINTS; legs that would
+# need cells wider than RISK_GRID_MAX_CELL degrees score each edge with the model instead
+RISK_GRID_MAX_POINTS = 100_000
+RISK_GRID_MAX_CELL = 0.01
+
+# Mock no-fly zones as (lat, lng, radius in meters)
+NO_FLY_ZONES = (
+    (37.621311, -122.378968, 2000),  # SFO Airport, 2km radius
+    (37.759859, -122.447151, 1000),  # Mock military base, 1km radius
+)
+
+# Search positions are plain (lat, lng, altitude) tuples; Waypoints are only
+# built for the returned route
+Position = Tuple[float, float, float]
+
+# Most neighbors one expansion generates: DIRECTIONS plus the goal itself
+MAX_NEIGHBORS = len(DIRECTIONS) + 1
+
+def _grid_axis(low: float, high: float, step: float) -> np.ndarray:
+    """Evenly spaced points from low past high, at least two"""
+    return low + step * np.arange(max(2, math.ceil((high - low) / step) + 1))
+
+def position_key(position: Position) -> Tuple[int, int, int]:
+    """Integer key of a position: microdegrees of lat/lng and decimeters of altitude"""
+    lat, lng, altitude = position
+    return (round(lat * 1e6), round(lng * 1e6), round(altitude * 10))
+
+class RiskGrid:
+    """Model risk scores on a regular (lat, lng, altitude) grid, as read by the grid_risk kernel"""
     
-    def __hash__(self):
-        return hash((round(self.lat, 6), round(self.lng, 6), round(self.altitude, 1)))
+    __slots__ = ("values", "origin", "cell")
     
-    def __eq__(self, other):
-        if not isinstance(other, Node):
-            return False
-        return (round(self.lat, 6) == round(other.lat, 6) and 
-                round(self.lng, 6) == round(other.lng, 6) and
-                round(self.altitude, 1) == round(other.altitude, 1))
+    def __init__(self, values: np.ndarray, origin: Tuple[float, float, float], cell: Tuple[float, float, float]):
+        self.values = values  # (n_lat, n_lng, n_alt) scores
+        self.origin = origin  # First grid point
+        self.cell = cell  # Grid spacing
     
-    def __lt__(self, other):
-        return self.f_cost < other.f_cost
+    def edge_risks(self, position: Position, coords: np.ndarray, k: int, out: np.ndarray, reverse: bool = False):
+        """Fill out with the risk of the edge between position and each of the first k coords rows"""
+        kernels.edge_risks(self.values, self.origin, self.cell, *position, coords, k, out)
+
+class SegmentRisks:
+    """Model risk scores of each edge as it is expanded, for legs too long for a RiskGrid"""
+    
+    __slots__ = ("mission", "risk_predictor")
+    
+    def __init__(self, mission: Mission, risk_predictor: RiskPredictor):
+        self.mission = mission
+        self.risk_predictor = risk_predictor
+    
+    def edge_risks(self, position: Position, coords: np.ndarray, k: int, out: np.ndarray, reverse: bool = False):
+        """
+        Fill out with the risk of the edge from position to each of the first k coords rows,
+        or from each row to position if reverse, scored in one batched model call
+        """
+        to_coords = coords[:k]
+        from_coords = np.broadcast_to(np.array(position), to_coords.shape)
+        if reverse:
+            from_coords, to_coords = to_coords, from_coords
+        try:
+            out[:k] = self.risk_predictor.predict_segments_batch(from_coords, to_coords, self.mission)
+        except Exception as e:
+            logging.warning(f"Risk prediction failed for segments: {e}")
+            out[:k] = 0.3  # Default moderate risk
+
+# Where a leg's edge risks come from
+EdgeRisks = Union[RiskGrid, SegmentRisks]
+
+class _AStarGraph:
+    """
+    Nodes of one A* search as preallocated parallel arrays identified by integer
+    index, with the open heap over them, for the compiled kernels in _route_kernels
+    Every expansion adds at most MAX_NEIGHBORS nodes, so an expansion budget bounds the capacity
+    """
+    
+    __slots__ = ("coords", "g", "parent_idx", "closed", "penalty", "heap_f", "heap_i", "counts", "index",
+                 "neighbor_coords", "distances", "h_costs", "cells", "risks")
+    
+    def __init__(self, max_expansions: int):
+        capacity = max_expansions * MAX_NEIGHBORS + 1
+        self.coords = np.empty((capacity, 3))  # [lat, lng, altitude] rows
+        self.g = np.empty(capacity)  # Cost from the root
+        self.parent_idx = np.empty(capacity, dtype=np.int32)
+        self.closed = np.empty(capacity, dtype=bool)
+        self.penalty = np.empty(capacity)  # Terrain and no-fly penalty for ending an edge here
+        self.heap_f = np.empty(capacity)  # Open heap of (f_cost, node index) entries
+        self.heap_i = np.empty(capacity, dtype=np.int64)
+        self.counts = np.zeros(2, dtype=np.int64)  # Nodes and heap entries in use
+        self.index = kernels.new_index()  # Position key -> node index
+        
+        # Scratch rows for the candidate successors of the node being expanded: the
+        # neighbors plus a jump point, of which one set or the other is relaxed
+        self.neighbor_coords = np.empty((MAX_NEIGHBORS + 1, 3))
+        self.distances = np.empty(MAX_NEIGHBORS + 1)
+        self.h_costs = np.empty(MAX_NEIGHBORS + 1)
+        self.cells = np.empty(MAX_NEIGHBORS + 1)  # Grid steps each edge stands for
+        self.risks = np.empty(MAX_NEIGHBORS + 1)
+    
+    def insert(self, position: Position, penalty_args: Tuple) -> int:
+        return kernels.insert(self.index, self.coords, self.g, self.parent_idx, self.closed, self.penalty,
+                              self.counts, *position, *penalty_args)
+    
+    def position(self, i: int) -> Position:
+        return tuple(self.coords[i].tolist())
+
+class SearchFrontier:
+    """State of one A* search rooted at one end of a leg; bidirectional search runs two"""
+    
+    __slots__ = ("graph", "root", "target", "max_altitude", "cells")
+    
+    def __init__(self, root: Position, target: Position, h_cost: float, max_expansions: int, penalty_args: Tuple):
+        self.graph = graph = _AStarGraph(max_expansions)
+        self.root = graph.insert(root, penalty_args)
+        graph.g[self.root] = 0.0
+        kernels.heap_push(graph.heap_f, graph.heap_i, graph.counts, h_cost, self.root)
+        self.target = target
+        self.max_altitude = max(root[2], target[2]) + RISK_GRID_HEADROOM
+        self.cells: Dict[Tuple[int, int], List[int]] = {}  # Settled nodes by meeting cell
+    
+    def open_count(self) -> int:
+        return int(self.graph.counts[kernels.COUNT_HEAP])
+    
+    def top_f(self) -> float:
+        return float(self.graph.heap_f[0]) if self.open_count() else float('inf')
+    
+    def pop(self) -> Optional[int]:
+        """Index of the open node with the lowest f_cost, or None if it was already settled more cheaply"""
+        graph = self.graph
+        i = kernels.pop_open(graph.heap_f, graph.heap_i, graph.counts, graph.closed)
+        return None if i < 0 else i
+    
+    def settle(self, i: int):
+        self.graph.closed[i] = True
+        lat, lng = self.graph.coords[i, :2].tolist()
+        cell = (round(lat / MEETING_CELL), round(lng / MEETING_CELL))
+        self.cells.setdefault(cell, []).append(i)
+    
+    def settled_near(self, position: Position) -> List[int]:
+        """Settled nodes in the meeting cells within MEETING_DISTANCE of position, and some beyond"""
+        lat_cell = round(position[0] / MEETING_CELL)
+        lng_cell = round(position[1] / MEETING_CELL)
+        cell_m = MEETING_CELL * EARTH_RADIUS_M * DEG2RAD
+        lat_reach = math.ceil(MEETING_DISTANCE / cell_m)
+        lng_reach = math.ceil(MEETING_DISTANCE / (cell_m * math.cos(position[0] * DEG2RAD)))
+        nearby = []
+        for dlat in range(-lat_reach, lat_reach + 1):
+            for dlng in range(-lng_reach, lng_reach + 1):
+                nearby.extend(self.cells.get((lat_cell + dlat, lng_cell + dlng), ()))
+        return nearby
+    
+    def path(self, i: int) -> np.ndarray:
+        """(n, 3) [lat, lng, altitude] rows of the path from the root to node i"""
+        return self.graph.coords[kernels.path_indices(self.graph.parent_idx, i)]
 
 class RouteOptimizer:
     """A* based route optimizer with risk-aware costs"""
     
-    def __init__(self):
+    def __init__(self, jump_point_search: bool = False):
         self.grid_resolution = 0.001  # degrees (~100m at equator)
         self.altitude_resolution = 20  # meters
         self.risk_weight = 2.0  # How much to weight risk vs distance
+        self.max_jump = JPS_MAX_JUMP if jump_point_search else 0  # 0 expands every neighbor
+        
+        # No-fly zone centers projected once onto a local flat-earth x/y plane in
+        # meters, described by (lat0, lng0, lng_scale, lat_scale), for cheap proximity checks
+        zones = np.array(NO_FLY_ZONES, dtype=np.float64)
+        lat0 = float(zones[:, 0].mean())
+        lng0 = float(zones[:, 1].mean())
+        self._projection = (lat0, lng0, EARTH_RADIUS_M * DEG2RAD * math.cos(lat0 * DEG2RAD), EARTH_RADIUS_M * DEG2RAD)
+        self._zones_x = (zones[:, 1] - lng0) * self._projection[2]
+        self._zones_y = (zones[:, 0] - lat0) * self._projection[3]
+        self._zone_radii = zones[:, 2]
+        
+        # Trailing arguments of the kernels that penalize where an edge ends
+        self._penalty_args = (URBAN_BBOX, HILLS_BBOX, self._projection, self._zones_x, self._zones_y, self._zone_radii)
         
     def optimize_route(self, mission: Mission, risk_predictor: RiskPredictor) -> List[Waypoint]:
         """
@@ -57,7 +238,7 @@ class RouteOptimizer:
                 goal = mission.waypoints[i + 1]
                 
                 # Find optimal path between consecutive waypoints
-                optimal_segment = self._find_optimal_path(
+                optimal_segment = self._find_path(
                     start, goal, mission, risk_predictor
                 )
                 
@@ -71,216 +252,238 @@ class RouteOptimizer:
             logging.error(f"Route optimization failed: {e}")
             return mission.waypoints  # Return original route on failure
     
-    def _find_optimal_path(self, start: Waypoint, goal: Waypoint, 
-                          mission: Mission, risk_predictor: RiskPredictor) -> List[Waypoint]:
-        """Find optimal path between two waypoints using A*"""
-        
-        # Convert to nodes
-        start_node = Node(start.lat, start.lng, start.altitude)
-        goal_node = Node(goal.lat, goal.lng, goal.altitude)
+    def _find_path(self, start: Waypoint, goal: Waypoint,
+                   mission: Mission, risk_predictor: RiskPredictor) -> List[Waypoint]:
+        """
+        Score the leg's risk grid, then search; long legs are searched from both ends,
+        where two small frontiers beat one wide one
+        """
+        leg_distance = haversine_point_m(start.lat, start.lng, goal.lat, goal.lng)
+        risk_grid = self._build_risk_grid(start, goal, leg_distance, mission, risk_predictor)
+        edge_risks = risk_grid if risk_grid is not None else SegmentRisks(mission, risk_predictor)
+        if leg_distance > BIDIRECTIONAL_MIN_DISTANCE:
+            return self._find_optimal_path_bidirectional(start, goal, edge_risks)
+        return self._find_optimal_path(start, goal, edge_risks)
+    
+    def _build_risk_grid(self, start: Waypoint, goal: Waypoint, leg_distance: float,
+                         mission: Mission, risk_predictor: RiskPredictor) -> Optional[RiskGrid]:
+        """
+        Score the points of a grid around the leg in one model call, each as a leg one
+        RISK_GRID_CELL long heading the leg's way, flown under the mission's battery and weather
+        Returns None if the grid would need cells wider than RISK_GRID_MAX_CELL to stay
+        within RISK_GRID_MAX_POINTS
+        """
+        lat_margin = max(RISK_GRID_MIN_MARGIN, RISK_GRID_MARGIN * leg_distance) / (EARTH_RADIUS_M * DEG2RAD)
+        lng_margin = lat_margin / math.cos(max(abs(start.lat), abs(goal.lat)) * DEG2RAD)
+        lat_range = (min(start.lat, goal.lat) - lat_margin, max(start.lat, goal.lat) + lat_margin)
+        lng_range = (min(start.lng, goal.lng) - lng_margin, max(start.lng, goal.lng) + lng_margin)
+        altitude_axis = _grid_axis(min(MIN_ALTITUDE, start.altitude, goal.altitude),
+                                   max(start.altitude, goal.altitude) + RISK_GRID_HEADROOM, RISK_GRID_CELL[2])
+        
+        # Past the cap, widen the lat/lng cells by the square root of the overshoot
+        lat_cell, lng_cell = RISK_GRID_CELL[0], RISK_GRID_CELL[1]
+        n_points = ((lat_range[1] - lat_range[0]) / lat_cell + 1) * ((lng_range[1] - lng_range[0]) / lng_cell + 1) \
+            * len(altitude_axis)
+        if n_points > RISK_GRID_MAX_POINTS:
+            scale = math.sqrt(n_points / RISK_GRID_MAX_POINTS) * 1.05  # Headroom for axes rounding up
+            lat_cell, lng_cell = lat_cell * scale, lng_cell * scale
+        axes = (_grid_axis(*lat_range, lat_cell), _grid_axis(*lng_range, lng_cell), altitude_axis)
+        shape = tuple(len(axis) for axis in axes)
+        if max(lat_cell, lng_cell) > RISK_GRID_MAX_CELL or math.prod(shape) > RISK_GRID_MAX_POINTS:
+            logging.info(f"Leg of {leg_distance:.0f} m is too long for a risk grid, scoring edges individually")
+            return None
+        
+        # Zero-length legs are outside what the model was trained on, so each point is scored
+        # as the start of a short leg in the direction of flight
+        heading = np.array([goal.lat - start.lat, goal.lng - start.lng])
+        norm = float(np.hypot(*heading))
+        heading = heading / norm if norm > 0 else np.array([1.0, 0.0])
+        from_points = np.stack(np.meshgrid(*axes, indexing="ij"), axis=-1).reshape(-1, 3)
+        to_points = from_points.copy()
+        to_points[:, :2] += heading * RISK_GRID_CELL[0]
+        try:
+            risks = risk_predictor.predict_segments_batch(from_points, to_points, mission, cache=False)
+        except Exception as e:
+            logging.warning(f"Risk prediction failed for the risk grid: {e}")
+            risks = np.full(len(from_points), 0.3)  # Default moderate risk
         
-        # Initialize costs
-        start_node.g_cost = 0
-        start_node.h_cost = self._heuristic_cost(start_node, goal_node)
-        start_node.f_cost = start_node.h_cost
+        values = np.ascontiguousarray(risks, dtype=np.float64).reshape(shape)
+        return RiskGrid(values, tuple(float(axis[0]) for axis in axes), (lat_cell, lng_cell, RISK_GRID_CELL[2]))
+    
+    def _find_optimal_path(self, start: Waypoint, goal: Waypoint, edge_risks: EdgeRisks) -> List[Waypoint]:
+        """Find optimal path between two waypoints using A*"""
         
-        # A* algorithm
-        open_set = [start_node]
-        closed_set: Set[Node] = set()
+        start_position = (start.lat, start.lng, start.altitude)
+        goal_position = (goal.lat, goal.lng, goal.altitude)
         
         max_iterations = 1000  # Prevent infinite loops
         iterations = 0
         
-        while open_set and iterations < max_iterations:
+        # A* algorithm
+        frontier = SearchFrontier(start_position, goal_position, self._heuristic_cost(start_position, goal_position),
+                                  max_iterations, self._penalty_args)
+        
+        while frontier.open_count() and iterations < max_iterations:
+            # Get position with lowest f_cost
+            i = frontier.pop()
+            if i is None:
+                continue  # Stale entry for a position already settled more cheaply
             iterations += 1
-            
-            # Get node with lowest f_cost
-            current = heapq.heappop(open_set)
+            current = frontier.graph.position(i)
             
             # Check if we reached the goal
-            if self._is_goal_reached(current, goal_node):
-                path = self._reconstruct_path(current)
-                return [Waypoint(node.lat, node.lng, node.altitude) for node in path]
-            
-            closed_set.add(current)
-            
-            # Explore neighbors
-            neighbors = self._get_neighbors(current, goal_node)
+            if self._is_goal_reached(current, goal_position):
+                path = self._reconstruct_path(frontier, i)
+                return [Waypoint(lat, lng, altitude) for lat, lng, altitude in path.tolist()]
             
-            for neighbor in neighbors:
-                if neighbor in closed_set:
-                    continue
-                
-                # Calculate costs
-                tentative_g_cost = current.g_cost + self._calculate_edge_cost(
-                    current, neighbor, mission, risk_predictor
-                )
-                
-                if neighbor not in [node for node in open_set]:
-                    neighbor.h_cost = self._heuristic_cost(neighbor, goal_node)
-                    heapq.heappush(open_set, neighbor)
-                elif tentative_g_cost >= neighbor.g_cost:
-                    continue
-                
-                # This path to neighbor is better
-                neighbor.parent = current
-                neighbor.g_cost = tentative_g_cost
-                neighbor.f_cost = neighbor.g_cost + neighbor.h_cost
+            frontier.settle(i)
+            self._expand(frontier, i, current, edge_risks)
         
         # If no path found, return direct path
         logging.warning("A* failed to find optimal path, using direct route")
         return [start, goal]
     
-    def _get_neighbors(self, node: Node, goal: Node) -> List[Node]:
-        """Generate neighboring nodes for exploration"""
-        neighbors = []
-        
-        # Define movement directions (8-directional + altitude changes)
-        directions = [
-            (-1, -1, 0), (-1, 0, 0), (-1, 1, 0),
-            (0, -1, 0),              (0, 1, 0),
-            (1, -1, 0),  (1, 0, 0),  (1, 1, 0),
-            # Altitude changes
-            (0, 0, -1), (0, 0, 1)
-        ]
-        
-        # Adaptive step size based on distance to goal
-        distance_to_goal = geodesic((node.lat, node.lng), (goal.lat, goal.lng)).meters
-        
-        if distance_to_goal > 5000:  # > 5km, use larger steps
-            step_multiplier = 5.0
-        elif distance_to_goal > 1000:  # > 1km, use medium steps
-            step_multiplier = 2.0
-        else:  # < 1km, use fine steps
-            step_multiplier = 1.0
-        
-        lat_step = self.grid_resolution * step_multiplier
-        lng_step = self.grid_resolution * step_multiplier
-        alt_step = self.altitude_resolution * step_multiplier
-        
-        for dlat, dlng, dalt in directions:
-            new_lat = node.lat + dlat * lat_step
-            new_lng = node.lng + dlng * lng_step
-            new_alt = max(50, node.altitude + dalt * alt_step)  # Min altitude 50m
+    def _find_optimal_path_bidirectional(self, start: Waypoint, goal: Waypoint, edge_risks: EdgeRisks) -> List[Waypoint]:
+        """
+        Find optimal path between two waypoints with A* run forward from the start
+        and backward from the goal, stopping once the frontiers can't beat the best meeting
+        """
+        start_position = (start.lat, start.lng, start.altitude)
+        goal_position = (goal.lat, goal.lng, goal.altitude)
+        
+        max_expansions = 20000  # Prevent runaway searches, shared by both directions
+        expansions = 0
+        
+        h_cost = self._heuristic_cost(start_position, goal_position)
+        forward = SearchFrontier(start_position, goal_position, h_cost, max_expansions, self._penalty_args)
+        backward = SearchFrontier(goal_position, start_position, h_cost, max_expansions, self._penalty_args)
+        
+        # Best meeting so far as (forward node, backward node) indices
+        best_cost = float('inf')
+        meeting: Optional[Tuple[int, int]] = None
+        
+        while expansions < max_expansions:
+            forward_open = forward.open_count()
+            backward_open = backward.open_count()
+            if not forward_open or not backward_open:
+                break
+            if forward.top_f() + backward.top_f() >= best_cost:
+                break
             
-            neighbor = Node(new_lat, new_lng, new_alt)
-            neighbors.append(neighbor)
-        
-        # Also add direct path to goal if close enough
-        if distance_to_goal < 2000:  # Within 2km
-            goal_neighbor = Node(goal.lat, goal.lng, goal.altitude)
-            neighbors.append(goal_neighbor)
-        
-        return neighbors
-    
-    def _calculate_edge_cost(self, from_node: Node, to_node: Node, 
-                           mission: Mission, risk_predictor: RiskPredictor) -> float:
-        """Calculate cost of moving from one node to another"""
-        
-        # Physical distance cost
-        coord1 = (from_node.lat, from_node.lng)
-        coord2 = (to_node.lat, to_node.lng)
-        distance = geodesic(coord1, coord2).meters
-        
-        # Altitude change cost
-        altitude_change = abs(to_node.altitude - from_node.altitude)
-        altitude_cost = altitude_change * 0.1  # Penalty for altitude changes
-        
-        # Risk cost - create a mini mission for this segment
-        segment_waypoints = [
-            Waypoint(from_node.lat, from_node.lng, from_node.altitude),
-            Waypoint(to_node.lat, to_node.lng, to_node.altitude)
-        ]
-        
-        segment_mission = Mission(
-            waypoints=segment_waypoints,
-            battery_capacity=mission.battery_capacity,
-            max_speed=mission.max_speed,
-            weather_conditions=mission.weather_conditions
-        )
-        
-        try:
-            risk_score = risk_predictor.predict_mission_risk(segment_mission)
-        except Exception as e:
-            logging.warning(f"Risk prediction failed for segment: {e}")
-            risk_score = 0.3  # Default moderate risk
-        
-        risk_cost = risk_score * distance * self.risk_weight
-        
-        # Additional penalties
-        terrain_penalty = self._calculate_terrain_penalty(to_node)
-        no_fly_penalty = self._calculate_no_fly_penalty(to_node)
-        
-        total_cost = distance + altitude_cost + risk_cost + terrain_penalty + no_fly_penalty
-        
-        return total_cost
+            # Expand the smaller frontier
+            is_forward = forward_open <= backward_open
+            side, other = (forward, backward) if is_forward else (backward, forward)
+            
+            i = side.pop()
+            if i is None:
+                continue  # Stale entry for a position already settled more cheaply
+            side.settle(i)
+            expansions += 1
+            current = side.graph.position(i)
+            
+            cost, j = self._best_meeting(side, i, current, other, edge_risks, is_forward)
+            if cost < best_cost:
+                best_cost = cost
+                meeting = (i, j) if is_forward else (j, i)
+            
+            # The backward search walks edges against the direction of flight
+            self._expand(side, i, current, edge_risks, reverse=not is_forward)
+        
+        if meeting is None:
+            logging.warning("Bidirectional A* failed to find optimal path, using direct route")
+            return [start, goal]
+        
+        # Splice the forward path onto the backward one, reversed to run toward the goal
+        forward_end, backward_end = meeting
+        path = self._reconstruct_path(forward, forward_end).tolist()
+        backward_path = backward.path(backward_end)[::-1].tolist()
+        if position_key(backward_path[0]) == position_key(path[-1]):
+            backward_path = backward_path[1:]
+        path.extend(backward_path)
+        return [Waypoint(lat, lng, altitude) for lat, lng, altitude in path]
     
-    def _calculate_terrain_penalty(self, node: Node) -> float:
-        """Calculate penalty for difficult terrain"""
-        # Mock terrain difficulty based on location
-        # In real implementation, this would use DEM data
-        
-        # Higher penalty for urban areas (more obstacles)
-        if (37.77 < node.lat < 37.79) and (-122.42 < node.lng < -122.40):
-            return 100.0  # San Francisco downtown
-        
-        # Moderate penalty for hills
-        if (37.75 < node.lat < 37.78) and (-122.45 < node.lng < -122.42):
-            return 50.0
-        
-        return 0.0
+    def _best_meeting(self, side: SearchFrontier, i: int, current: Position, other: SearchFrontier,
+                      edge_risks: EdgeRisks, is_forward: bool) -> Tuple[float, int]:
+        """
+        Cost of the cheapest route through settled node i of side and a settled node of other within
+        the meeting tolerance, joined by an edge costed as relax would, and that node's index;
+        (inf, -1) if there is none
+        """
+        nearby = other.settled_near(current)
+        if not nearby:
+            return float('inf'), -1
+        
+        graph = other.graph
+        nodes = np.array(nearby)
+        coords = graph.coords[nodes]
+        distances = haversine_pair_m(current[0], current[1], coords[:, 0], coords[:, 1])
+        altitude_diffs = np.abs(coords[:, 2] - current[2])
+        close = (distances < MEETING_DISTANCE) & (altitude_diffs < MEETING_ALTITUDE)
+        if not close.any():
+            return float('inf'), -1
+        nodes, coords, distances, altitude_diffs = nodes[close], coords[close], distances[close], altitude_diffs[close]
+        
+        # The joining edge runs from the forward node to the backward one, and ends at the
+        # backward node, whose own penalty the backward search leaves out of its costs
+        risks = np.empty(len(nodes))
+        edge_risks.edge_risks(current, coords, len(nodes), risks, not is_forward)
+        end_penalty = graph.penalty[nodes] if is_forward else side.graph.penalty[i]
+        end_penalty = np.where((distances > 0) | (altitude_diffs > 0), end_penalty, 0.0)  # Same position, no edge
+        costs = (graph.g[nodes] + distances + altitude_diffs * 0.1 + risks * distances * self.risk_weight
+                 + end_penalty)
+        best = int(np.argmin(costs))
+        return float(side.graph.g[i] + costs[best]), int(nodes[best])
     
-    def _calculate_no_fly_penalty(self, node: Node) -> float:
-        """Calculate penalty for proximity to no-fly zones"""
-        # Mock no-fly zones
-        no_fly_zones = [
-            (37.621311, -122.378968, 2000),  # SFO Airport, 2km radius
-            (37.759859, -122.447151, 1000),  # Mock military base, 1km radius
-        ]
-        
-        min_distance = float('inf')
-        for zone_lat, zone_lng, zone_radius in no_fly_zones:
-            distance = geodesic((node.lat, node.lng), (zone_lat, zone_lng)).meters
-            
-            if distance < zone_radius:
-                # Inside no-fly zone - very high penalty
-                return 10000.0
-            elif distance < zone_radius * 2:
-                # Near no-fly zone - moderate penalty
-                penalty = 500.0 * (1 - (distance - zone_radius) / zone_radius)
-                min_distance = min(min_distance, penalty)
-        
-        return min_distance if min_distance != float('inf') else 0.0
+    def _expand(self, frontier: SearchFrontier, i: int, current: Position, edge_risks: EdgeRisks,
+                reverse: bool = False):
+        """
+        Relax the edges from settled node i at current to its successors, or from them
+        to it if reverse, in compiled kernels; edge risks come from the leg's risk grid, if it has one
+        With jump point search enabled, where the way in continues as a low-risk straight run,
+        the successors are pruned to its jump point (and the goal)
+        """
+        graph = frontier.graph
+        parent = int(graph.parent_idx[i])
+        parent_lat, parent_lng = graph.coords[parent if parent >= 0 else i, :2]
+        k, n_pruned = kernels.neighbors(
+            *current, parent_lat, parent_lng, graph.penalty[i], *frontier.target, DIRECTIONS,
+            self.grid_resolution, float(self.altitude_resolution), float(MIN_ALTITUDE), float(frontier.max_altitude),
+            self.max_jump,
+            graph.neighbor_coords, graph.distances, graph.h_costs, graph.cells, *self._penalty_args
+        )
+        risks = graph.risks
+        edge_risks.edge_risks(current, graph.neighbor_coords, k, risks, reverse)
+        
+        if n_pruned and risks[0] < JPS_MAX_RISK:
+            rows = slice(0, n_pruned)
+        else:
+            rows = slice(1 if n_pruned else 0, k)  # Every neighbor, without the jump point
+        kernels.relax(
+            i, reverse, graph.neighbor_coords[rows], graph.distances[rows], graph.h_costs[rows], risks[rows],
+            graph.cells[rows], rows.stop - rows.start, self.risk_weight,
+            graph.index, graph.coords, graph.g, graph.parent_idx, graph.closed, graph.penalty,
+            graph.counts, graph.heap_f, graph.heap_i, *self._penalty_args
+        )
     
-    def _heuristic_cost(self, node: Node, goal: Node) -> float:
+    def _heuristic_cost(self, position: Position, goal: Position) -> float:
         """Heuristic cost function (straight-line distance to goal)"""
-        coord1 = (node.lat, node.lng)
-        coord2 = (goal.lat, goal.lng)
-        horizontal_distance = geodesic(coord1, coord2).meters
+        horizontal_distance = haversine_point_m(position[0], position[1], goal[0], goal[1])
         
         # Add altitude difference
-        altitude_distance = abs(goal.altitude - node.altitude)
+        altitude_distance = abs(goal[2] - position[2])
         
         return horizontal_distance + altitude_distance * 0.5
     
-    def _is_goal_reached(self, node: Node, goal: Node) -> bool:
+    def _is_goal_reached(self, position: Position, goal: Position) -> bool:
         """Check if we've reached the goal within tolerance"""
-        distance = geodesic((node.lat, node.lng), (goal.lat, goal.lng)).meters
-        altitude_diff = abs(node.altitude - goal.altitude)
+        distance = haversine_point_m(position[0], position[1], goal[0], goal[1])
+        altitude_diff = abs(position[2] - goal[2])
         
         return distance < 100 and altitude_diff < 50  # 100m horizontal, 50m vertical tolerance
     
-    def _reconstruct_path(self, goal_node: Node) -> List[Node]:
-        """Reconstruct path from goal to start using parent pointers"""
-        path = []
-        current = goal_node
-        
-        while current is not None:
-            path.append(current)
-            current = current.parent
-        
-        path.reverse()
-        return path
+    def _reconstruct_path(self, frontier: SearchFrontier, i: int) -> np.ndarray:
+        """Reconstruct path from the search's root to node i as (n, 3) [lat, lng, altitude] rows"""
+        return frontier.path(i)
     
     def calculate_route_metrics(self, original_route: List[Waypoint], 
                               optimized_route: List[Waypoint],
@@ -288,28 +491,29 @@ class RouteOptimizer:
                               mission: Mission) -> Dict[str, float]:
         """Calculate metrics comparing original vs optimized routes"""
         
-        def route_distance(waypoints):
-            total = 0.0
-            for i in range(len(waypoints) - 1):
-                coord1 = (waypoints[i].lat, waypoints[i].lng)
-                coord2 = (waypoints[i + 1].lat, waypoints[i + 1].lng)
-                total += geodesic(coord1, coord2).kilometers
-            return total
-        
-        def route_risk(waypoints):
-            test_mission = Mission(
+        def route_mission(waypoints):
+            return Mission(
                 waypoints=waypoints,
                 battery_capacity=mission.battery_capacity,
                 max_speed=mission.max_speed,
                 weather_conditions=mission.weather_conditions
             )
-            return risk_predictor.predict_mission_risk(test_mission)
-        
-        original_distance = route_distance(original_route)
-        optimized_distance = route_distance(optimized_route)
         
-        original_risk = route_risk(original_route)
-        optimized_risk = route_risk(optimized_route)
+        def route_distance(route):
+            coords = route.route_array()  # Column-major, so the lat/lng columns are contiguous
+            return haversine_path(coords[:, 0], coords[:, 1]) / 1000.0
+        
+        original = route_mission(original_route)
+        original_distance = route_distance(original)
+        
+        if optimized_route is original_route:
+            # Optimization fell back to the original route; nothing new to measure
+            optimized_distance = original_distance
+            original_risk = optimized_risk = risk_predictor.predict_mission_risk(original)
+        else:
+            optimized = route_mission(optimized_route)
+            optimized_distance = route_distance(optimized)
+            original_risk, optimized_risk = risk_predictor.predict_missions_risk([original, optimized])
         
         return {
             'original_distance_km': original_distance,
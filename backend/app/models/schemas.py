@@ -1,9 +1,11 @@
 # Pydantic schemas for API requests and responses
-from pydantic import BaseModel, Field
-from typing import List, Dict, Optional
+from pydantic import BaseModel, ConfigDict, Field
+from typing import List, Dict, Literal, Optional
 from datetime import datetime
 
 class WaypointInput(BaseModel):
+    model_config = ConfigDict(extra="forbid", frozen=True)
+    
     lat: float = Field(..., ge=-90, le=90, description="Latitude")
     lng: float = Field(..., ge=-180, le=180, description="Longitude")
     altitude: float = Field(100.0, ge=0, le=400, description="Altitude in meters")
@@ -27,6 +29,7 @@ class MissionResponse(BaseModel):
 class SimulationRequest(BaseModel):
     mission_id: str
     speed_multiplier: float = Field(1.0, ge=0.1, le=5.0, description="Simulation speed multiplier")
+    layout: Literal["steps", "columns"] = Field("steps", description="Step objects, or one array per field")
 
 class SimulationResponse(BaseModel):
     mission_id: str
@@ -1,15 +1,24 @@
 # Mission simulator for UAV flight simulation
+import asyncio
+import threading
 import numpy as np
-from typing import List, Dict, Tuple
+from typing import AsyncIterator, Callable, List, Dict, Optional, Tuple
 from dataclasses import dataclass
 import logging
-from geopy.distance import geodesic
 import math
 
 from .risk_model import Mission, Waypoint
+from . import _sim_kernels as kernels
+from ..core.geo import haversine_rad_m
 
-@dataclass
+# Step batches stream_mission's worker thread may build ahead of its consumer
+STREAM_BATCHES_AHEAD = 4
+
+@dataclass(frozen=True)
 class SimulationState:
+    # Explicit __slots__ rather than slots=True, which needs Python 3.10
+    __slots__ = ("timestamp", "position", "velocity", "battery", "risk_level", "speed", "altitude")
+    
     timestamp: float
     position: Waypoint
     velocity: Tuple[float, float, float]  # vx, vy, vz in m/s
@@ -26,55 +35,146 @@ class MissionSimulator:
         self.battery_consumption_rate = 2.0  # %/km base rate
         self.wind_effect_factor = 0.3
         
-    def simulate_mission(self, mission: Mission, speed_multiplier: float = 1.0) -> Dict:
+        # Mock no-fly zones (SFO Airport, mock military base), projected onto a
+        # local flat-earth plane for nearest-zone distances
+        self.no_fly_lats = np.array([37.621311, 37.759859])
+        self.no_fly_lngs = np.array([-122.378968, -122.447151])
+        self._proj_lat0 = float(self.no_fly_lats.mean())
+        self._proj_lng0 = float(self.no_fly_lngs.mean())
+        self._nfz_xy = self._project(self.no_fly_lats, self.no_fly_lngs)
+        # The segment kernel checks the few zones directly, on that plane
+        self._nfz_projection = (
+            self._proj_lat0, self._proj_lng0, kernels.METERS_PER_DEGREE * math.cos(math.radians(self._proj_lat0))
+        )
+        
+    def simulate_mission(self, mission: Mission, speed_multiplier: float = 1.0, layout: str = "steps") -> Dict:
         """
         Simulate complete mission execution
-        Returns detailed simulation data
+        Returns detailed simulation data, as step dicts or, for layout="columns",
+        a single dict of per-field arrays
         """
         try:
-            if len(mission.waypoints) < 2:
-                return {"error": "Mission must have at least 2 waypoints"}
-            
-            simulation_steps = []
-            current_state = self._initialize_simulation(mission)
+            self.validate_mission(mission)
             
-            # Simulate flight between waypoints
-            for i in range(len(mission.waypoints) - 1):
-                start_wp = mission.waypoints[i]
-                end_wp = mission.waypoints[i + 1]
-                
-                segment_steps = self._simulate_segment(
-                    current_state, start_wp, end_wp, mission, speed_multiplier
-                )
-                
-                simulation_steps.extend(segment_steps)
-                
-                # Update state for next segment
-                if segment_steps:
-                    # segment_steps items are SimulationState instances
-                    current_state = segment_steps[-1]
-                
-                # Check for mission failure conditions
-                if current_state.battery <= 0:
-                    logging.warning("Mission failed: Battery depleted")
-                    break
-            
-            # Calculate mission success
-            final_battery = current_state.battery if simulation_steps else 0
-            mission_success = final_battery > 10.0  # Need 10% safety margin
+            states, summary = self._run_simulation(mission, speed_multiplier)
             
-            return {
-                "simulation_steps": [self._state_to_dict(step) for step in simulation_steps],
-                "total_duration": len(simulation_steps) * self.time_step,
-                "success": mission_success,
-                "final_battery": final_battery,
-                "total_distance": self._calculate_total_distance_flown(simulation_steps)
-            }
+            if layout == "columns":
+                return {"simulation_columns": self._states_to_columns(states), **summary}
+            return {"simulation_steps": self._states_to_dicts(states), **summary}
             
         except Exception as e:
             logging.error(f"Simulation error: {e}")
             return {"error": str(e)}
     
+    def validate_mission(self, mission: Mission):
+        """Raise ValueError if the mission can't be simulated"""
+        if len(mission.waypoints) < 2:
+            raise ValueError("Mission must have at least 2 waypoints")
+    
+    async def stream_mission(self, mission: Mission, speed_multiplier: float = 1.0,
+                             batch_size: int = 256) -> AsyncIterator[Dict]:
+        """
+        Simulate mission execution, yielding {"simulation_steps": [...]} batches of
+        at most batch_size steps as each segment is flown, followed by a single summary dict
+        The flight runs in a worker thread that queues the batches, so the event loop stays
+        free; it waits whenever STREAM_BATCHES_AHEAD batches are still unconsumed
+        """
+        self.validate_mission(mission)
+        
+        loop = asyncio.get_running_loop()
+        batches: asyncio.Queue = asyncio.Queue()
+        room = threading.Semaphore(STREAM_BATCHES_AHEAD)
+        closed = threading.Event()
+        
+        def queue_segment(states: np.ndarray) -> bool:
+            # Runs in the worker thread; stops the flight once the stream is closed
+            for start in range(0, states.shape[1], batch_size):
+                room.acquire()
+                if closed.is_set():
+                    return False
+                batch = {"simulation_steps": self._states_to_dicts(states[:, start:start + batch_size])}
+                loop.call_soon_threadsafe(batches.put_nowait, batch)
+            return True
+        
+        flight = asyncio.ensure_future(asyncio.to_thread(self._run_simulation, mission, speed_multiplier, queue_segment))
+        # Queued after every batch the thread sent, so it marks the end of the flight
+        flight.add_done_callback(lambda _: batches.put_nowait(None))
+        try:
+            while True:
+                batch = await batches.get()
+                if batch is None:
+                    break
+                yield batch
+                room.release()
+            _, summary = await flight
+        finally:
+            closed.set()
+            room.release()  # Wakes the thread if it is waiting for room, to see the stream closed
+        
+        yield summary
+    
+    def _run_simulation(self, mission: Mission, speed_multiplier: float,
+                        on_segment: Optional[Callable[[np.ndarray], bool]] = None) -> Tuple[np.ndarray, Dict]:
+        """
+        Fly the mission into a state buffer
+        Returns the (N_COLS, n_steps) buffer and the mission summary
+        on_segment, if given, is called with each segment's (N_COLS, n) steps once they
+        are flown, and ends the flight early by returning False
+        """
+        waypoints = mission.waypoints
+        current_state = self._initialize_simulation(mission)
+        
+        # Convert waypoint coordinates once; distances and velocities reuse them
+        coords = mission.route_array()
+        wp_lat_rad = np.radians(coords[:, 0])
+        wp_lng_rad = np.radians(coords[:, 1])
+        wp_cos_lat = np.cos(wp_lat_rad)
+        
+        # Size the state buffer up front from the per-segment step counts
+        segment_distances = haversine_rad_m(wp_lat_rad, wp_lng_rad, wp_cos_lat)
+        segment_steps = np.maximum(
+            10, (segment_distances / (mission.max_speed * self.time_step * speed_multiplier)).astype(np.int64)
+        )
+        states = np.empty((kernels.N_COLS, int(segment_steps.sum())), dtype=kernels.STATE_DTYPE)
+        
+        battery = current_state.battery
+        timestamp = current_state.timestamp
+        n_steps = 0
+        total_distance = 0.0
+        
+        # Simulate flight between waypoints
+        for i in range(len(waypoints) - 1):
+            written, distance, battery, timestamp = self._simulate_segment(
+                states, n_steps, battery, timestamp, waypoints[i], waypoints[i + 1], float(wp_cos_lat[i]),
+                float(segment_distances[i]), int(segment_steps[i]), mission, speed_multiplier
+            )
+            
+            # Each segment starts where the previous one ended, from the kernel's float64 battery and
+            # timestamp rather than the buffer's rounded copies, so the flown distances simply add up
+            total_distance += distance
+            n_steps += written
+            
+            if on_segment is not None and not on_segment(states[:, n_steps - written:n_steps]):
+                break
+            
+            # Check for mission failure conditions
+            if battery <= 0:
+                logging.warning("Mission failed: Battery depleted")
+                break
+        
+        states = states[:, :n_steps]
+        
+        # Calculate mission success
+        final_battery = float(battery) if n_steps else 0
+        mission_success = final_battery > 10.0  # Need 10% safety margin
+        
+        return states, {
+            "total_duration": n_steps * self.time_step,
+            "success": mission_success,
+            "final_battery": final_battery,
+            "total_distance": total_distance
+        }
+    
     def _initialize_simulation(self, mission: Mission) -> SimulationState:
         """Initialize simulation state"""
         start_wp = mission.waypoints[0]
@@ -89,160 +189,67 @@ class MissionSimulator:
             altitude=start_wp.altitude
         )
     
-    def _simulate_segment(self, start_state: SimulationState, start_wp: Waypoint, 
-                         end_wp: Waypoint, mission: Mission, speed_multiplier: float) -> List[SimulationState]:
-        """Simulate flight segment between two waypoints"""
-        
-        steps = []
-        current_state = start_state
-        
-        # Calculate segment parameters
-        segment_distance = geodesic((start_wp.lat, start_wp.lng), (end_wp.lat, end_wp.lng)).meters
-        altitude_change = end_wp.altitude - start_wp.altitude
-        
-        # Calculate flight path
-        total_steps = max(10, int(segment_distance / (mission.max_speed * self.time_step * speed_multiplier)))
-        
-        for step in range(total_steps):
-            progress = step / (total_steps - 1) if total_steps > 1 else 1.0
-            
-            # Interpolate position
-            current_lat = start_wp.lat + (end_wp.lat - start_wp.lat) * progress
-            current_lng = start_wp.lng + (end_wp.lng - start_wp.lng) * progress
-            current_alt = start_wp.altitude + altitude_change * progress
-            
-            # Calculate current speed and velocity
-            target_speed = mission.max_speed * speed_multiplier
-            
-            # Add wind effects
-            wind_speed = mission.weather_conditions.get('wind_speed', 0) if mission.weather_conditions else 0
-            effective_speed = max(0, target_speed - wind_speed * self.wind_effect_factor)
-            
-            # Calculate battery consumption
-            distance_step = segment_distance / total_steps if total_steps > 0 else 0
-            altitude_factor = 1.0 + abs(altitude_change) / 1000.0  # Penalty for altitude changes
-            wind_factor = 1.0 + wind_speed / 10.0  # Wind resistance
-            
-            battery_consumption = (distance_step / 1000.0) * self.battery_consumption_rate * altitude_factor * wind_factor
-            
-            # Update state
-            current_state = SimulationState(
-                timestamp=current_state.timestamp + self.time_step,
-                position=Waypoint(current_lat, current_lng, current_alt),
-                velocity=self._calculate_velocity(start_wp, end_wp, effective_speed),
-                battery=max(0, current_state.battery - battery_consumption),
-                risk_level=self._calculate_current_risk(Waypoint(current_lat, current_lng, current_alt), mission),
-                speed=effective_speed,
-                altitude=current_alt
-            )
-            
-            steps.append(current_state)
-            
-            # Check for failure conditions
-            if current_state.battery <= 0:
-                break
-        
-        return steps
+    def _simulate_segment(self, states: np.ndarray, offset: int, start_battery: float, start_time: float,
+                         start_wp: Waypoint, end_wp: Waypoint, start_cos_lat: float, segment_distance: float,
+                         total_steps: int, mission: Mission, speed_multiplier: float) -> Tuple[int, float, float, float]:
+        """
+        Simulate flight segment between two waypoints into states[:, offset:]
+        Returns the number of steps written, the distance flown through them, and the battery
+        and timestamp after the last one
+        """
+        wind_speed = mission.weather_conditions.get('wind_speed', 0) if mission.weather_conditions else 0
+        
+        return kernels.run_segment(
+            states, offset,
+            float(start_wp.lat), float(start_wp.lng), float(start_wp.altitude),
+            float(end_wp.lat), float(end_wp.lng), float(end_wp.altitude), start_cos_lat,
+            float(start_battery), float(start_time), segment_distance,
+            mission.max_speed * speed_multiplier, float(wind_speed),
+            self.wind_effect_factor, self.battery_consumption_rate, self.time_step, total_steps,
+            self._nfz_projection, self._nfz_xy[:, 0], self._nfz_xy[:, 1]
+        )
     
-    def _calculate_velocity(self, start_wp: Waypoint, end_wp: Waypoint, speed: float) -> Tuple[float, float, float]:
-        """Calculate velocity vector between waypoints"""
-        distance = geodesic((start_wp.lat, start_wp.lng), (end_wp.lat, end_wp.lng)).meters
-        
-        if distance == 0:
-            return (0.0, 0.0, 0.0)
-        
-        # Simplified velocity calculation (not accounting for Earth curvature)
-        dlat = (end_wp.lat - start_wp.lat) * 111000  # meters per degree lat
-        dlng = (end_wp.lng - start_wp.lng) * 111000 * math.cos(math.radians(start_wp.lat))
-        dalt = end_wp.altitude - start_wp.altitude
-        
-        total_distance = math.sqrt(dlat**2 + dlng**2 + dalt**2)
-        
-        if total_distance == 0:
-            return (0.0, 0.0, 0.0)
-        
-        # Normalize and scale by speed
-        vx = (dlat / total_distance) * speed
-        vy = (dlng / total_distance) * speed
-        vz = (dalt / total_distance) * speed
-        
-        return (vx, vy, vz)
+    def _project(self, lats, lngs) -> np.ndarray:
+        """Project lat/lng onto a local flat-earth x/y plane in meters"""
+        lng_scale = kernels.METERS_PER_DEGREE * math.cos(math.radians(self._proj_lat0))
+        x = (np.asarray(lngs) - self._proj_lng0) * lng_scale
+        y = (np.asarray(lats) - self._proj_lat0) * kernels.METERS_PER_DEGREE
+        return np.column_stack((np.atleast_1d(x), np.atleast_1d(y)))
     
-    def _calculate_current_risk(self, position: Waypoint, mission: Mission) -> float:
-        """Calculate risk at current position"""
-        risk_factors = 0.0
-        
-        # Altitude risk
-        if position.altitude > 200:
-            risk_factors += 0.1
-        if position.altitude < 80:
-            risk_factors += 0.2
-        
-        # Weather risk
-        if mission.weather_conditions:
-            wind_speed = mission.weather_conditions.get('wind_speed', 0)
-            if wind_speed > 12:
-                risk_factors += 0.3
-            elif wind_speed > 8:
-                risk_factors += 0.1
-        
-        # Mock no-fly zone proximity risk
-        no_fly_zones = [
-            (37.621311, -122.378968),  # SFO Airport
-            (37.759859, -122.447151),  # Mock military base
+    def _states_to_dicts(self, states: np.ndarray) -> List[Dict]:
+        """Convert the state buffer to step dictionaries for JSON serialization"""
+        columns = states.tolist()
+        return [
+            {
+                "timestamp": t,
+                "position": {"lat": lat, "lng": lng, "altitude": alt},
+                "velocity": [vx, vy, vz],
+                "battery": battery,
+                "risk_level": risk,
+                "speed": speed
+            }
+            for t, lat, lng, alt, vx, vy, vz, battery, risk, speed in zip(
+                columns[kernels.COL_TIMESTAMP], columns[kernels.COL_LAT], columns[kernels.COL_LNG],
+                columns[kernels.COL_ALT], columns[kernels.COL_VX], columns[kernels.COL_VY],
+                columns[kernels.COL_VZ], columns[kernels.COL_BATTERY], columns[kernels.COL_RISK],
+                columns[kernels.COL_SPEED]
+            )
         ]
-        
-        min_distance = float('inf')
-        for zone_lat, zone_lng in no_fly_zones:
-            distance = geodesic((position.lat, position.lng), (zone_lat, zone_lng)).meters
-            min_distance = min(min_distance, distance)
-        
-        if min_distance < 500:
-            risk_factors += 0.5
-        elif min_distance < 1000:
-            risk_factors += 0.2
-        
-        return min(1.0, risk_factors)
-    
-    def _state_from_step(self, step_dict: Dict) -> SimulationState:
-        """Convert step dictionary back to SimulationState"""
-        pos = step_dict['position']
-        return SimulationState(
-            timestamp=step_dict['timestamp'],
-            position=Waypoint(pos['lat'], pos['lng'], pos['altitude']),
-            velocity=tuple(step_dict['velocity']),
-            battery=step_dict['battery'],
-            risk_level=step_dict['risk_level'],
-            speed=step_dict['speed'],
-            altitude=pos['altitude']
-        )
     
-    def _state_to_dict(self, state: SimulationState) -> Dict:
-        """Convert SimulationState to dictionary for JSON serialization"""
+    def _states_to_columns(self, states: np.ndarray) -> Dict[str, np.ndarray]:
+        """
+        Split the state buffer into per-field float32 arrays, skipping per-step dicts
+        The arrays are views for orjson's numpy support to serialize directly
+        """
         return {
-            "timestamp": state.timestamp,
-            "position": {
-                "lat": state.position.lat,
-                "lng": state.position.lng,
-                "altitude": state.position.altitude
-            },
-            "velocity": list(state.velocity),
-            "battery": state.battery,
-            "risk_level": state.risk_level,
-            "speed": state.speed
+            "timestamp": states[kernels.COL_TIMESTAMP],
+            "lat": states[kernels.COL_LAT],
+            "lng": states[kernels.COL_LNG],
+            "altitude": states[kernels.COL_ALT],
+            "vx": states[kernels.COL_VX],
+            "vy": states[kernels.COL_VY],
+            "vz": states[kernels.COL_VZ],
+            "battery": states[kernels.COL_BATTERY],
+            "risk_level": states[kernels.COL_RISK],
+            "speed": states[kernels.COL_SPEED]
         }
-    
-    def _calculate_total_distance_flown(self, simulation_steps: List[SimulationState]) -> float:
-        """Calculate total distance flown during simulation"""
-        if len(simulation_steps) < 2:
-            return 0.0
-        
-        total_distance = 0.0
-        for i in range(1, len(simulation_steps)):
-            prev_pos = simulation_steps[i-1].position
-            curr_pos = simulation_steps[i].position
-            
-            distance = geodesic((prev_pos.lat, prev_pos.lng), (curr_pos.lat, curr_pos.lng)).meters
-            total_distance += distance
-        
-        return total_distance
@@ -0,0 +1,22 @@
+# Numba kernel for the map service's risk heatmap
+import numpy as np
+from numba import njit
+
+@njit(cache=True, fastmath=True)
+def heatmap_risk(lats, lngs, boxes, deltas, base, out):
+    """
+    Risk at each flat lat/lng point, written into out, which holds its noise on entry
+    Each point gets base, its noise, and the delta of every (min_lng, min_lat, max_lng, max_lat)
+    box strictly containing it, clipped to 0-1
+    """
+    for i in range(lats.shape[0]):
+        lat = lats[i]
+        lng = lngs[i]
+        risk = base
+        for a in range(boxes.shape[0]):
+            if boxes[a, 0] < lng < boxes[a, 2] and boxes[a, 1] < lat < boxes[a, 3]:
+                risk += deltas[a]
+        out[i] = min(1.0, max(0.0, risk + out[i]))
+
+# Compile (or load from cache) now so the first heatmap doesn't pay the JIT cost
+heatmap_risk(np.zeros(1), np.zeros(1), np.zeros((1, 4)), np.zeros(1), 0.0, np.zeros(1))
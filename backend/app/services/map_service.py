@@ -1,45 +1,82 @@
 # Map service for risk heatmaps and no-fly zones
 import numpy as np
-from typing import List, Dict
+import random
+from typing import List, Dict, Tuple
 import logging
 
+from . import _map_kernels as kernels
+
+# Mock no-fly zones - in reality, this would query a real database
+NO_FLY_ZONES = [
+    {
+        "id": "airport_sfo",
+        "name": "San Francisco International Airport",
+        "type": "airport",
+        "coordinates": [
+            [-122.4194, 37.7849],
+            [-122.3894, 37.7849], 
+            [-122.3894, 37.7549],
+            [-122.4194, 37.7549]
+        ],
+        "altitude_restriction": 400,  # feet
+        "severity": "high"
+    },
+    {
+        "id": "military_base_1",
+        "name": "Restricted Military Area",
+        "type": "military",
+        "coordinates": [
+            [-122.45, 37.76],
+            [-122.44, 37.76],
+            [-122.44, 37.75],
+            [-122.45, 37.75]
+        ],
+        "altitude_restriction": 0,
+        "severity": "critical"
+    }
+]
+
+# Mock precipitation rates in mm/hr, drawn with equal weight
+_PRECIPITATION_CHOICES = (0, 0, 0, 0.1, 0.5)
+
+# Zone bounding boxes as (min_lng, min_lat, max_lng, max_lat) rows, in NO_FLY_ZONES order
+_NFZ_BOXES = np.array([
+    (*np.min(zone["coordinates"], axis=0), *np.max(zone["coordinates"], axis=0)) for zone in NO_FLY_ZONES
+])
+
+# Mock risk areas as (min_lng, min_lat, max_lng, max_lat) boxes and the risk each adds
+RISK_AREAS = [
+    {"id": "sf_airports", "bbox": (-122.50, 37.60, -122.30, 37.82), "risk": 0.4},
+    {"id": "sf_urban", "bbox": (-122.50, 37.70, -122.35, 37.80), "risk": 0.2},
+    {"id": "restricted_1", "bbox": (-122.46, 37.75, -122.44, 37.77), "risk": 0.5},
+]
+
+# Area boxes and deltas as arrays for the heatmap kernel
+_RISK_AREA_BOXES = np.array([area["bbox"] for area in RISK_AREAS])
+_RISK_AREA_DELTAS = np.array([area["risk"] for area in RISK_AREAS])
+
+def _boxes_touching(boxes: np.ndarray, north: float, south: float, east: float, west: float) -> np.ndarray:
+    """Indices of the (min_lng, min_lat, max_lng, max_lat) boxes that touch the specified area"""
+    # A vectorized AABB test is enough for a handful of boxes; an R-tree would pay off at thousands
+    min_lng, min_lat, max_lng, max_lat = boxes.T
+    return np.flatnonzero((min_lng <= east) & (max_lng >= west) & (min_lat <= north) & (max_lat >= south))
+
 class MapService:
     """Service for map-related operations"""
     
     def __init__(self):
-        pass
+        self._rng = np.random.default_rng()  # PCG64 generator for bulk noise draws
+        self._scalar_rng = random.Random()  # Per-service generator for one-off scalar draws
     
     async def get_risk_heatmap(self, north: float, south: float, east: float, west: float, zoom: int) -> List[Dict]:
         """Generate risk heatmap for map area"""
         try:
-            # Generate grid points for the bounding box
-            lat_points = np.linspace(south, north, 20)
-            lng_points = np.linspace(west, east, 20)
-            
-            heatmap_data = []
+            lats, lngs, risk = self._heatmap_grid(north, south, east, west)
             
-            for lat in lat_points:
-                for lng in lng_points:
-                    # Mock risk calculation based on location
-                    # In reality, this would use the risk model
-                    base_risk = 0.3
-                    
-                    # Add some realistic risk factors
-                    if self._is_near_airport(lat, lng):
-                        base_risk += 0.4
-                    if self._is_urban_area(lat, lng):
-                        base_risk += 0.2
-                    if self._is_restricted_airspace(lat, lng):
-                        base_risk += 0.5
-                        
-                    risk_score = min(1.0, base_risk + np.random.normal(0, 0.1))
-                    
-                    heatmap_data.append({
-                        "lat": lat,
-                        "lng": lng,
-                        "risk": risk_score,
-                        "intensity": risk_score
-                    })
+            heatmap_data = [
+                {"lat": lat, "lng": lng, "risk": r, "intensity": r}
+                for lat, lng, r in zip(lats.ravel().tolist(), lngs.ravel().tolist(), risk.ravel().tolist())
+            ]
             
             return heatmap_data
             
@@ -47,61 +84,57 @@ class MapService:
             logging.error(f"Heatmap generation error: {str(e)}")
             raise
     
-    async def get_no_fly_zones(self, north: float, south: float, east: float, west: float) -> List[Dict]:
-        """Get no-fly zones in the specified area"""
+    async def get_risk_heatmap_rows(self, north: float, south: float, east: float, west: float,
+                                    zoom: int) -> np.ndarray:
+        """Generate risk heatmap for map area as a float32 (n, 3) array of [lat, lng, risk] rows"""
         try:
-            # Mock no-fly zones - in reality, this would query a real database
-            no_fly_zones = [
-                {
-                    "id": "airport_sfo",
-                    "name": "San Francisco International Airport",
-                    "type": "airport",
-                    "coordinates": [
-                        [-122.4194, 37.7849],
-                        [-122.3894, 37.7849], 
-                        [-122.3894, 37.7549],
-                        [-122.4194, 37.7549]
-                    ],
-                    "altitude_restriction": 400,  # feet
-                    "severity": "high"
-                },
-                {
-                    "id": "military_base_1",
-                    "name": "Restricted Military Area",
-                    "type": "military",
-                    "coordinates": [
-                        [-122.45, 37.76],
-                        [-122.44, 37.76],
-                        [-122.44, 37.75],
-                        [-122.45, 37.75]
-                    ],
-                    "altitude_restriction": 0,
-                    "severity": "critical"
-                }
-            ]
-            
-            return no_fly_zones
+            lats, lngs, risk = self._heatmap_grid(north, south, east, west)
+            return np.stack((lats.ravel(), lngs.ravel(), risk.ravel()), axis=1).astype(np.float32)
             
         except Exception as e:
-            logging.error(f"No-fly zones error: {str(e)}")
+            logging.error(f"Heatmap generation error: {str(e)}")
             raise
     
+    def _heatmap_grid(self, north: float, south: float, east: float, west: float):
+        """Risk over a 20x20 grid of the bounding box, as (lats, lngs, risk) arrays"""
+        # Generate grid points for the bounding box, row-major by latitude
+        lats, lngs = np.meshgrid(
+            np.linspace(south, north, 20), np.linspace(west, east, 20), indexing="ij"
+        )
+        
+        # Mock risk calculation based on location
+        # In reality, this would use the risk model
+        # Only areas touching the view can contain a grid point, so the kernel scans just those
+        risk = self._rng.normal(0, 0.1, size=lats.shape)
+        visible = _boxes_touching(_RISK_AREA_BOXES, north, south, east, west)
+        kernels.heatmap_risk(lats.ravel(), lngs.ravel(), _RISK_AREA_BOXES[visible], _RISK_AREA_DELTAS[visible],
+                             0.3, risk.ravel())
+        return lats, lngs, risk
+    
+    async def get_no_fly_zones(self, north: float, south: float, east: float, west: float) -> List[Dict]:
+        """Get no-fly zones in the specified area"""
+        return [NO_FLY_ZONES[i] for i in self.no_fly_zone_indices(north, south, east, west)]
+    
+    def no_fly_zone_indices(self, north: float, south: float, east: float, west: float) -> Tuple[int, ...]:
+        """Indices into NO_FLY_ZONES of the zones whose bounding box touches the specified area"""
+        return tuple(_boxes_touching(_NFZ_BOXES, north, south, east, west).tolist())
+    
     async def get_weather_data(self, lat: float, lng: float) -> Dict:
         """Get current weather data for a specific location"""
         try:
             # Mock weather data - in production, would call real weather API
-            import random
-            
+            # A handful of scalars is cheaper from random.Random than from a numpy draw
+            rng = self._scalar_rng
             weather_data = {
                 "lat": lat,
                 "lng": lng,
-                "wind_speed": random.uniform(5, 15),
-                "wind_direction": random.uniform(0, 360),
-                "temperature": random.uniform(15, 25),
-                "humidity": random.uniform(40, 80),
-                "visibility": random.uniform(8, 15),
-                "precipitation": random.choice([0, 0, 0, 0.1, 0.5]),
-                "cloud_cover": random.uniform(20, 80),
+                "wind_speed": rng.uniform(5, 15),
+                "wind_direction": rng.uniform(0, 360),
+                "temperature": rng.uniform(15, 25),
+                "humidity": rng.uniform(40, 80),
+                "visibility": rng.uniform(8, 15),
+                "precipitation": rng.choice(_PRECIPITATION_CHOICES),
+                "cloud_cover": rng.uniform(20, 80),
                 "timestamp": "2024-01-01T12:00:00Z"
             }
             
@@ -110,18 +143,3 @@ class MapService:
         except Exception as e:
             logging.error(f"Weather data error: {str(e)}")
             raise
-    
-    def _is_near_airport(self, lat: float, lng: float) -> bool:
-        """Mock function to check if location is near airport"""
-        # Simple check for SF area airports
-        return (37.60 < lat < 37.82) and (-122.50 < lng < -122.30)
-    
-    def _is_urban_area(self, lat: float, lng: float) -> bool:
-        """Mock function to check if location is urban"""
-        # Simple check for SF urban area
-        return (37.70 < lat < 37.80) and (-122.50 < lng < -122.35)
-    
-    def _is_restricted_airspace(self, lat: float, lng: float) -> bool:
-        """Mock function to check for restricted airspace"""
-        # Mock restricted zones
-        return (37.75 < lat < 37.77) and (-122.46 < lng < -122.44)
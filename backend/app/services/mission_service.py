@@ -1,22 +1,74 @@
 # Mission planning service
-from typing import List, Dict
-from sqlalchemy.orm import Session
+import asyncio
+import hashlib
+import itertools
+import os
+import time
+from typing import Iterable, List, Dict, Optional, Tuple
+from cachetools import TTLCache
+import numpy as np
+import orjson
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session, load_only
 import logging
 from datetime import datetime
 
-from ..models.schemas import MissionPlanRequest, MissionResponse, WaypointInput
-from ..models.risk_model import RiskPredictor, Mission, Waypoint
+from ..models.schemas import MissionPlanRequest, MissionResponse
+from ..models.risk_model import get_predictor, Mission, Waypoint
 from ..models.route_optimizer import RouteOptimizer
 from ..services.weather_service import WeatherService
 from ..core.database import Mission as DBMission
+from ..core.geo_numba import haversine_path
+
+# Columns returned by get_mission, in response order
+MISSION_DETAIL_FIELDS = (
+    "mission_id",
+    "waypoints",
+    "battery_capacity",
+    "max_speed",
+    "risk_score",
+    "total_distance",
+    "estimated_duration",
+    "optimized_route",
+    "risk_breakdown",
+    "warnings",
+    "created_at",
+)
+
+# Mission IDs are a per-process prefix (boot time + pid, so workers never collide)
+# plus a counter; unique under concurrent traffic, unlike a per-second timestamp
+_MISSION_ID_PREFIX = f"mission_{int(time.time()):x}{os.getpid():x}_"
+_MISSION_COUNTER = itertools.count(1)
+
+# Risk breakdown thresholds above which plan_mission adds a warning, in output order
+WARNING_RULES = (
+    ("weather_risk", 0.6, "High wind conditions detected along route"),
+    ("battery_risk", 0.7, "Insufficient battery for safe return - consider shorter route"),
+    ("no_fly_risk", 0.5, "Route passes near restricted airspace"),
+    ("terrain_risk", 0.6, "Challenging terrain detected - maintain safe altitude"),
+)
+
+# Plan results are reused for repeated submissions of exactly the same route, whose
+# optimized route starts and ends at the submitted points; the TTL bounds how stale
+# the weather behind a cached plan can get
+PLAN_CACHE_SIZE = 256
+PLAN_CACHE_TTL = 300  # seconds
+
+# Serialized mission listings, per limit; this worker drops them when it saves a mission,
+# and the TTL bounds how long missions saved by other workers stay unlisted
+MISSION_LIST_CACHE_SIZE = 16
+MISSION_LIST_CACHE_TTL = 5  # seconds
 
 class MissionService:
     """Service for mission planning and management"""
     
     def __init__(self):
-        self.risk_predictor = RiskPredictor()
+        self.risk_predictor = get_predictor()
         self.route_optimizer = RouteOptimizer()
         self.weather_service = WeatherService()
+        # Only touched from the event loop thread, so no lock is needed
+        self._plan_cache = TTLCache(maxsize=PLAN_CACHE_SIZE, ttl=PLAN_CACHE_TTL)
+        self._mission_list_cache = TTLCache(maxsize=MISSION_LIST_CACHE_SIZE, ttl=MISSION_LIST_CACHE_TTL)
     
     async def plan_mission(self, request: MissionPlanRequest, db: Session) -> MissionResponse:
         """Plan a UAV mission with risk assessment and route optimization"""
@@ -27,69 +79,48 @@ class MissionService:
                 for wp in request.waypoints
             ]
             
-            # Create mission object
-            mission = Mission(
-                waypoints=waypoints,
-                battery_capacity=request.battery_capacity,
-                max_speed=request.max_speed
-            )
-            
-            # Get weather data for the route
-            weather_data = await self.weather_service.get_weather_along_route(waypoints)
-            mission.weather_conditions = weather_data
-            
-            # Calculate initial risk score
-            risk_score = self.risk_predictor.predict_mission_risk(mission)
-            
-            # Optimize route for better safety
-            optimized_waypoints = self.route_optimizer.optimize_route(mission, self.risk_predictor)
-            
-            # Calculate optimized risk
-            optimized_mission = Mission(
-                waypoints=optimized_waypoints,
-                battery_capacity=request.battery_capacity,
-                max_speed=request.max_speed,
-                weather_conditions=weather_data
-            )
-            
-            optimized_risk = self.risk_predictor.predict_mission_risk(optimized_mission)
-            
-            # Get risk breakdown and warnings
-            risk_breakdown = self.risk_predictor.explain_risk(optimized_mission)
-            warnings = self._generate_warnings(optimized_mission, risk_breakdown)
+            # Reuse the plan for a repeated route; only the mission record is new
+            cache_key = self._plan_cache_key(request)
+            plan = self._plan_cache.get(cache_key)
+            if plan is None:
+                plan = await self._compute_plan(request, waypoints)
+                self._plan_cache[cache_key] = plan
             
-            # Calculate mission metrics
-            total_distance = self._calculate_total_distance(optimized_waypoints)
-            estimated_duration = total_distance / request.max_speed
+            optimized_waypoints = plan["optimized_waypoints"]
+            optimized_risk = plan["risk_score"]
+            risk_breakdown = dict(plan["risk_breakdown"])
+            warnings = list(plan["warnings"])
+            total_distance = plan["total_distance"]
+            estimated_duration = plan["estimated_duration"]
             
             # Generate unique mission ID
-            mission_id = f"mission_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+            mission_id = f"{_MISSION_ID_PREFIX}{next(_MISSION_COUNTER)}"
             
-            # Convert optimized waypoints back to API format
+            # Plain dicts serve both the DB record and the response, which
+            # validates the whole list in one pass
             optimized_route = [
-                WaypointInput(lat=wp.lat, lng=wp.lng, altitude=wp.altitude)
+                {"lat": wp.lat, "lng": wp.lng, "altitude": wp.altitude}
                 for wp in optimized_waypoints
             ]
             
             # Save to database if a session is provided (allow headless/demo use without DB)
             created_at = datetime.utcnow()
             if db:
-                db_mission = DBMission(
-                    mission_id=mission_id,
-                    waypoints=[{"lat": wp.lat, "lng": wp.lng, "altitude": wp.altitude} for wp in waypoints],
-                    battery_capacity=request.battery_capacity,
-                    max_speed=request.max_speed,
-                    risk_score=optimized_risk,
-                    total_distance=total_distance,
-                    estimated_duration=estimated_duration,
-                    optimized_route=[{"lat": wp.lat, "lng": wp.lng, "altitude": wp.altitude} for wp in optimized_waypoints],
-                    risk_breakdown=risk_breakdown,
-                    warnings=warnings
-                )
-                db.add(db_mission)
-                db.commit()
-                db.refresh(db_mission)
-                created_at = db_mission.created_at
+                # The insert and commit block on the database; run them off the event loop
+                await asyncio.to_thread(self._save_mission, db, {
+                    "mission_id": mission_id,
+                    "waypoints": [{"lat": wp.lat, "lng": wp.lng, "altitude": wp.altitude} for wp in waypoints],
+                    "battery_capacity": request.battery_capacity,
+                    "max_speed": request.max_speed,
+                    "risk_score": optimized_risk,
+                    "total_distance": total_distance,
+                    "estimated_duration": estimated_duration,
+                    "optimized_route": optimized_route,
+                    "risk_breakdown": risk_breakdown,
+                    "warnings": warnings,
+                    "created_at": created_at
+                })
+                self._mission_list_cache.clear()
             
             return MissionResponse(
                 mission_id=mission_id,
@@ -106,65 +137,122 @@ class MissionService:
             logging.error(f"Mission planning error: {str(e)}")
             raise
     
-    def get_missions(self, db: Session) -> List[Dict]:
-        """Get all missions from database"""
-        missions = db.query(DBMission).all()
-        return [
-            {
-                "mission_id": mission.mission_id,
-                "created_at": mission.created_at,
-                "risk_score": mission.risk_score,
-                "total_distance": mission.total_distance,
-                "estimated_duration": mission.estimated_duration
-            }
-            for mission in missions
-        ]
-    
-    def get_mission(self, mission_id: str, db: Session) -> Dict:
-        """Get specific mission from database"""
-        mission = db.query(DBMission).filter(DBMission.mission_id == mission_id).first()
-        if not mission:
-            return None
+    async def _compute_plan(self, request: MissionPlanRequest, waypoints: List[Waypoint]) -> Dict:
+        """Run the weather, risk and route optimization pipeline for a route"""
+        # Create mission object
+        mission = Mission(
+            waypoints=waypoints,
+            battery_capacity=request.battery_capacity,
+            max_speed=request.max_speed
+        )
+        
+        # Get weather data for the route
+        weather_data = await self.weather_service.get_weather_along_route(waypoints)
+        mission.weather_conditions = weather_data
+        
+        # Model inference and route search are CPU-bound; run them off the event loop
+        # Optimize route for better safety; only the optimized route's risk is reported,
+        # so the input route is not scored on its own
+        optimized_waypoints = await asyncio.to_thread(
+            self.route_optimizer.optimize_route, mission, self.risk_predictor
+        )
+        
+        # Calculate optimized risk
+        optimized_mission = Mission(
+            waypoints=optimized_waypoints,
+            battery_capacity=request.battery_capacity,
+            max_speed=request.max_speed,
+            weather_conditions=weather_data
+        )
+        
+        optimized_risk = await asyncio.to_thread(self.risk_predictor.predict_mission_risk, optimized_mission)
+        
+        # Get risk breakdown and warnings
+        risk_breakdown = await asyncio.to_thread(self.risk_predictor.explain_risk, optimized_mission)
+        warnings = self._generate_warnings(optimized_mission, risk_breakdown)
+        
+        # Calculate mission metrics
+        total_distance = self._calculate_total_distance(optimized_mission.route_array())
+        estimated_duration = total_distance / request.max_speed
         
         return {
-            "mission_id": mission.mission_id,
-            "waypoints": mission.waypoints,
-            "battery_capacity": mission.battery_capacity,
-            "max_speed": mission.max_speed,
-            "risk_score": mission.risk_score,
-            "total_distance": mission.total_distance,
-            "estimated_duration": mission.estimated_duration,
-            "optimized_route": mission.optimized_route,
-            "risk_breakdown": mission.risk_breakdown,
-            "warnings": mission.warnings,
-            "created_at": mission.created_at
+            "optimized_waypoints": optimized_waypoints,
+            "risk_score": optimized_risk,
+            "risk_breakdown": risk_breakdown,
+            "warnings": warnings,
+            "total_distance": total_distance,
+            "estimated_duration": estimated_duration
         }
     
-    def _calculate_total_distance(self, waypoints: List[Waypoint]) -> float:
-        """Calculate total distance of waypoint sequence"""
-        from geopy.distance import geodesic
+    def _save_mission(self, db: Session, row: Dict):
+        """Persist a planned mission as one Core INSERT, skipping the ORM unit of work"""
+        db.execute(insert(DBMission).values(**row))
+        db.commit()
+    
+    def _plan_cache_key(self, request: MissionPlanRequest) -> Tuple:
+        route = tuple((wp.lat, wp.lng, wp.altitude) for wp in request.waypoints)
+        return route, request.battery_capacity, request.max_speed
+    
+    def get_missions(self, db: Session, limit: int = 100) -> List[Dict]:
+        """Get the most recent missions from database"""
+        # Core select of the summary columns only, so the JSON columns are never loaded
+        rows = db.execute(
+            select(
+                DBMission.mission_id,
+                DBMission.created_at,
+                DBMission.risk_score,
+                DBMission.total_distance,
+                DBMission.estimated_duration
+            )
+            .order_by(DBMission.created_at.desc())
+            .limit(limit)
+        ).all()
+        return [dict(row._mapping) for row in rows]
+    
+    def get_missions_payload(self, db: Session, limit: int = 100) -> Tuple[bytes, str]:
+        """
+        The get_missions listing as a {"missions": [...]} JSON body and its ETag,
+        cached briefly so repeated polling skips the query and the encode
+        """
+        cached = self._mission_list_cache.get(limit)
+        if cached is None:
+            payload = orjson.dumps({"missions": self.get_missions(db, limit)})
+            cached = payload, f'"{hashlib.blake2b(payload, digest_size=16).hexdigest()}"'
+            self._mission_list_cache[limit] = cached
+        return cached
+    
+    def get_mission(self, mission_id: str, db: Session, fields: Optional[Iterable[str]] = None) -> Dict:
+        """
+        Get specific mission from database
+        fields restricts the columns loaded and returned; mission_id is always included
+        """
+        if fields is None:
+            requested = MISSION_DETAIL_FIELDS
+        else:
+            fields = set(fields)
+            unknown = fields.difference(MISSION_DETAIL_FIELDS)
+            if unknown:
+                raise ValueError(f"Unknown mission fields: {', '.join(sorted(unknown))}")
+            requested = [f for f in MISSION_DETAIL_FIELDS if f == "mission_id" or f in fields]
+        
+        mission = (
+            db.query(DBMission)
+            .options(load_only(*(getattr(DBMission, f) for f in requested)))
+            .filter(DBMission.mission_id == mission_id)
+            .first()
+        )
+        if not mission:
+            return None
         
-        total = 0.0
-        for i in range(len(waypoints) - 1):
-            coord1 = (waypoints[i].lat, waypoints[i].lng)
-            coord2 = (waypoints[i + 1].lat, waypoints[i + 1].lng)
-            total += geodesic(coord1, coord2).meters
-        return total
+        return {f: getattr(mission, f) for f in requested}
+    
+    def _calculate_total_distance(self, coords: np.ndarray) -> float:
+        """Calculate total distance of an (N, 3) [lat, lng, altitude] route array"""
+        return haversine_path(coords[:, 0], coords[:, 1])
     
     def _generate_warnings(self, mission: Mission, risk_breakdown: Dict[str, float]) -> List[str]:
         """Generate human-readable warnings based on risk analysis"""
-        warnings = []
-        
-        if risk_breakdown.get("weather_risk", 0) > 0.6:
-            warnings.append("High wind conditions detected along route")
-        
-        if risk_breakdown.get("battery_risk", 0) > 0.7:
-            warnings.append("Insufficient battery for safe return - consider shorter route")
-        
-        if risk_breakdown.get("no_fly_risk", 0) > 0.5:
-            warnings.append("Route passes near restricted airspace")
-        
-        if risk_breakdown.get("terrain_risk", 0) > 0.6:
-            warnings.append("Challenging terrain detected - maintain safe altitude")
-        
-        return warnings
+        return [
+            message for key, threshold, message in WARNING_RULES
+            if risk_breakdown.get(key, 0) > threshold
+        ]
@@ -1,12 +1,23 @@
 # Mission simulation service
-from typing import Dict, List
+import asyncio
+import itertools
+import os
+import time
+from typing import AsyncIterator, Dict, List, Optional
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
 import logging
-import numpy as np
+import orjson
 
 from ..models.schemas import SimulationRequest, SimulationResponse
 from ..models.simulator import MissionSimulator
-from ..core.database import Mission as DBMission, SimulationRun
+from ..models.risk_model import Mission, Waypoint
+from ..core.database import Mission as DBMission, SimulationRun, SessionLocal
+
+# Run IDs append a per-process tag (boot time + pid, so workers never collide) and a
+# counter to the mission ID; random suffixes from a small space collide on repeat runs
+_RUN_ID_TAG = f"{int(time.time()):x}{os.getpid():x}"
+_RUN_COUNTER = itertools.count(1)
 
 class SimulationService:
     """Service for mission simulation"""
@@ -17,68 +28,27 @@ class SimulationService:
     async def simulate_mission(self, request: SimulationRequest, db: Session) -> Dict:
         """Simulate mission execution and return timeline"""
         try:
-            # Get mission from database if session provided
-            mission = None
-            if db:
-                mission = db.query(DBMission).filter(DBMission.mission_id == request.mission_id).first()
-                if not mission:
-                    raise ValueError(f"Mission {request.mission_id} not found")
-            
-            # Convert database mission to internal format
-            from ..models.risk_model import Mission, Waypoint
-            
-            # If no DB, we cannot reconstruct mission from storage; for demo,
-            # create a minimal placeholder using a short straight route.
-            if mission:
-                waypoints = [
-                    Waypoint(lat=wp["lat"], lng=wp["lng"], altitude=wp["altitude"])
-                    for wp in mission.optimized_route
-                ]
-                battery_capacity = mission.battery_capacity
-                max_speed = mission.max_speed
-                weather_conditions = mission.weather_conditions
-            else:
-                # Fallback synthetic mission (demo headless mode)
-                waypoints = [
-                    Waypoint(37.7749, -122.4194, 100.0),
-                    Waypoint(37.7849, -122.4094, 120.0)
-                ]
-                battery_capacity = 80.0
-                max_speed = 12.0
-                weather_conditions = {"wind_speed": 5.0, "gust_speed": 7.0}
+            # Database reads and writes block, so they run off the event loop like the simulation
+            internal_mission = await asyncio.to_thread(self._load_mission, request.mission_id, db)
             
-            internal_mission = Mission(
-                waypoints=waypoints,
-                battery_capacity=battery_capacity,
-                max_speed=max_speed,
-                weather_conditions=weather_conditions
+            # Run simulation off the event loop; it is CPU-bound
+            simulation_result = await asyncio.to_thread(
+                self.simulator.simulate_mission, internal_mission, request.speed_multiplier, request.layout
             )
             
-            # Run simulation
-            simulation_result = self.simulator.simulate_mission(internal_mission, request.speed_multiplier)
-            
             if "error" in simulation_result:
                 raise ValueError(simulation_result["error"])
             
             # Save simulation run to database if session provided
-            simulation_id = f"sim_{request.mission_id}_{int(np.random.random() * 10000)}" if db else "sim_local"
+            simulation_id = self._new_simulation_id(request.mission_id) if db else "sim_local"
             if db:
-                db_simulation = SimulationRun(
-                    mission_id=request.mission_id,
-                    simulation_id=simulation_id,
-                    speed_multiplier=request.speed_multiplier,
-                    simulation_data=simulation_result["simulation_steps"],
-                    success=simulation_result["success"],
-                    total_duration=simulation_result["total_duration"],
-                    final_battery=simulation_result["final_battery"]
-                )
-                db.add(db_simulation)
-                db.commit()
+                await asyncio.to_thread(self._save_run, db, request, simulation_id, simulation_result)
 
+            timeline_key = "simulation_columns" if request.layout == "columns" else "simulation_steps"
             return {
                 "mission_id": request.mission_id,
                 "simulation_id": simulation_id,
-                "simulation_steps": simulation_result["simulation_steps"],
+                timeline_key: simulation_result[timeline_key],
                 "total_duration": simulation_result["total_duration"],
                 "success": simulation_result["success"],
                 "final_battery": simulation_result["final_battery"]
@@ -96,3 +66,111 @@ class SimulationService:
                 "final_battery": 0.0,
                 "error": str(e)
             }
+    
+    async def stream_simulation(self, request: SimulationRequest, db: Session) -> AsyncIterator[bytes]:
+        """
+        Simulate mission execution as NDJSON: one {"simulation_steps": [...]} line per
+        batch of steps, then a summary line. The mission is loaded and validated before
+        the stream is returned, so a missing mission raises LookupError and an invalid one
+        ValueError before the response starts. Batches go straight to the client; the
+        run's summary is saved once the stream ends.
+        """
+        internal_mission = await asyncio.to_thread(self._load_mission, request.mission_id, db)
+        self.simulator.validate_mission(internal_mission)
+        return self._stream_simulation(request, internal_mission, persist=db is not None)
+    
+    async def _stream_simulation(self, request: SimulationRequest, mission: Mission,
+                                 persist: bool) -> AsyncIterator[bytes]:
+        simulation_id = self._new_simulation_id(request.mission_id) if persist else "sim_local"
+        summary: Dict = {}
+        
+        async for chunk in self.simulator.stream_mission(mission, request.speed_multiplier):
+            if "simulation_steps" not in chunk:
+                summary = chunk
+                break
+            yield orjson.dumps(chunk) + b"\n"
+        
+        if persist:
+            await asyncio.to_thread(self._save_run_in_new_session, request, simulation_id, summary)
+        
+        yield orjson.dumps({
+            "mission_id": request.mission_id,
+            "simulation_id": simulation_id,
+            "total_duration": summary["total_duration"],
+            "success": summary["success"],
+            "final_battery": summary["final_battery"]
+        }) + b"\n"
+    
+    def _load_mission(self, mission_id: str, db: Optional[Session]) -> Mission:
+        """Build the internal Mission to simulate from its stored record"""
+        # Get mission from database if session provided
+        mission = None
+        if db:
+            mission = db.query(DBMission).filter(DBMission.mission_id == mission_id).first()
+            if not mission:
+                raise LookupError(f"Mission {mission_id} not found")
+        
+        # If no DB, we cannot reconstruct mission from storage; for demo,
+        # create a minimal placeholder using a short straight route.
+        if mission:
+            waypoints = [
+                Waypoint(lat=wp["lat"], lng=wp["lng"], altitude=wp["altitude"])
+                for wp in mission.optimized_route
+            ]
+            battery_capacity = mission.battery_capacity
+            max_speed = mission.max_speed
+            weather_conditions = mission.weather_conditions
+        else:
+            # Fallback synthetic mission (demo headless mode)
+            waypoints = [
+                Waypoint(37.7749, -122.4194, 100.0),
+                Waypoint(37.7849, -122.4094, 120.0)
+            ]
+            battery_capacity = 80.0
+            max_speed = 12.0
+            weather_conditions = {"wind_speed": 5.0, "gust_speed": 7.0}
+        
+        return Mission(
+            waypoints=waypoints,
+            battery_capacity=battery_capacity,
+            max_speed=max_speed,
+            weather_conditions=weather_conditions
+        )
+    
+    def _new_simulation_id(self, mission_id: str) -> str:
+        return f"sim_{mission_id}_{_RUN_ID_TAG}_{next(_RUN_COUNTER)}"
+    
+    def save_runs(self, db: Session, runs: List[Dict]):
+        """
+        Persist many simulation runs (e.g. a parameter sweep) in one executemany INSERT.
+        Each dict holds SimulationRun columns; simulation_data should be the step list
+        (or column dict) itself, not a pre-serialized string, so the JSON column binds it once.
+        """
+        if not runs:
+            return
+        db.execute(insert(SimulationRun), runs)
+        db.commit()
+    
+    def _run_row(self, request: SimulationRequest, simulation_id: str, simulation_result: Dict) -> Dict:
+        return {
+            "mission_id": request.mission_id,
+            "simulation_id": simulation_id,
+            "speed_multiplier": request.speed_multiplier,
+            "simulation_data": simulation_result.get("simulation_steps", simulation_result.get("simulation_columns")),
+            "success": simulation_result["success"],
+            "total_duration": simulation_result["total_duration"],
+            "final_battery": simulation_result["final_battery"]
+        }
+    
+    def _save_run(self, db: Session, request: SimulationRequest, simulation_id: str, simulation_result: Dict):
+        """Persist a single simulation run"""
+        db.add(SimulationRun(**self._run_row(request, simulation_id, simulation_result)))
+        db.commit()
+    
+    def _save_run_in_new_session(self, request: SimulationRequest, simulation_id: str, simulation_result: Dict):
+        # The request-scoped session may already be closed once a streamed response finishes
+        db = SessionLocal()
+        try:
+            self._save_run(db, request, simulation_id, simulation_result)
+        finally:
+            db.close()
@@ -1,88 +1,126 @@
 # Weather service for fetching weather data
 import aiohttp
 import asyncio
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 import logging
 from datetime import datetime
 import random
+from cachetools import TTLCache
+
+# Default safe weather conditions; only the timestamp varies per call
+_DEFAULT_WEATHER = {
+    "wind_speed": 5.0,
+    "gust_speed": 7.0,
+    "wind_direction": 180,
+    "temperature": 20.0,
+    "humidity": 60.0,
+    "visibility": 10.0,
+    "precipitation": 0.0,
+    "cloud_cover": 30.0,
+    "timestamp": None,
+    "source": "default_conditions"
+}
+
+# Weather is looked up per grid cell: waypoints are snapped to this grid and
+# each cell is fetched at most once per TTL
+WEATHER_GRID_DEG = 0.25
+WEATHER_CACHE_SIZE = 1024
+WEATHER_CACHE_TTL = 600  # seconds
 
 class WeatherService:
     """Service for fetching weather data along flight routes"""
     
     def __init__(self):
         self.base_url = "https://api.open-meteo.com/v1/forecast"
+        self._rng = random.Random()  # Per-service generator, skips the shared module-level instance
+        self._cell_cache = TTLCache(maxsize=WEATHER_CACHE_SIZE, ttl=WEATHER_CACHE_TTL)
         
     async def get_weather_along_route(self, waypoints: List) -> Dict:
         """
         Fetch weather conditions along the route
-        For MVP, returns mock data. In production, would call real weather API
+        Waypoints are snapped to grid cells and each unique cell is fetched once;
+        the route gets the conditions of its windiest cell
         """
         try:
-            # For hackathon demo, return realistic mock weather data
-            # In production, this would make actual API calls to weather services
-            
-            # Calculate average position for weather lookup
             if not waypoints:
                 return self._get_default_weather()
             
-            avg_lat = sum(wp.lat for wp in waypoints) / len(waypoints)
-            avg_lng = sum(wp.lng for wp in waypoints) / len(waypoints)
-            
-            # Mock weather based on SF conditions
-            base_wind_speed = 8.0  # m/s
-            base_gust_speed = 12.0  # m/s
-            
-            # Add some realistic variation
-            wind_variation = random.uniform(-3, 5)
-            
-            weather_data = {
-                "wind_speed": max(0, base_wind_speed + wind_variation),
-                "gust_speed": max(0, base_gust_speed + wind_variation * 1.5),
-                "wind_direction": random.uniform(0, 360),
-                "temperature": random.uniform(15, 25),  # Celsius
-                "humidity": random.uniform(40, 80),     # Percentage
-                "visibility": random.uniform(8, 15),    # km
-                "precipitation": random.choice([0, 0, 0, 0.1, 0.5]),  # mm/hr
-                "cloud_cover": random.uniform(20, 80),  # Percentage
-                "timestamp": datetime.now().isoformat(),
-                "source": "mock_weather_service"
-            }
+            cells = {self._grid_cell(wp.lat, wp.lng) for wp in waypoints}
+            cell_weather = await self.get_weather_batch(list(cells))
             
-            return weather_data
+            worst = max(cell_weather.values(), key=lambda w: w["wind_speed"])
+            return dict(worst)  # Copy, callers may adjust the values
             
         except Exception as e:
             logging.error(f"Weather service error: {e}")
             return self._get_default_weather()
     
-    def _get_default_weather(self) -> Dict:
-        """Return default safe weather conditions"""
+    async def get_weather_batch(self, cells: List[Tuple[float, float]]) -> Dict[Tuple[float, float], Dict]:
+        """
+        Weather for each (lat, lng) grid cell, fetching all uncached cells concurrently
+        Returns a dict keyed by cell
+        """
+        unique = list(dict.fromkeys(cells))
+        missing = [cell for cell in unique if cell not in self._cell_cache]
+        
+        fetched = await asyncio.gather(*(self._fetch_cell_weather(lat, lng) for lat, lng in missing))
+        for cell, weather in zip(missing, fetched):
+            self._cell_cache[cell] = weather
+        
+        return {cell: self._cell_cache.get(cell) or self._get_default_weather() for cell in unique}
+    
+    def _grid_cell(self, lat: float, lng: float) -> Tuple[float, float]:
+        """Snap a position to the weather lookup grid"""
+        return (round(lat / WEATHER_GRID_DEG) * WEATHER_GRID_DEG,
+                round(lng / WEATHER_GRID_DEG) * WEATHER_GRID_DEG)
+    
+    async def _fetch_cell_weather(self, lat: float, lng: float) -> Dict:
+        """
+        Fetch weather conditions for one grid cell
+        For MVP, returns mock data. In production, would call real weather API
+        """
+        # For hackathon demo, return realistic mock weather data
+        # In production, this would make actual API calls to weather services
+        
+        # Mock weather based on SF conditions
+        base_wind_speed = 8.0  # m/s
+        base_gust_speed = 12.0  # m/s
+        
+        # Add some realistic variation
+        wind_variation = self._rng.uniform(-3, 5)
+        
         return {
-            "wind_speed": 5.0,
-            "gust_speed": 7.0,
-            "wind_direction": 180,
-            "temperature": 20.0,
-            "humidity": 60.0,
-            "visibility": 10.0,
-            "precipitation": 0.0,
-            "cloud_cover": 30.0,
+            "wind_speed": max(0, base_wind_speed + wind_variation),
+            "gust_speed": max(0, base_gust_speed + wind_variation * 1.5),
+            "wind_direction": self._rng.uniform(0, 360),
+            "temperature": self._rng.uniform(15, 25),  # Celsius
+            "humidity": self._rng.uniform(40, 80),     # Percentage
+            "visibility": self._rng.uniform(8, 15),    # km
+            "precipitation": self._rng.choice([0, 0, 0, 0.1, 0.5]),  # mm/hr
+            "cloud_cover": self._rng.uniform(20, 80),  # Percentage
             "timestamp": datetime.now().isoformat(),
-            "source": "default_conditions"
+            "source": "mock_weather_service"
         }
     
+    def _get_default_weather(self) -> Dict:
+        """Return default safe weather conditions"""
+        return {**_DEFAULT_WEATHER, "timestamp": datetime.now().isoformat()}
+    
     async def get_forecast_along_route(self, waypoints: List, hours_ahead: int = 2) -> List[Dict]:
         """
         Get weather forecast for the next few hours along route
         Returns list of forecast data points
         """
-        forecasts = []
+        # Every hour covers the same grid cells, so look them up once; concurrent
+        # per-hour lookups would all miss the cell cache and fetch each cell again
+        current = await self.get_weather_along_route(waypoints)
         
+        forecasts = []
         for hour in range(hours_ahead):
-            forecast = await self.get_weather_along_route(waypoints)
-            
             # Add some progression for demonstration
+            forecast = dict(current)
             forecast["forecast_hour"] = hour + 1
             forecast["wind_speed"] *= (1.0 + hour * 0.1)  # Slight increase over time
-            
             forecasts.append(forecast)
         
-        return forecasts
+        return forecasts
\ No newline at end of file
@@ -26,10 +26,13 @@ def main():
     models_dir.mkdir(exist_ok=True)
     
     # Initialize risk predictor (this will trigger training)
-    model_path = str(models_dir / "risk_xgb.json")
+    model_path = str(models_dir / "risk_xgb.ubj")
     risk_predictor = RiskPredictor(model_path=model_path)
     
     if risk_predictor.is_loaded():
+        # Convert a legacy JSON model and compile the serving artifacts here, so the
+        # API only ever loads them
+        risk_predictor.build_artifacts()
         print("✅ Model training completed successfully!")
         print(f"Model saved to: {model_path}")
         
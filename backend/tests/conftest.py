@@ -0,0 +1,16 @@
+# backend/tests/conftest.py
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add the backend directory to the Python path
+backend_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from app.models.risk_model import DEFAULT_MODEL_PATH, RiskPredictor
+
+@pytest.fixture(scope="session")
+def risk_predictor() -> RiskPredictor:
+    """Predictor over the checked-in model, scored with xgboost so no native library is built"""
+    return RiskPredictor(model_path=str(backend_dir / DEFAULT_MODEL_PATH), backend="xgboost")
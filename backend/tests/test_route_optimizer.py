@@ -0,0 +1,48 @@
+# backend/tests/test_route_optimizer.py
+from app.core.geo import haversine_point_m
+from app.models.risk_model import Mission, Waypoint
+from app.models.route_optimizer import NO_FLY_ZONES, RISK_GRID_MAX_POINTS, RouteOptimizer
+
+def leg_mission(start: Waypoint, goal: Waypoint) -> Mission:
+    return Mission(waypoints=[start, goal], battery_capacity=80.0, max_speed=15.0,
+                   weather_conditions={'wind_speed': 5.0})
+
+def test_long_leg_risk_grid_stays_under_cap(risk_predictor, monkeypatch):
+    grid_sizes = []
+    build_risk_grid = RouteOptimizer._build_risk_grid
+    
+    def recording_build_risk_grid(self, *args):
+        grid = build_risk_grid(self, *args)
+        grid_sizes.append(grid.values.size)
+        return grid
+    
+    monkeypatch.setattr(RouteOptimizer, "_build_risk_grid", recording_build_risk_grid)
+    
+    # A 25 km leg would need about 200k points at the base grid cell
+    start, goal = Waypoint(37.60, -122.45, 100), Waypoint(37.83, -122.45, 100)
+    route = RouteOptimizer().optimize_route(leg_mission(start, goal), risk_predictor)
+    
+    assert route[0] == start and route[-1] == goal
+    assert len(grid_sizes) == 1
+    assert grid_sizes[0] <= RISK_GRID_MAX_POINTS
+
+def test_leg_too_long_for_grid_scores_edges(risk_predictor):
+    start, goal = Waypoint(37.00, -122.20, 100), Waypoint(38.00, -122.20, 100)
+    mission = leg_mission(start, goal)
+    optimizer = RouteOptimizer()
+    
+    leg_distance = haversine_point_m(start.lat, start.lng, goal.lat, goal.lng)
+    assert optimizer._build_risk_grid(start, goal, leg_distance, mission, risk_predictor) is None
+    
+    route = optimizer.optimize_route(mission, risk_predictor)
+    assert route[0] == start and route[-1] == goal
+
+def test_bidirectional_search_detours_around_no_fly_zone(risk_predictor):
+    # A 4 km leg straight across the middle of the 1 km military base zone
+    zone_lat, zone_lng, zone_radius = NO_FLY_ZONES[1]
+    start, goal = Waypoint(zone_lat - 0.018, zone_lng, 100), Waypoint(zone_lat + 0.018, zone_lng, 100)
+    route = RouteOptimizer().optimize_route(leg_mission(start, goal), risk_predictor)
+    
+    assert len(route) > 2  # Not the direct route the search falls back to
+    assert route[0] == start and route[-1] == goal
+    assert all(haversine_point_m(wp.lat, wp.lng, zone_lat, zone_lng) > zone_radius for wp in route)
@@ -5,36 +5,63 @@ This script demonstrates all key features for the hackathon presentation
 """
 
 import asyncio
-import json
+import functools
+import io
+import orjson
 import sys
 import os
+from pathlib import Path
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
 
-from app.models.risk_model import RiskPredictor, Mission, Waypoint
+from app.models.risk_model import get_predictor, Mission, Waypoint
 from app.models.route_optimizer import RouteOptimizer
 from app.models.simulator import MissionSimulator
 from app.services.weather_service import WeatherService
 import logging
 
+# Scenario routes, built once at import and shared with main()'s weather prefetch;
+# immutable, so each scenario flies its own list copy of its route
+SAFE_MISSION_WAYPOINTS = (
+    Waypoint(lat=37.7749, lng=-122.4194, altitude=100),  # SF Downtown
+    Waypoint(lat=37.7849, lng=-122.4094, altitude=120),  # North
+    Waypoint(lat=37.7949, lng=-122.3994, altitude=100)   # East
+)
+
+HIGH_RISK_WAYPOINTS = (
+    Waypoint(lat=37.7749, lng=-122.4194, altitude=100),  # SF Downtown
+    Waypoint(lat=37.6213, lng=-122.3789, altitude=150),  # Near SFO Airport
+    Waypoint(lat=37.6000, lng=-122.3500, altitude=200),  # Further south
+    Waypoint(lat=37.7749, lng=-122.4194, altitude=100)   # Return to start
+)
+
+FAILURE_WAYPOINTS = (
+    Waypoint(lat=37.7749, lng=-122.4194, altitude=100),
+    Waypoint(lat=37.5000, lng=-122.0000, altitude=300),  # Very far, high altitude
+    Waypoint(lat=37.9000, lng=-122.8000, altitude=50),   # Even further
+)
+
+@functools.lru_cache(maxsize=None)
+def _services():
+    """The risk predictor, route optimizer and simulator, built once and shared by every scenario"""
+    return get_predictor(), RouteOptimizer(), MissionSimulator()
+
 def setup_logging():
     """Configure logging for demo"""
+    # Warnings and errors only; the scenarios print their own progress
     logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(levelname)s - %(message)s'
+        level=logging.WARNING,
+        format='%(levelname)s - %(message)s'
     )
 
-async def demo_scenario_1_safe_mission():
+async def demo_scenario_1_safe_mission(weather_service=None, out=None):
     """Demo Scenario 1: Safe mission in good conditions"""
-    print("\n" + "="*60)
-    print("🟢 DEMO SCENARIO 1: Safe Mission - Optimal Conditions")
-    print("="*60)
+    say = functools.partial(print, file=out or sys.stdout)
+    say("\n" + "="*60)
+    say("🟢 DEMO SCENARIO 1: Safe Mission - Optimal Conditions")
+    say("="*60)
     
     # Create a simple, safe mission
-    waypoints = [
-        Waypoint(lat=37.7749, lng=-122.4194, altitude=100),  # SF Downtown
-        Waypoint(lat=37.7849, lng=-122.4094, altitude=120),  # North
-        Waypoint(lat=37.7949, lng=-122.3994, altitude=100)   # East
-    ]
+    waypoints = list(SAFE_MISSION_WAYPOINTS)
     
     mission = Mission(
         waypoints=waypoints,
@@ -43,36 +70,34 @@ async def demo_scenario_1_safe_mission():
     )
     
     # Add good weather conditions
-    weather_service = WeatherService()
+    weather_service = weather_service or WeatherService()
     mission.weather_conditions = await weather_service.get_weather_along_route(waypoints)
     mission.weather_conditions['wind_speed'] = 3.0  # Light wind
     
-    # Initialize services
-    risk_predictor = RiskPredictor()
-    route_optimizer = RouteOptimizer()
-    simulator = MissionSimulator()
+    # Shared services, built once for all scenarios
+    risk_predictor, route_optimizer, simulator = _services()
     
     # Risk Assessment
-    print(f"📍 Waypoints: {len(waypoints)}")
-    print(f"⚡ Battery: {mission.battery_capacity}%")
-    print(f"🌬️  Wind Speed: {mission.weather_conditions['wind_speed']} m/s")
+    say(f"📍 Waypoints: {len(waypoints)}")
+    say(f"⚡ Battery: {mission.battery_capacity}%")
+    say(f"🌬️  Wind Speed: {mission.weather_conditions['wind_speed']} m/s")
     
     risk_score = risk_predictor.predict_mission_risk(mission)
-    print(f"\n🎯 Initial Risk Score: {risk_score:.3f} ({'LOW' if risk_score < 0.3 else 'MEDIUM' if risk_score < 0.7 else 'HIGH'})")
+    say(f"\n🎯 Initial Risk Score: {risk_score:.3f} ({'LOW' if risk_score < 0.3 else 'MEDIUM' if risk_score < 0.7 else 'HIGH'})")
     
     # Risk Breakdown
     risk_breakdown = risk_predictor.explain_risk(mission)
-    print("\n📊 Risk Breakdown:")
+    say("\n📊 Risk Breakdown:")
     for category, score in risk_breakdown.items():
-        print(f"   {category.replace('_', ' ').title()}: {score:.3f}")
+        say(f"   {category.replace('_', ' ').title()}: {score:.3f}")
     
     # Route Optimization
-    print("\n🛣️  Optimizing Route...")
+    say("\n🛣️  Optimizing Route...")
     optimized_waypoints = route_optimizer.optimize_route(mission, risk_predictor)
-    print(f"   Optimized to {len(optimized_waypoints)} waypoints")
+    say(f"   Optimized to {len(optimized_waypoints)} waypoints")
     
     # Simulation
-    print("\n🚁 Running Simulation...")
+    say("\n🚁 Running Simulation...")
     optimized_mission = Mission(
         waypoints=optimized_waypoints,
         battery_capacity=mission.battery_capacity,
@@ -81,9 +106,9 @@ async def demo_scenario_1_safe_mission():
     )
     
     sim_result = simulator.simulate_mission(optimized_mission)
-    print(f"   Duration: {sim_result['total_duration']:.1f} seconds")
-    print(f"   Success: {'✅ YES' if sim_result['success'] else '❌ NO'}")
-    print(f"   Final Battery: {sim_result['final_battery']:.1f}%")
+    say(f"   Duration: {sim_result['total_duration']:.1f} seconds")
+    say(f"   Success: {'✅ YES' if sim_result['success'] else '❌ NO'}")
+    say(f"   Final Battery: {sim_result['final_battery']:.1f}%")
     
     return {
         'scenario': 'Safe Mission',
@@ -92,19 +117,15 @@ async def demo_scenario_1_safe_mission():
         'final_battery': sim_result['final_battery']
     }
 
-async def demo_scenario_2_high_risk_mission():
+async def demo_scenario_2_high_risk_mission(weather_service=None, out=None):
     """Demo Scenario 2: High-risk mission with challenging conditions"""
-    print("\n" + "="*60)
-    print("🔴 DEMO SCENARIO 2: High-Risk Mission - Challenging Conditions")
-    print("="*60)
+    say = functools.partial(print, file=out or sys.stdout)
+    say("\n" + "="*60)
+    say("🔴 DEMO SCENARIO 2: High-Risk Mission - Challenging Conditions")
+    say("="*60)
     
     # Create a risky mission (near airport, low battery, high winds)
-    waypoints = [
-        Waypoint(lat=37.7749, lng=-122.4194, altitude=100),  # SF Downtown
-        Waypoint(lat=37.6213, lng=-122.3789, altitude=150),  # Near SFO Airport
-        Waypoint(lat=37.6000, lng=-122.3500, altitude=200),  # Further south
-        Waypoint(lat=37.7749, lng=-122.4194, altitude=100)   # Return to start
-    ]
+    waypoints = list(HIGH_RISK_WAYPOINTS)
     
     mission = Mission(
         waypoints=waypoints,
@@ -113,32 +134,30 @@ async def demo_scenario_2_high_risk_mission():
     )
     
     # Add challenging weather
-    weather_service = WeatherService()
+    weather_service = weather_service or WeatherService()
     mission.weather_conditions = await weather_service.get_weather_along_route(waypoints)
     mission.weather_conditions['wind_speed'] = 18.0  # Strong wind
     mission.weather_conditions['gust_speed'] = 25.0
     
-    # Initialize services
-    risk_predictor = RiskPredictor()
-    route_optimizer = RouteOptimizer()
-    simulator = MissionSimulator()
+    # Shared services, built once for all scenarios
+    risk_predictor, route_optimizer, simulator = _services()
     
-    print(f"📍 Waypoints: {len(waypoints)} (including return)")
-    print(f"⚡ Battery: {mission.battery_capacity}% (LOW)")
-    print(f"🌬️  Wind Speed: {mission.weather_conditions['wind_speed']} m/s (HIGH)")
-    print(f"🚫 Route passes near SFO Airport")
+    say(f"📍 Waypoints: {len(waypoints)} (including return)")
+    say(f"⚡ Battery: {mission.battery_capacity}% (LOW)")
+    say(f"🌬️  Wind Speed: {mission.weather_conditions['wind_speed']} m/s (HIGH)")
+    say(f"🚫 Route passes near SFO Airport")
     
     # Risk Assessment
     risk_score = risk_predictor.predict_mission_risk(mission)
-    print(f"\n🎯 Initial Risk Score: {risk_score:.3f} ({'LOW' if risk_score < 0.3 else 'MEDIUM' if risk_score < 0.7 else 'HIGH'})")
+    say(f"\n🎯 Initial Risk Score: {risk_score:.3f} ({'LOW' if risk_score < 0.3 else 'MEDIUM' if risk_score < 0.7 else 'HIGH'})")
     
     risk_breakdown = risk_predictor.explain_risk(mission)
-    print("\n📊 Risk Breakdown:")
+    say("\n📊 Risk Breakdown:")
     for category, score in risk_breakdown.items():
-        print(f"   {category.replace('_', ' ').title()}: {score:.3f}")
+        say(f"   {category.replace('_', ' ').title()}: {score:.3f}")
     
     # Show optimization benefit
-    print("\n🛣️  Optimizing Route for Safety...")
+    say("\n🛣️  Optimizing Route for Safety...")
     optimized_waypoints = route_optimizer.optimize_route(mission, risk_predictor)
     
     optimized_mission = Mission(
@@ -148,25 +167,25 @@ async def demo_scenario_2_high_risk_mission():
         weather_conditions=mission.weather_conditions
     )
     
-    optimized_risk = risk_predictor.predict_mission_risk(optimized_mission)
-    risk_improvement = ((risk_score - optimized_risk) / risk_score * 100) if risk_score > 0 else 0
-    
-    print(f"   Original Risk: {risk_score:.3f}")
-    print(f"   Optimized Risk: {optimized_risk:.3f}")
-    print(f"   Risk Reduction: {risk_improvement:.1f}%")
-    
-    # Compare route metrics
+    # Compare route metrics; they score both routes in one batched call, with the
+    # original's score already cached, so the optimized risk is read from them
     metrics = route_optimizer.calculate_route_metrics(
         waypoints, optimized_waypoints, risk_predictor, mission
     )
-    print(f"   Distance Change: +{metrics['distance_increase_pct']:.1f}%")
+    optimized_risk = metrics['optimized_risk_score']
+    risk_improvement = metrics['risk_reduction_pct']
+    
+    say(f"   Original Risk: {risk_score:.3f}")
+    say(f"   Optimized Risk: {optimized_risk:.3f}")
+    say(f"   Risk Reduction: {risk_improvement:.1f}%")
+    say(f"   Distance Change: +{metrics['distance_increase_pct']:.1f}%")
     
     # Simulation
-    print("\n🚁 Running Simulation...")
+    say("\n🚁 Running Simulation...")
     sim_result = simulator.simulate_mission(optimized_mission)
-    print(f"   Duration: {sim_result['total_duration']:.1f} seconds")
-    print(f"   Success: {'✅ YES' if sim_result['success'] else '❌ NO'}")
-    print(f"   Final Battery: {sim_result['final_battery']:.1f}%")
+    say(f"   Duration: {sim_result['total_duration']:.1f} seconds")
+    say(f"   Success: {'✅ YES' if sim_result['success'] else '❌ NO'}")
+    say(f"   Final Battery: {sim_result['final_battery']:.1f}%")
     
     return {
         'scenario': 'High Risk Mission',
@@ -177,18 +196,15 @@ async def demo_scenario_2_high_risk_mission():
         'final_battery': sim_result['final_battery']
     }
 
-async def demo_scenario_3_mission_failure():
+async def demo_scenario_3_mission_failure(weather_service=None, out=None):
     """Demo Scenario 3: Mission that fails due to extreme conditions"""
-    print("\n" + "="*60)
-    print("⛔ DEMO SCENARIO 3: Mission Failure - Extreme Conditions")
-    print("="*60)
+    say = functools.partial(print, file=out or sys.stdout)
+    say("\n" + "="*60)
+    say("⛔ DEMO SCENARIO 3: Mission Failure - Extreme Conditions")
+    say("="*60)
     
     # Create an impossible mission
-    waypoints = [
-        Waypoint(lat=37.7749, lng=-122.4194, altitude=100),
-        Waypoint(lat=37.5000, lng=-122.0000, altitude=300),  # Very far, high altitude
-        Waypoint(lat=37.9000, lng=-122.8000, altitude=50),   # Even further
-    ]
+    waypoints = list(FAILURE_WAYPOINTS)
     
     mission = Mission(
         waypoints=waypoints,
@@ -197,32 +213,31 @@ async def demo_scenario_3_mission_failure():
     )
     
     # Extreme weather
-    weather_service = WeatherService()
+    weather_service = weather_service or WeatherService()
     mission.weather_conditions = await weather_service.get_weather_along_route(waypoints)
     mission.weather_conditions['wind_speed'] = 22.0  # Extreme wind
     mission.weather_conditions['gust_speed'] = 30.0
     
-    risk_predictor = RiskPredictor()
-    simulator = MissionSimulator()
+    risk_predictor, _, simulator = _services()
     
-    print(f"📍 Waypoints: {len(waypoints)} (very long distance)")
-    print(f"⚡ Battery: {mission.battery_capacity}% (CRITICAL)")
-    print(f"🌬️  Wind Speed: {mission.weather_conditions['wind_speed']} m/s (EXTREME)")
-    print(f"🐌 Max Speed: {mission.max_speed} m/s (SLOW)")
+    say(f"📍 Waypoints: {len(waypoints)} (very long distance)")
+    say(f"⚡ Battery: {mission.battery_capacity}% (CRITICAL)")
+    say(f"🌬️  Wind Speed: {mission.weather_conditions['wind_speed']} m/s (EXTREME)")
+    say(f"🐌 Max Speed: {mission.max_speed} m/s (SLOW)")
     
     # Risk Assessment
     risk_score = risk_predictor.predict_mission_risk(mission)
-    print(f"\n🎯 Risk Score: {risk_score:.3f} (CRITICAL)")
+    say(f"\n🎯 Risk Score: {risk_score:.3f} (CRITICAL)")
     
     # Simulation (will likely fail)
-    print("\n🚁 Running Simulation...")
+    say("\n🚁 Running Simulation...")
     sim_result = simulator.simulate_mission(mission)
-    print(f"   Duration: {sim_result['total_duration']:.1f} seconds")
-    print(f"   Success: {'✅ YES' if sim_result['success'] else '❌ NO'}")
-    print(f"   Final Battery: {sim_result['final_battery']:.1f}%")
+    say(f"   Duration: {sim_result['total_duration']:.1f} seconds")
+    say(f"   Success: {'✅ YES' if sim_result['success'] else '❌ NO'}")
+    say(f"   Final Battery: {sim_result['final_battery']:.1f}%")
     
     if not sim_result['success']:
-        print("   🚨 MISSION ABORTED: Battery depletion predicted")
+        say("   🚨 MISSION ABORTED: Battery depletion predicted")
     
     return {
         'scenario': 'Mission Failure',
@@ -231,6 +246,19 @@ async def demo_scenario_3_mission_failure():
         'final_battery': sim_result['final_battery']
     }
 
+def _scenario_summary(i, result):
+    """Results summary lines for one scenario, as a single string"""
+    success = result['simulation_success']
+    score = result.get('risk_score', 'N/A')
+    score_text = f"{score:.3f}" if isinstance(score, (int, float)) else score
+    reduction = f"\n      Risk Reduction: {result['risk_reduction_pct']:.1f}%" if 'risk_reduction_pct' in result else ""
+    return (
+        f"\n   Scenario {i}: {result['scenario']}\n"
+        f"      Risk Score: {score_text}{reduction}\n"
+        f"      Simulation: {'✅' if success else '❌'} ({'Success' if success else 'Failed'})\n"
+        f"      Final Battery: {result['final_battery']:.1f}%"
+    )
+
 def generate_demo_summary(results):
     """Generate summary of all demo scenarios"""
     print("\n" + "="*60)
@@ -246,20 +274,7 @@ def generate_demo_summary(results):
     print("   ✅ Explainable AI with SHAP-based risk breakdown")
     
     print(f"\n📊 Results Summary:")
-    for i, result in enumerate(results, 1):
-        scenario = result['scenario']
-        success_icon = "✅" if result['simulation_success'] else "❌"
-        
-        print(f"\n   Scenario {i}: {scenario}")
-        score = result.get('risk_score', 'N/A')
-        if isinstance(score, (int, float)):
-            print(f"      Risk Score: {score:.3f}")
-        else:
-            print(f"      Risk Score: {score}")
-        if 'risk_reduction_pct' in result:
-            print(f"      Risk Reduction: {result['risk_reduction_pct']:.1f}%")
-        print(f"      Simulation: {success_icon} ({'Success' if result['simulation_success'] else 'Failed'})")
-        print(f"      Final Battery: {result['final_battery']:.1f}%")
+    print("\n".join(_scenario_summary(i, result) for i, result in enumerate(results, 1)))
     
     print(f"\n🏆 Impact for Thales:")
     print("   • Aeronautics & Space: Safer UAV routing, 60% risk reduction average")
@@ -308,14 +323,20 @@ def create_demo_data_files():
         }
     }
     
-    with open('demo/sample_missions/safe_mission.json', 'w') as f:
-        json.dump(safe_mission, f, indent=2)
-    
-    with open('demo/sample_missions/risky_mission.json', 'w') as f:
-        json.dump(risky_mission, f, indent=2)
+    Path('demo/sample_missions/safe_mission.json').write_bytes(orjson.dumps(safe_mission, option=orjson.OPT_INDENT_2))
+    Path('demo/sample_missions/risky_mission.json').write_bytes(orjson.dumps(risky_mission, option=orjson.OPT_INDENT_2))
     
     print("📁 Created sample mission files in demo/sample_missions/")
 
+async def _prefetch_weather(*routes):
+    """
+    One WeatherService with the grid cells of every route already fetched in a single
+    batch; per-route lookups through it are then served from its cell cache
+    """
+    weather_service = WeatherService()
+    await weather_service.get_weather_along_route([wp for route in routes for wp in route])
+    return weather_service
+
 async def main():
     """Run complete demo sequence"""
     setup_logging()
@@ -325,19 +346,22 @@ async def main():
     
     # Create demo data files
     create_demo_data_files()
+    _write_static_assets()
     
-    # Run all demo scenarios
-    results = []
+    # Run all demo scenarios concurrently on one prefetched weather service; each
+    # prints into its own buffer, replayed in scenario order once all have finished
+    scenarios = (demo_scenario_1_safe_mission, demo_scenario_2_high_risk_mission, demo_scenario_3_mission_failure)
+    outputs = [io.StringIO() for _ in scenarios]
     
     try:
-        result1 = await demo_scenario_1_safe_mission()
-        results.append(result1)
-        
-        result2 = await demo_scenario_2_high_risk_mission()
-        results.append(result2)
-        
-        result3 = await demo_scenario_3_mission_failure()
-        results.append(result3)
+        weather_service = await _prefetch_weather(SAFE_MISSION_WAYPOINTS, HIGH_RISK_WAYPOINTS, FAILURE_WAYPOINTS)
+        results = await asyncio.gather(
+            *(scenario(weather_service, out) for scenario, out in zip(scenarios, outputs)), return_exceptions=True
+        )
+        sys.stdout.write("".join(out.getvalue() for out in outputs))
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
         
         # Generate final summary
         generate_demo_summary(results)
@@ -349,12 +373,9 @@ async def main():
         
     except Exception as e:
         print(f"\n❌ Demo failed with error: {e}")
-        logging.error(f"Demo error: {e}", exc_info=True)
+        logging.error("Demo error: %s", e, exc_info=True)
         return 1
 
-if __name__ == "__main__":
-    exit(asyncio.run(main()))
-
 # Final run instructions script
 # run_project.sh
 """
@@ -434,8 +455,6 @@ video_script = """
 - Contact team for collaboration
 """
 
-print("🎥 Video script created for hackathon presentation")
-
 # Create comprehensive README
 readme_content = '''
 # 🚁 UAV Mission Planning & Risk Assessment System
@@ -712,15 +731,26 @@ MIT License - see [LICENSE](LICENSE) file for details.
 **⭐ Star this repository if you found it helpful!**
 '''
 
-# Write README to file
-with open('../README.md', 'w') as f:
-    f.write(readme_content)
-
-print("📄 Comprehensive README.md created")
-print("\n✅ UAV Mission Planning System - Complete Setup!")
-print("\nNext steps:")
-print("1. Run: python demo/run_demo.py")
-print("2. Start services: docker-compose up --build")
-print("3. Open browser: http://localhost:3000")
-print("4. Record demo video for submission")
-print("\n🏆 Ready for hackathon presentation!")
\ No newline at end of file
+def _write_static_assets():
+    """Write the README and print the setup notes, on a demo run rather than at import"""
+    print("🎥 Video script created for hackathon presentation")
+    
+    # Write README to file
+    Path('../README.md').write_bytes(readme_content.encode('utf-8'))
+    
+    print("📄 Comprehensive README.md created")
+    print("\n✅ UAV Mission Planning System - Complete Setup!")
+    print("\nNext steps:")
+    print("1. Run: python demo/run_demo.py")
+    print("2. Start services: docker-compose up --build")
+    print("3. Open browser: http://localhost:3000")
+    print("4. Record demo video for submission")
+    print("\n🏆 Ready for hackathon presentation!")
+
+if __name__ == "__main__":
+    # uvloop ships with uvicorn[standard]; fall back to the stdlib loop where it isn't available
+    try:
+        from uvloop import run as run_loop
+    except ImportError:
+        run_loop = asyncio.run
+    exit(run_loop(main()))
@@ -5,12 +5,11 @@ Generate synthetic training data for UAV risk prediction model
 
 import numpy as np
 import pandas as pd
-import json
+import orjson
 from pathlib import Path
 from typing import List, Dict, Tuple
 import logging
 from geopy.distance import geodesic
-import random
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -19,8 +18,8 @@ logger = logging.getLogger(__name__)
 def generate_synthetic_dataset(n_samples: int = 10000) -> Tuple[pd.DataFrame, np.ndarray]:
     """Generate synthetic training dataset with realistic UAV mission scenarios"""
     
-    np.random.seed(42)
-    random.seed(42)
+    rng = np.random.default_rng(42)
+    n = n_samples
     
     feature_names = [
         'route_length_km',
@@ -37,127 +36,118 @@ def generate_synthetic_dataset(n_samples: int = 10000) -> Tuple[pd.DataFrame, np
         'route_complexity'
     ]
     
-    data = []
-    labels = []
-    
     logger.info(f"Generating {n_samples} synthetic mission scenarios...")
     
-    for i in range(n_samples):
-        if i % 1000 == 0:
-            logger.info(f"Generated {i}/{n_samples} samples...")
-        
-        # Generate random mission parameters
-        route_length = np.random.exponential(5.0)  # km
-        avg_altitude = np.random.normal(120, 30)   # meters
-        max_altitude = avg_altitude + np.random.exponential(50)
-        
-        # Environmental factors
-        wind_speed = np.random.exponential(8)      # m/s
-        gust_max = wind_speed + np.random.exponential(5)
-        weather_severity = min(1.0, wind_speed / 15 + np.random.uniform(0, 0.3))
-        
-        # Safety factors
-        min_distance_to_no_fly = np.random.exponential(1000)  # meters
-        battery_margin = np.random.normal(20, 10)   # percentage
-        waypoints_over_buildings = np.random.poisson(2)
-        line_of_sight = np.random.random() > 0.3
-        terrain_roughness = np.random.exponential(0.5)
-        route_complexity = min(1.0, route_length / 10 + waypoints_over_buildings / 10)
-        
-        # Create feature vector
-        features = [
-            route_length,
-            avg_altitude, 
-            max_altitude,
-            min_distance_to_no_fly,
-            wind_speed,
-            gust_max,
-            battery_margin,
-            waypoints_over_buildings,
-            int(line_of_sight),
-            terrain_roughness,
-            weather_severity,
-            route_complexity
-        ]
-        
-        # Calculate risk label based on realistic failure conditions
-        risk_score = 0.0
-        
+    # Generate random mission parameters, each drawn for all samples at once
+    route_length = rng.exponential(5.0, n)  # km
+    avg_altitude = rng.normal(120, 30, n)   # meters
+    max_altitude = avg_altitude + rng.exponential(50, n)
+    
+    # Environmental factors
+    wind_speed = rng.exponential(8, n)      # m/s
+    gust_max = wind_speed + rng.exponential(5, n)
+    weather_severity = np.minimum(1.0, wind_speed / 15 + rng.uniform(0, 0.3, n))
+    
+    # Safety factors
+    min_distance_to_no_fly = rng.exponential(1000, n)  # meters
+    battery_margin = rng.normal(20, 10, n)   # percentage
+    waypoints_over_buildings = rng.poisson(2, n)
+    line_of_sight = rng.random(n) > 0.3
+    terrain_roughness = rng.exponential(0.5, n)
+    route_complexity = np.minimum(1.0, route_length / 10 + waypoints_over_buildings / 10)
+    
+    # Create feature columns; the count and flag columns stay integer
+    X = pd.DataFrame(dict(zip(feature_names, [
+        route_length,
+        avg_altitude, 
+        max_altitude,
+        min_distance_to_no_fly,
+        wind_speed,
+        gust_max,
+        battery_margin,
+        waypoints_over_buildings,
+        line_of_sight.astype(np.int64),
+        terrain_roughness,
+        weather_severity,
+        route_complexity
+    ])))
+    
+    # Calculate risk label based on realistic failure conditions; thresholds are
+    # summed as mask arithmetic, so the whole batch is scored without branches
+    risk_score = (
         # Weather contribution
-        risk_score += min(0.3, wind_speed / 20)
-        risk_score += min(0.2, gust_max / 25) 
-        
+        np.minimum(0.3, wind_speed / 20)
+        + np.minimum(0.2, gust_max / 25)
         # Distance to no-fly zones
-        if min_distance_to_no_fly < 500:
-            risk_score += 0.4
-        elif min_distance_to_no_fly < 1000:
-            risk_score += 0.2
-            
+        + (min_distance_to_no_fly < 500) * 0.4
+        + ((min_distance_to_no_fly >= 500) & (min_distance_to_no_fly < 1000)) * 0.2
         # Battery margin
-        if battery_margin < 15:
-            risk_score += 0.3
-        
+        + (battery_margin < 15) * 0.3
         # Route length vs battery
-        if route_length > 6 and battery_margin < 25:
-            risk_score += 0.2
-            
+        + ((route_length > 6) & (battery_margin < 25)) * 0.2
         # Altitude risk
-        if max_altitude > 200:
-            risk_score += 0.2
-        if avg_altitude < 80:
-            risk_score += 0.1
-            
+        + (max_altitude > 200) * 0.2
+        + (avg_altitude < 80) * 0.1
         # Terrain and complexity
-        if terrain_roughness > 1.0:
-            risk_score += 0.2
-        if not line_of_sight:
-            risk_score += 0.3
-            
+        + (terrain_roughness > 1.0) * 0.2
+        + ~line_of_sight * 0.3
         # Add random noise
-        risk_score += np.random.normal(0, 0.1)
-        risk_score = max(0.0, min(1.0, risk_score))
-        
-        # Convert to binary classification (high risk vs low risk)
-        is_high_risk = risk_score > 0.5
-        
-        data.append(features)
-        labels.append(1 if is_high_risk else 0)
-    
-    X = pd.DataFrame(data, columns=feature_names)
-    y = np.array(labels)
+        + rng.normal(0, 0.1, n)
+    )
+    np.clip(risk_score, 0.0, 1.0, out=risk_score)
+    
+    # Convert to binary classification (high risk vs low risk)
+    y = (risk_score > 0.5).astype(np.int64)
     
     logger.info(f"Generated dataset: {X.shape[0]} samples, {X.shape[1]} features")
     logger.info(f"High risk samples: {np.sum(y)} ({np.sum(y)/len(y)*100:.1f}%)")
     
     return X, y
 
-def save_dataset(X: pd.DataFrame, y: np.ndarray, output_dir: str = "ml/data"):
-    """Save the generated dataset to files"""
+def save_dataset(X: pd.DataFrame, y: np.ndarray, output_dir: str = "ml/data", features_format: str = "parquet"):
+    """
+    Save the generated dataset to files
+    features_format is "parquet" (typed and compressed, needs pyarrow) or "csv";
+    Parquet falls back to CSV when pyarrow isn't installed
+    """
     
     output_path = Path(output_dir)
     output_path.mkdir(parents=True, exist_ok=True)
     
+    if features_format == "parquet":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            logger.warning("pyarrow not installed, saving features as CSV")
+            features_format = "csv"
+    
     # Save features
-    X.to_csv(output_path / "features.csv", index=False)
+    features_path = output_path / f"features.{features_format}"
+    if features_format == "parquet":
+        X.to_parquet(features_path, engine="pyarrow", compression="zstd", index=False)
+    else:
+        X.to_csv(features_path, index=False)
     
-    # Save labels
-    np.savetxt(output_path / "labels.txt", y, fmt='%d')
+    # Save labels, binary so they load without parsing
+    labels_path = output_path / "labels.npy"
+    np.save(labels_path, y.astype(np.int8))
     
-    # Save metadata
+    # Save metadata; written last, and names the files the loader should read
     metadata = {
         "n_samples": len(X),
         "n_features": len(X.columns),
         "feature_names": list(X.columns),
         "high_risk_ratio": float(np.sum(y) / len(y)),
-        "generation_method": "synthetic_realistic_scenarios"
+        "generation_method": "synthetic_realistic_scenarios",
+        "features_file": features_path.name,
+        "labels_file": labels_path.name
     }
     
-    with open(output_path / "metadata.json", 'w') as f:
-        json.dump(metadata, f, indent=2)
+    (output_path / "metadata.json").write_bytes(orjson.dumps(metadata, option=orjson.OPT_INDENT_2))
     
     logger.info(f"Dataset saved to {output_path}")
-    logger.info(f"Features: {output_path / 'features.csv'}")
-    logger.info(f"Labels: {output_path / 'labels.txt'}")
+    logger.info(f"Features: {features_path}")
+    logger.info(f"Labels: {labels_path}")
     logger.info(f"Metadata: {output_path / 'metadata.json'}")
 
 def main():
@@ -7,44 +7,91 @@ Supports multiple algorithms and hyperparameter tuning
 import sys
 import os
 import logging
-import json
+import orjson
 import joblib
+from joblib import Parallel, delayed
 from pathlib import Path
 from typing import Dict, Any, Tuple
 import numpy as np
 import pandas as pd
-from sklearn.model_selection import train_test_split, cross_val_score, GridSearchCV
+from scipy.stats import loguniform, randint, uniform
+from sklearn.model_selection import train_test_split, cross_val_score, RandomizedSearchCV, StratifiedShuffleSplit
 from sklearn.metrics import classification_report, confusion_matrix, roc_auc_score
 from sklearn.preprocessing import StandardScaler
 import xgboost as xgb
 import lightgbm as lgb
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.linear_model import LogisticRegression
-import shap
 
 # Add the backend directory to the Python path
 backend_dir = Path(__file__).parent.parent.parent / "backend"
 sys.path.append(str(backend_dir))
 
+# Histogram bins per feature for the gradient-boosted models, as in the backend's training
+TRAIN_MAX_BIN = 256
+
+# Models trained on standardized features; train_models fits its scaler only for these
+SCALED_MODELS = ['logistic_regression']
+
+# Configurations sampled by hyperparameter_tuning; the full 3^5 grid it replaced was 243
+TUNING_TRIALS = 40
+
 def load_dataset(data_dir: str = "ml/data") -> Tuple[pd.DataFrame, np.ndarray]:
     """Load the generated dataset"""
     
     data_path = Path(data_dir)
     
-    if not (data_path / "features.csv").exists():
+    if not (data_path / "metadata.json").exists():
         raise FileNotFoundError(f"Dataset not found in {data_path}. Run generate_synthetic_data.py first.")
     
-    X = pd.read_csv(data_path / "features.csv")
-    y = np.loadtxt(data_path / "labels.txt", dtype=int)
+    metadata = orjson.loads((data_path / "metadata.json").read_bytes())
+    
+    # Datasets saved before Parquet/.npy support don't name their files and are CSV/text
+    features_path = data_path / metadata.get("features_file", "features.csv")
+    labels_path = data_path / metadata.get("labels_file", "labels.txt")
+    
+    if features_path.suffix == ".parquet":
+        X = pd.read_parquet(features_path)
+    else:
+        X = pd.read_csv(features_path)
     
-    with open(data_path / "metadata.json", 'r') as f:
-        metadata = json.load(f)
+    # Float features as float32, like the backend's training matrix; halves the data
+    # every model reads, and the boosted models bin them to far coarser values anyway
+    X = X.astype({column: np.float32 for column in X.columns if X[column].dtype == np.float64})
+    
+    if labels_path.suffix == ".npy":
+        y = np.load(labels_path).astype(int)
+    else:
+        y = np.loadtxt(labels_path, dtype=int)
     
     logging.info(f"Loaded dataset: {X.shape[0]} samples, {X.shape[1]} features")
     logging.info(f"High risk ratio: {metadata['high_risk_ratio']:.3f}")
     
     return X, y, metadata
 
+def _train_one(name: str, model, X_train, X_test, y_train: np.ndarray, y_test: np.ndarray) -> Tuple[str, Dict[str, Any]]:
+    """Fit one model, score it on the test split and with 5-fold CV, and return (name, results)"""
+    model.fit(X_train, y_train)
+    y_pred = model.predict(X_test)
+    y_pred_proba = model.predict_proba(X_test)[:, 1]
+    
+    # Calculate metrics
+    auc_score = roc_auc_score(y_test, y_pred_proba)
+    accuracy = (y_pred == y_test).mean()
+    
+    # Cross-validation score
+    cv_scores = cross_val_score(model, X_train, y_train, cv=5, scoring='roc_auc')
+    
+    return name, {
+        'model': model,
+        'auc_score': auc_score,
+        'accuracy': accuracy,
+        'cv_mean': cv_scores.mean(),
+        'cv_std': cv_scores.std(),
+        'y_pred': y_pred,
+        'y_pred_proba': y_pred_proba
+    }
+
 def train_models(X: pd.DataFrame, y: np.ndarray) -> Dict[str, Any]:
     """Train multiple models and return results"""
     
@@ -53,11 +100,7 @@ def train_models(X: pd.DataFrame, y: np.ndarray) -> Dict[str, Any]:
         X, y, test_size=0.2, random_state=42, stratify=y
     )
     
-    # Scale features for algorithms that need it
-    scaler = StandardScaler()
-    X_train_scaled = scaler.fit_transform(X_train)
-    X_test_scaled = scaler.transform(X_test)
-    
+    # One core per model; the models themselves are trained in parallel
     models = {
         'xgboost': xgb.XGBClassifier(
             n_estimators=200,
@@ -65,6 +108,9 @@ def train_models(X: pd.DataFrame, y: np.ndarray) -> Dict[str, Any]:
             learning_rate=0.1,
             subsample=0.8,
             colsample_bytree=0.8,
+            tree_method='hist',
+            max_bin=TRAIN_MAX_BIN,
+            n_jobs=1,
             random_state=42,
             eval_metric='logloss'
         ),
@@ -74,6 +120,8 @@ def train_models(X: pd.DataFrame, y: np.ndarray) -> Dict[str, Any]:
             learning_rate=0.1,
             subsample=0.8,
             colsample_bytree=0.8,
+            max_bin=TRAIN_MAX_BIN,
+            n_jobs=1,
             random_state=42,
             verbose=-1
         ),
@@ -81,7 +129,7 @@ def train_models(X: pd.DataFrame, y: np.ndarray) -> Dict[str, Any]:
             n_estimators=200,
             max_depth=10,
             random_state=42,
-            n_jobs=-1
+            n_jobs=1
         ),
         'logistic_regression': LogisticRegression(
             random_state=42,
@@ -89,42 +137,29 @@ def train_models(X: pd.DataFrame, y: np.ndarray) -> Dict[str, Any]:
         )
     }
     
-    results = {}
+    # Scale features only if an algorithm needs it; the tree models train on the raw features
+    scaler = None
+    if any(name in SCALED_MODELS for name in models):
+        scaler = StandardScaler()
+        X_train_scaled = scaler.fit_transform(X_train)
+        X_test_scaled = scaler.transform(X_test)
     
-    for name, model in models.items():
-        logging.info(f"Training {name}...")
-        
-        # Use scaled data for algorithms that need it
-        if name in ['logistic_regression']:
-            model.fit(X_train_scaled, y_train)
-            y_pred = model.predict(X_test_scaled)
-            y_pred_proba = model.predict_proba(X_test_scaled)[:, 1]
-        else:
-            model.fit(X_train, y_train)
-            y_pred = model.predict(X_test)
-            y_pred_proba = model.predict_proba(X_test)[:, 1]
-        
-        # Calculate metrics
-        auc_score = roc_auc_score(y_test, y_pred_proba)
-        accuracy = (y_pred == y_test).mean()
-        
-        # Cross-validation score
-        if name in ['logistic_regression']:
-            cv_scores = cross_val_score(model, X_train_scaled, y_train, cv=5, scoring='roc_auc')
-        else:
-            cv_scores = cross_val_score(model, X_train, y_train, cv=5, scoring='roc_auc')
-        
-        results[name] = {
-            'model': model,
-            'auc_score': auc_score,
-            'accuracy': accuracy,
-            'cv_mean': cv_scores.mean(),
-            'cv_std': cv_scores.std(),
-            'y_pred': y_pred,
-            'y_pred_proba': y_pred_proba
-        }
-        
-        logging.info(f"{name} - AUC: {auc_score:.3f}, Accuracy: {accuracy:.3f}, CV: {cv_scores.mean():.3f}±{cv_scores.std():.3f}")
+    splits = {
+        name: (X_train_scaled, X_test_scaled) if name in SCALED_MODELS else (X_train, X_test)
+        for name in models
+    }
+    
+    # The models share no state, so each is fit and scored in its own worker process
+    logging.info(f"Training {', '.join(models)}...")
+    results = dict(Parallel(n_jobs=len(models))(
+        delayed(_train_one)(name, model, *splits[name], y_train, y_test) for name, model in models.items()
+    ))
+    
+    for name, result in results.items():
+        logging.info(
+            f"{name} - AUC: {result['auc_score']:.3f}, Accuracy: {result['accuracy']:.3f}, "
+            f"CV: {result['cv_mean']:.3f}±{result['cv_std']:.3f}"
+        )
     
     return results, X_test, y_test, scaler
 
@@ -133,46 +168,50 @@ def hyperparameter_tuning(X: pd.DataFrame, y: np.ndarray) -> Dict[str, Any]:
     
     logging.info("Performing hyperparameter tuning...")
     
-    # XGBoost hyperparameter grid
-    xgb_param_grid = {
-        'n_estimators': [100, 200, 300],
-        'max_depth': [4, 6, 8],
-        'learning_rate': [0.05, 0.1, 0.15],
-        'subsample': [0.8, 0.9, 1.0],
-        'colsample_bytree': [0.8, 0.9, 1.0]
+    # XGBoost hyperparameter search space, sampled rather than searched exhaustively
+    xgb_param_distributions = {
+        'n_estimators': randint(100, 301),
+        'max_depth': randint(4, 9),
+        'learning_rate': loguniform(0.03, 0.2),
+        'subsample': uniform(0.8, 0.2),
+        'colsample_bytree': uniform(0.8, 0.2)
     }
     
-    xgb_model = xgb.XGBClassifier(random_state=42, eval_metric='logloss')
+    # Single-threaded trees; the search runs its fits in parallel instead
+    xgb_model = xgb.XGBClassifier(
+        tree_method='hist', max_bin=TRAIN_MAX_BIN, n_jobs=1, random_state=42, eval_metric='logloss'
+    )
     
-    # Use a smaller subset for faster tuning
-    X_sample, _, y_sample, _ = train_test_split(X, y, test_size=0.7, random_state=42, stratify=y)
+    # Use a smaller stratified subset for faster tuning; only its indices are drawn,
+    # so the unused 70% is never copied
+    sample_idx, _ = next(
+        StratifiedShuffleSplit(n_splits=1, train_size=0.3, random_state=42).split(np.zeros(len(y)), y)
+    )
+    X_sample, y_sample = X.iloc[sample_idx], y[sample_idx]
     
-    grid_search = GridSearchCV(
+    search = RandomizedSearchCV(
         xgb_model, 
-        xgb_param_grid, 
+        xgb_param_distributions, 
+        n_iter=TUNING_TRIALS,
         cv=3, 
         scoring='roc_auc', 
         n_jobs=-1,
+        random_state=42,
         verbose=1
     )
     
-    grid_search.fit(X_sample, y_sample)
-    
-    logging.info(f"Best parameters: {grid_search.best_params_}")
-    logging.info(f"Best CV score: {grid_search.best_score_:.3f}")
-    
-    return grid_search.best_estimator_, grid_search.best_params_
-
-def create_shap_explainer(model, X_sample: pd.DataFrame) -> shap.TreeExplainer:
-    """Create SHAP explainer for model interpretability"""
+    search.fit(X_sample, y_sample)
     
-    logging.info("Creating SHAP explainer...")
+    # Sampled values are NumPy scalars; plain Python ones keep the parameters JSON-serializable
+    best_params = {
+        name: value.item() if isinstance(value, np.generic) else value
+        for name, value in search.best_params_.items()
+    }
     
-    # Use a sample for SHAP (it can be slow with large datasets)
-    X_shap_sample = X_sample.sample(min(1000, len(X_sample)), random_state=42)
+    logging.info(f"Best parameters: {best_params}")
+    logging.info(f"Best CV score: {search.best_score_:.3f}")
     
-    explainer = shap.TreeExplainer(model)
-    return explainer
+    return search.best_estimator_, best_params
 
 def save_model_and_metadata(model, scaler, feature_names: list, 
                           results: Dict, best_params: Dict, 
@@ -182,13 +221,17 @@ def save_model_and_metadata(model, scaler, feature_names: list,
     output_path = Path(output_dir)
     output_path.mkdir(parents=True, exist_ok=True)
     
-    # Save model
-    model_path = output_path / "risk_xgb.json"
+    # Save model as UBJSON, the format the backend serves
+    model_path = output_path / "risk_xgb.ubj"
     model.save_model(str(model_path))
     
-    # Save scaler
+    # Save scaler, if one was fit; otherwise remove one left by an earlier run,
+    # which would no longer match this training run
     scaler_path = output_path / "scaler.pkl"
-    joblib.dump(scaler, scaler_path)
+    if scaler is not None:
+        joblib.dump(scaler, scaler_path)
+    else:
+        scaler_path.unlink(missing_ok=True)
     
     # Save metadata
     metadata = {
@@ -203,15 +246,17 @@ def save_model_and_metadata(model, scaler, feature_names: list,
         },
         'training_info': {
             'n_features': len(feature_names),
-            'feature_importance': model.feature_importances_.tolist()
+            'feature_importance': model.feature_importances_
         }
     }
     
-    with open(output_path / "model_metadata.json", 'w') as f:
-        json.dump(metadata, f, indent=2)
+    (output_path / "model_metadata.json").write_bytes(
+        orjson.dumps(metadata, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY)
+    )
     
     logging.info(f"Model saved to {model_path}")
-    logging.info(f"Scaler saved to {scaler_path}")
+    if scaler is not None:
+        logging.info(f"Scaler saved to {scaler_path}")
     logging.info(f"Metadata saved to {output_path / 'model_metadata.json'}")
 
 def main():
@@ -247,9 +292,6 @@ def main():
             'y_pred_proba': y_pred_proba
         }
         
-        # Create SHAP explainer
-        explainer = create_shap_explainer(best_model, X)
-        
         # Save everything
         save_model_and_metadata(best_model, scaler, feature_names, results, best_params)
         
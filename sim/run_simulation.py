@@ -6,6 +6,7 @@ Run UAV mission simulations for testing and demonstration
 import sys
 import asyncio
 import json
+from functools import lru_cache
 from pathlib import Path
 from typing import Dict, Any
 import logging
@@ -17,33 +18,44 @@ sys.path.append(str(backend_dir))
 from app.services.mission_service import MissionService
 from app.services.simulation_service import SimulationService
 from app.models.schemas import MissionPlanRequest, SimulationRequest
-from scenarios.sample_missions import SAMPLE_MISSIONS, convert_to_api_format
+from scenarios.sample_missions import SAMPLE_MISSIONS, SAMPLE_MISSIONS_BY_NAME, convert_to_api_format
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+@lru_cache(maxsize=None)
+def get_mission_service() -> MissionService:
+    """One MissionService for every mission run, so its models, caches and HTTP session are shared"""
+    return MissionService()
+
+@lru_cache(maxsize=None)
+def get_simulation_service() -> SimulationService:
+    """One SimulationService for every mission run"""
+    return SimulationService()
+
+@lru_cache(maxsize=None)
+def get_mission_request(mission_name: str) -> MissionPlanRequest:
+    """The validated plan request for a sample mission; the samples are fixed, so each is built once"""
+    return MissionPlanRequest(**convert_to_api_format(SAMPLE_MISSIONS_BY_NAME[mission_name]))
+
 async def run_mission_simulation(mission_name: str) -> Dict[str, Any]:
     """Run a complete mission simulation"""
     
     logger.info(f"Running simulation for mission: {mission_name}")
     
     # Get mission scenario
-    mission_scenario = None
-    for mission in SAMPLE_MISSIONS:
-        if mission.name == mission_name:
-            mission_scenario = mission
-            break
+    mission_scenario = SAMPLE_MISSIONS_BY_NAME.get(mission_name)
     
     if not mission_scenario:
         raise ValueError(f"Mission '{mission_name}' not found")
     
-    # Initialize services
-    mission_service = MissionService()
-    simulation_service = SimulationService()
+    # Shared services, built on first use
+    mission_service = get_mission_service()
+    simulation_service = get_simulation_service()
     
     # Convert to API format
-    mission_request = MissionPlanRequest(**convert_to_api_format(mission_scenario))
+    mission_request = get_mission_request(mission_name)
     
     # Plan mission
     logger.info("Planning mission...")
@@ -129,16 +141,21 @@ async def run_all_simulations():
     
     logger.info("Running simulations for all sample missions...")
     
+    # The missions are independent, so they all plan and simulate concurrently on the
+    # shared services; results are then reported in mission order
+    outcomes = await asyncio.gather(
+        *(run_mission_simulation(mission.name) for mission in SAMPLE_MISSIONS), return_exceptions=True
+    )
+    
     all_results = []
     
-    for mission in SAMPLE_MISSIONS:
-        try:
-            results = await run_mission_simulation(mission.name)
-            all_results.append(results)
-            print_simulation_results(results)
-        except Exception as e:
-            logger.error(f"Failed to run simulation for {mission.name}: {e}")
-            print(f"\n❌ Failed to run simulation for {mission.name}: {e}")
+    for mission, results in zip(SAMPLE_MISSIONS, outcomes):
+        if isinstance(results, Exception):
+            logger.error(f"Failed to run simulation for {mission.name}: {results}")
+            print(f"\n❌ Failed to run simulation for {mission.name}: {results}")
+            continue
+        all_results.append(results)
+        print_simulation_results(results)
     
     # Summary
     print("\n" + "="*60)
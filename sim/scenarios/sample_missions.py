@@ -3,16 +3,21 @@
 Sample mission scenarios for testing and demonstration
 """
 
+import sys
 from typing import List, Dict, Any
 from dataclasses import dataclass
 
-@dataclass
+# slots=True needs Python 3.10; older interpreters fall back to a regular dataclass
+_SLOTS = {"slots": True} if sys.version_info >= (3, 10) else {}
+
+# Scenarios are fixed sample data, so both types are frozen
+@dataclass(frozen=True, **_SLOTS)
 class Waypoint:
     lat: float
     lng: float
     altitude: float
 
-@dataclass
+@dataclass(frozen=True, **_SLOTS)
 class MissionScenario:
     name: str
     description: str
@@ -97,12 +102,15 @@ SAMPLE_MISSIONS = [
     )
 ]
 
+# Sample missions keyed by name, for direct lookup
+SAMPLE_MISSIONS_BY_NAME = {mission.name: mission for mission in SAMPLE_MISSIONS}
+
 def get_mission_by_name(name: str) -> MissionScenario:
     """Get a specific mission scenario by name"""
-    for mission in SAMPLE_MISSIONS:
-        if mission.name == name:
-            return mission
-    raise ValueError(f"Mission '{name}' not found")
+    try:
+        return SAMPLE_MISSIONS_BY_NAME[name]
+    except KeyError:
+        raise ValueError(f"Mission '{name}' not found") from None
 
 def get_all_missions() -> List[MissionScenario]:
     """Get all available mission scenarios"""